@@ -8,9 +8,11 @@ class Config:
     """Base configuration"""
     # Flask
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
-    DEBUG = os.getenv('DEBUG', 'True').lower() == 'true'
+    DEBUG = os.getenv('DEBUG', 'False').lower() == 'true'
     HOST = os.getenv('HOST', '0.0.0.0')
     PORT = int(os.getenv('PORT', 5000))
+    # Largest request body accepted (413 above it; checked while streaming)
+    MAX_CONTENT_LENGTH = int(os.getenv('MAX_CONTENT_LENGTH', 64 * 1024 * 1024))
     
     # Database
     SQLALCHEMY_DATABASE_URI = os.getenv(
@@ -24,15 +26,44 @@ class Config:
         'pool_pre_ping': True
     }
     
+    # ASGI mode (asgi.py): request threads per process, default = DB pool capacity
+    ASGI_THREADS = int(os.getenv(
+        'ASGI_THREADS',
+        SQLALCHEMY_ENGINE_OPTIONS['pool_size'] + SQLALCHEMY_ENGINE_OPTIONS.get('max_overflow', 10)
+    ))
+    
     # JWT
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'jwt-secret-key-change-in-production')
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=24)
     JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=30)
     JWT_ALGORITHM = 'HS256'
+    # How often each process pulls new revocations (by jti) from jwt_blacklist
+    JWT_REVOCATION_REFRESH_SECONDS = float(os.getenv('JWT_REVOCATION_REFRESH_SECONDS', 5))
+    # Verified token payloads cached per process (keyed by token hash) until exp
+    JWT_VERIFIED_CACHE_SIZE = int(os.getenv('JWT_VERIFIED_CACHE_SIZE', 10000))
+    # Per-process cache of authenticated users (id, email, salt, password-change epoch)
+    AUTH_PRINCIPAL_CACHE_SIZE = int(os.getenv('AUTH_PRINCIPAL_CACHE_SIZE', 10000))
+    AUTH_PRINCIPAL_CACHE_TTL = float(os.getenv('AUTH_PRINCIPAL_CACHE_TTL', 60))
     
     # Security
     BCRYPT_LOG_ROUNDS = int(os.getenv('BCRYPT_LOG_ROUNDS', 12))
     PBKDF2_ITERATIONS = int(os.getenv('PBKDF2_ITERATIONS', 100000))
+    # Bcrypt runs on a bounded pool; excess requests get 503 + Retry-After (0 workers = inline)
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_QUEUE_SIZE = int(os.getenv('PASSWORD_HASH_QUEUE_SIZE', 8))
+    PASSWORD_HASH_RETRY_AFTER = int(os.getenv('PASSWORD_HASH_RETRY_AFTER', 1))
+    # Token buckets per client IP and per account email on login/register/change-password
+    RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'True').lower() == 'true'
+    RATE_LIMIT_STORAGE = os.getenv('RATE_LIMIT_STORAGE', 'memory')  # 'memory' (per process) or 'redis'
+    RATE_LIMIT_REDIS_URL = os.getenv('RATE_LIMIT_REDIS_URL', 'redis://localhost:6379/0')
+    RATE_LIMIT_SHARDS = int(os.getenv('RATE_LIMIT_SHARDS', 16))
+    RATE_LIMIT_IP_PER_MINUTE = float(os.getenv('RATE_LIMIT_IP_PER_MINUTE', 30))
+    RATE_LIMIT_IP_BURST = float(os.getenv('RATE_LIMIT_IP_BURST', 20))
+    RATE_LIMIT_EMAIL_PER_MINUTE = float(os.getenv('RATE_LIMIT_EMAIL_PER_MINUTE', 5))
+    RATE_LIMIT_EMAIL_BURST = float(os.getenv('RATE_LIMIT_EMAIL_BURST', 5))
+    # Reverse proxies in front of the API that set X-Forwarded-For (the PHP frontend counts as one).
+    # The client IP is then taken from that header instead of the socket (0 = never trust it)
+    TRUSTED_PROXIES = int(os.getenv('TRUSTED_PROXIES', 0))
     
     # CORS
     CORS_ORIGINS = os.getenv('CORS_ORIGINS', 'http://localhost:3000,http://localhost:8000').split(',')
@@ -42,3 +73,50 @@ class Config:
     AES_IV_SIZE = 16   # 128 bits
     AES_TAG_SIZE = 16  # 128 bits
     SALT_SIZE = 16     # 128 bits
+    
+    # Pagination
+    NOTES_PAGE_SIZE_DEFAULT = int(os.getenv('NOTES_PAGE_SIZE_DEFAULT', 50))
+    NOTES_PAGE_SIZE_MAX = int(os.getenv('NOTES_PAGE_SIZE_MAX', 200))
+    NOTES_STREAM_BATCH_SIZE = int(os.getenv('NOTES_STREAM_BATCH_SIZE', 500))
+    NOTES_BATCH_MAX_OPS = int(os.getenv('NOTES_BATCH_MAX_OPS', 1000))
+    NOTES_MULTI_GET_MAX_IDS = int(os.getenv('NOTES_MULTI_GET_MAX_IDS', 500))
+    
+    # Large ciphertext storage ('database' keeps everything in notes.encrypted_content)
+    NOTES_BLOB_STORE = os.getenv('NOTES_BLOB_STORE', 'database')
+    NOTES_BLOB_DIR = os.getenv('NOTES_BLOB_DIR', os.path.join(os.getcwd(), 'blobs'))
+    # Ciphertext larger than this many bytes goes to the blob store
+    NOTES_BLOB_THRESHOLD = int(os.getenv('NOTES_BLOB_THRESHOLD', 64 * 1024))
+    # Chunk size for raw ciphertext uploads (PUT /api/notes/<id>/content)
+    NOTES_UPLOAD_CHUNK_SIZE = int(os.getenv('NOTES_UPLOAD_CHUNK_SIZE', 64 * 1024))
+    
+    # Send X-Query-Count / X-Query-Time-Ms headers and log possible N+1 queries
+    QUERY_COUNT_HEADER = os.getenv('QUERY_COUNT_HEADER', str(DEBUG)).lower() == 'true'
+    QUERY_REPEAT_WARNING = int(os.getenv('QUERY_REPEAT_WARNING', 5))  # same statement this often in one request
+    
+    # Prometheus metrics at /metrics (multi-worker servers also set PROMETHEUS_MULTIPROC_DIR)
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'False').lower() == 'true'
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN')  # Bearer token /metrics requires (unset = open, internal network only)
+    
+    # On-demand profiling of single requests (collapsed stacks for flame graphs)
+    PROFILE_ENABLED = os.getenv('PROFILE_ENABLED', 'False').lower() == 'true'
+    PROFILE_SECRET_KEY = os.getenv('PROFILE_SECRET_KEY')  # Signs X-Profile headers (unset = header ignored)
+    PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0))  # Fraction of all requests profiled
+    PROFILE_INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', 5))
+    PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(os.getcwd(), 'profiles'))
+    
+    # Purging (soft-deleted notes, expired jwt_blacklist rows, orphaned blobs)
+    PURGE_INTERVAL_SECONDS = float(os.getenv('PURGE_INTERVAL_SECONDS', 0))  # 0 = no background worker
+    PURGE_BATCH_SIZE = int(os.getenv('PURGE_BATCH_SIZE', 500))
+    PURGE_TIME_BUDGET_SECONDS = float(os.getenv('PURGE_TIME_BUDGET_SECONDS', 5))
+    # Tombstones are kept this long so offline devices can still sync the deletion
+    NOTES_TOMBSTONE_RETENTION_DAYS = int(os.getenv('NOTES_TOMBSTONE_RETENTION_DAYS', 30))
+    NOTES_BLOB_GRACE_SECONDS = int(os.getenv('NOTES_BLOB_GRACE_SECONDS', 3600))
+
+class TestingConfig(Config):
+    """Testing configuration (in-memory SQLite)"""
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+    RATE_LIMIT_ENABLED = False
+    QUERY_COUNT_HEADER = True
+    METRICS_ENABLED = True
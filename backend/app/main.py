@@ -1,46 +1,125 @@
 """
 Main application entry point for Secure Notes API
+
+Use create_app() to build an application. The module-level ``app`` used by
+run.py, gunicorn and asgi.py is only created on first access, so importing
+this module (e.g. from maintenance scripts) stays cheap.
 """
+import time
+import click
 from flask import Flask, jsonify
-from flask_cors import CORS
 from app.config import Config
 from app.database import db
-from app.middleware.error_handler import register_error_handlers
-
-# Initialize Flask app
-app = Flask(__name__)
-app.config.from_object(Config)
-
-# Initialize extensions
-db.init_app(app)
-CORS(app, 
-     origins=['http://localhost:8000', 'http://localhost:3000'],
-     supports_credentials=True,
-     allow_headers=['Content-Type', 'Authorization'])
-
-# Register error handlers
-register_error_handlers(app)
-
-# Import and register blueprints
-from app.routes import auth, users, notes
-
-app.register_blueprint(auth.bp, url_prefix='/api/auth')
-app.register_blueprint(users.bp, url_prefix='/api/user')
-app.register_blueprint(notes.bp, url_prefix='/api/notes')
 
-@app.route('/')
-def index():
-    """API root endpoint"""
-    return jsonify({
-        'success': True,
-        'message': 'Secure Notes API',
-        'version': '1.0.0'
-    })
+def create_app(config=None, register_blueprints: bool = True) -> Flask:
+    """
+    Create and configure a Flask application
+    
+    Args:
+        config: Configuration object (default: Config)
+        register_blueprints: Register the API (routes, CORS, error handlers).
+                             Maintenance scripts that only need the database
+                             pass False and skip those imports entirely.
+    
+    Returns:
+        Flask: Configured application
+    """
+    app = Flask(__name__)
+    app.config.from_object(config or Config)
+    
+    # Client IP from X-Forwarded-For, only as many hops as there are trusted proxies
+    if app.config.get('TRUSTED_PROXIES'):
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['TRUSTED_PROXIES'])
+    
+    # Initialize extensions
+    db.init_app(app)
+    
+    @app.cli.command('purge')
+    def purge_command():
+        """Purge old tombstones, expired blacklist rows and orphaned blobs once"""
+        from app.services.purger import Purger
+        
+        report = Purger().run()
+        print(f"Purged {report['notes']} notes, {report['jwt_blacklist']} blacklist rows, {report['blobs']} blobs")
+        if not report['complete']:
+            print("Time budget reached, run again to continue")
+    
+    @app.cli.command('profile-token')
+    @click.option('--minutes', default=15, help='Minutes the header stays valid')
+    def profile_token_command(minutes):
+        """Print an X-Profile header value that profiles requests (needs PROFILE_SECRET_KEY)"""
+        from app.services.profiler import sign_profile_request
+        
+        if not app.config['PROFILE_SECRET_KEY']:
+            raise click.ClickException('PROFILE_SECRET_KEY is not set')
+        print(f"X-Profile: {sign_profile_request(app.config['PROFILE_SECRET_KEY'], int(time.time()) + minutes * 60)}")
+    
+    if not register_blueprints:
+        return app
+    
+    from flask_cors import CORS
+    from app.middleware.error_handler import register_error_handlers
+    from app.routes import auth, users, notes
+    
+    CORS(app,
+         origins=['http://localhost:8000', 'http://localhost:3000'],
+         supports_credentials=True,
+         allow_headers=['Content-Type', 'Authorization', 'If-Match', 'If-None-Match', 'X-Note-IV', 'X-Note-Auth-Tag'],
+         expose_headers=['ETag', 'Retry-After'])
+    
+    # Register error handlers
+    register_error_handlers(app)
+    
+    # Register blueprints
+    app.register_blueprint(auth.bp, url_prefix='/api/auth')
+    app.register_blueprint(users.bp, url_prefix='/api/user')
+    app.register_blueprint(notes.bp, url_prefix='/api/notes')
+    
+    @app.route('/')
+    def index():
+        """API root endpoint"""
+        return jsonify({
+            'success': True,
+            'message': 'Secure Notes API',
+            'version': '1.0.0'
+        })
+    
+    @app.route('/health')
+    def health_check():
+        """Health check endpoint"""
+        return jsonify({
+            'success': True,
+            'status': 'healthy'
+        })
+    
+    # Profiling first, so its sampling covers the other middleware too
+    if app.config.get('PROFILE_ENABLED'):
+        from app.middleware.profiler import register_profiler
+        
+        register_profiler(app)
+    
+    # SQL statements per request (X-Query-Count header in debug mode)
+    from app.middleware.query_counter import register_query_counter
+    
+    register_query_counter(app)
+    
+    # Request, database and bcrypt metrics at /metrics
+    if app.config.get('METRICS_ENABLED'):
+        from app.middleware.metrics import register_metrics
+        
+        register_metrics(app)
+    
+    # The background purger is started by the serving process (start_purge_worker),
+    # never here: under gunicorn's preload this runs in the master
+    
+    return app
 
-@app.route('/health')
-def health_check():
-    """Health check endpoint"""
-    return jsonify({
-        'success': True,
-        'status': 'healthy'
-    })
+def __getattr__(name):
+    """Create the default application on first access of app.main.app"""
+    if name == 'app':
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
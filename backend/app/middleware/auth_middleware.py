@@ -3,8 +3,10 @@ Authentication middleware
 """
 from functools import wraps
 from flask import request, jsonify
+from werkzeug.exceptions import HTTPException
 from app.services.auth_service import AuthService
-from app.models.user import User
+from app.services.principal_cache import principal_cache
+from app.utils.security import PasswordHashingBusy
 
 def require_auth(f):
     """
@@ -39,9 +41,9 @@ def require_auth(f):
             auth_service = AuthService()
             payload = auth_service.verify_token(token)
             
-            # Get user from database
-            user = User.query.get(payload['user_id'])
-            if not user:
+            # Get user principal (cached per process)
+            user = principal_cache.get(payload['user_id'])
+            if not user or not user.accepts_token(payload):
                 return jsonify({
                     'success': False,
                     'error': 'Unauthorized',
@@ -59,6 +61,9 @@ def require_auth(f):
                 'message': str(e),
                 'status_code': 401
             }), 401
+        except (HTTPException, PasswordHashingBusy):
+            # Handled by the global error handlers (413, 503 + Retry-After, ...)
+            raise
         except Exception as e:
             return jsonify({
                 'success': False,
@@ -3,6 +3,8 @@ Global error handler
 """
 from flask import jsonify
 from werkzeug.exceptions import HTTPException
+from app.utils.security import PasswordHashingBusy
+from app.services.rate_limiter import RateLimitExceeded
 
 def register_error_handlers(app):
     """Register global error handlers"""
@@ -61,6 +63,28 @@ def register_error_handlers(app):
             'status_code': 500
         }), 500
     
+    @app.errorhandler(PasswordHashingBusy)
+    def password_hashing_busy(e):
+        response = jsonify({
+            'success': False,
+            'error': 'Service Unavailable',
+            'message': str(e),
+            'status_code': 503
+        })
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, 503
+    
+    @app.errorhandler(RateLimitExceeded)
+    def rate_limit_exceeded(e):
+        response = jsonify({
+            'success': False,
+            'error': 'Too Many Requests',
+            'message': e.description,
+            'status_code': 429
+        })
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, 429
+    
     @app.errorhandler(HTTPException)
     def handle_http_exception(e):
         return jsonify({
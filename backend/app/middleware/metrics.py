@@ -0,0 +1,79 @@
+"""
+Request instrumentation middleware
+"""
+import hmac
+import time
+from flask import Response, g, jsonify, request
+from sqlalchemy import event
+from app.database import db
+from app.services import metrics
+
+def register_metrics(app):
+    """
+    Record per-route latency, status codes, in-flight requests and database
+    time, and serve them at /metrics
+    """
+    with app.app_context():
+        for engine in db.engines.values():
+            instrument_engine(engine)
+    
+    @app.before_request
+    def start_timer():
+        g.request_started = time.perf_counter()
+        metrics.IN_PROGRESS.inc()
+    
+    @app.after_request
+    def record_request(response):
+        started = g.get('request_started')
+        if started is not None:
+            blueprint = request.blueprint or ''
+            endpoint = request.endpoint or 'unmatched'
+            
+            metrics.REQUEST_LATENCY.labels(request.method, blueprint, endpoint).observe(time.perf_counter() - started)
+            metrics.REQUESTS.labels(request.method, blueprint, endpoint, str(response.status_code)).inc()
+            # Counted by the query counter middleware
+            metrics.REQUEST_DB_QUERIES.labels(blueprint, endpoint).observe(g.get('db_query_count', 0))
+            metrics.REQUEST_DB_SECONDS.labels(blueprint, endpoint).observe(g.get('db_query_seconds', 0.0))
+        return response
+    
+    @app.teardown_request
+    def finish_request(exc):
+        if g.pop('request_started', None) is not None:
+            metrics.IN_PROGRESS.dec()
+    
+    token = app.config.get('METRICS_TOKEN')
+    
+    @app.route('/metrics')
+    def metrics_endpoint():
+        """Metrics in Prometheus text format (bearer METRICS_TOKEN if set, else internal network only)"""
+        # Compared as bytes: compare_digest rejects non-ASCII str with TypeError (headers are latin-1)
+        if token and not hmac.compare_digest(request.headers.get('Authorization', '').encode('latin-1'), f'Bearer {token}'.encode('utf-8')):
+            return jsonify({
+                'success': False,
+                'error': 'Unauthorized',
+                'message': 'Invalid metrics token',
+                'status_code': 401
+            }), 401
+        
+        body, content_type = metrics.render()
+        return Response(body, content_type=content_type)
+
+def instrument_engine(engine):
+    """Count queries and time pool checkouts of a SQLAlchemy engine"""
+    
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        metrics.DB_QUERIES.inc()
+    
+    # Every Connection gets its DBAPI connection through raw_connection(), so
+    # timing it covers waiting for a free pooled connection (and opening new ones)
+    raw_connection = engine.raw_connection
+    
+    def timed_raw_connection():
+        started = time.perf_counter()
+        try:
+            return raw_connection()
+        finally:
+            metrics.DB_POOL_CHECKOUT_SECONDS.observe(time.perf_counter() - started)
+    
+    engine.raw_connection = timed_raw_connection
@@ -0,0 +1,62 @@
+"""
+On-demand request profiling middleware
+"""
+import os
+import random
+import re
+import threading
+import time
+from datetime import datetime
+from flask import g, request
+from app.services.profiler import StackSampler, verify_profile_request, write_collapsed
+
+def register_profiler(app):
+    """
+    Profile requests that carry a valid X-Profile header (signed with
+    PROFILE_SECRET_KEY, see `flask profile-token`) or are picked at random
+    at PROFILE_SAMPLE_RATE, and write their collapsed stacks to PROFILE_DIR
+    """
+    secret = app.config['PROFILE_SECRET_KEY']
+    sample_rate = app.config['PROFILE_SAMPLE_RATE']
+    interval = app.config['PROFILE_INTERVAL_MS'] / 1000.0
+    profile_dir = app.config['PROFILE_DIR']
+    
+    @app.before_request
+    def start_profile():
+        header = request.headers.get('X-Profile')
+        if header is not None:
+            if not secret or not verify_profile_request(secret, header):
+                return
+        elif not (sample_rate and random.random() < sample_rate):
+            return
+        
+        g.profile_sampler = StackSampler(threading.get_ident(), interval)
+        g.profile_started = time.perf_counter()
+        g.profile_name = '{}-{}-{}-{}.folded'.format(
+            datetime.utcnow().strftime('%Y%m%dT%H%M%S%f'),
+            re.sub(r'[^\w.-]', '_', request.endpoint or 'unmatched'),
+            os.getpid(),
+            threading.get_ident()
+        )
+        g.profile_sampler.start()
+    
+    @app.after_request
+    def name_profile(response):
+        if 'profile_sampler' in g:
+            response.headers['X-Profile-Id'] = g.profile_name
+        return response
+    
+    @app.teardown_request
+    def write_profile(exc):
+        sampler = g.pop('profile_sampler', None)
+        if sampler is None:
+            return
+        
+        stacks = sampler.stop()
+        elapsed = time.perf_counter() - g.profile_started
+        try:
+            os.makedirs(profile_dir, exist_ok=True)
+            write_collapsed(os.path.join(profile_dir, g.profile_name), stacks)
+            app.logger.info(f'Profiled {request.method} {request.path} ({elapsed * 1000:.1f} ms, {sum(stacks.values())} samples): {g.profile_name}')
+        except OSError as e:
+            app.logger.error(f'Writing profile failed: {str(e)}')
@@ -0,0 +1,61 @@
+"""
+Per-request database query counting
+"""
+import time
+from collections import Counter
+from flask import g, has_request_context
+from sqlalchemy import event
+from app.database import db
+
+def register_query_counter(app):
+    """
+    Count the SQL statements each request runs (g.db_query_count, g.db_query_seconds)
+    
+    With QUERY_COUNT_HEADER on (default in debug mode) the count and time are
+    sent as X-Query-Count / X-Query-Time-Ms response headers, and a statement
+    run QUERY_REPEAT_WARNING or more times in one request is logged as a
+    possible N+1.
+    """
+    with app.app_context():
+        for engine in db.engines.values():
+            instrument_engine(engine)
+    
+    @app.before_request
+    def start_query_count():
+        g.db_query_count = 0
+        g.db_query_seconds = 0.0
+        if app.config['QUERY_COUNT_HEADER']:
+            g.db_statements = Counter()
+    
+    @app.after_request
+    def report_query_count(response):
+        statements = g.get('db_statements')
+        if statements is None:
+            return response
+        
+        response.headers['X-Query-Count'] = str(g.db_query_count)
+        response.headers['X-Query-Time-Ms'] = f'{g.db_query_seconds * 1000:.2f}'
+        
+        for statement, count in statements.items():
+            if count >= app.config['QUERY_REPEAT_WARNING']:
+                app.logger.warning(f'Possible N+1: statement ran {count} times in one request: {statement[:200]}')
+        return response
+
+def instrument_engine(engine):
+    """Add each statement run by an engine to the current request's count"""
+    
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info['query_started'] = time.perf_counter()
+    
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not has_request_context() or 'db_query_count' not in g:
+            return
+        
+        g.db_query_count += 1
+        g.db_query_seconds += time.perf_counter() - conn.info['query_started']
+        
+        statements = g.get('db_statements')
+        if statements is not None:
+            statements[statement] += 1
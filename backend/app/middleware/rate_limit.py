@@ -0,0 +1,49 @@
+"""
+Rate limiting middleware
+"""
+from functools import wraps
+from flask import request, current_app
+from app.services.rate_limiter import rate_limiter
+
+def rate_limit(scope: str, per_ip: bool = True, per_account: bool = True):
+    """
+    Decorator to rate limit a password endpoint per client IP and per email
+    
+    Runs before the handler, so rejected requests never reach bcrypt or the
+    database. The email is taken from the authenticated user (when placed
+    under require_auth) or from the JSON body. Over the limit raises
+    RateLimitExceeded (429 + Retry-After via the global error handler).
+    
+    On authenticated endpoints, put a per_account=False instance above
+    require_auth (checked before the token and user lookup) and a
+    per_ip=False one below it.
+    
+    Args:
+        scope: Name of the bucket group (e.g. 'login')
+        per_ip: Check the client IP's bucket
+        per_account: Check the account email's bucket
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            config = current_app.config
+            if config['RATE_LIMIT_ENABLED']:
+                email = None
+                if per_account:
+                    current_user = kwargs.get('current_user')
+                    if current_user is not None:
+                        email = current_user.email
+                    else:
+                        data = request.get_json(silent=True)
+                        email = data.get('email') if isinstance(data, dict) else None
+                
+                # remote_addr is the client's own address when ProxyFix trusts the proxies in front (TRUSTED_PROXIES)
+                rate_limiter.check(config, scope,
+                                   (request.remote_addr or 'unknown') if per_ip else None,
+                                   email if isinstance(email, str) else None)
+            
+            return f(*args, **kwargs)
+        
+        return decorated_function
+    
+    return decorator
@@ -2,38 +2,149 @@
 Note model
 """
 from datetime import datetime
-from sqlalchemy import Column, Integer, ForeignKey, LargeBinary, DateTime, Boolean
+from sqlalchemy import Column, Integer, BigInteger, String, ForeignKey, LargeBinary, DateTime, Boolean, Index, Sequence, func, text
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import column_property
+from sqlalchemy.sql.expression import FunctionElement
 from app.database import db
 
+# Global, monotonic change sequence used by delta sync
+notes_change_seq = Sequence('notes_change_seq', metadata=db.metadata)
+
+class next_change_seq(FunctionElement):
+    """Next value of the note change sequence"""
+    type = BigInteger()
+    inherit_cache = True
+
+@compiles(next_change_seq)
+def _compile_next_change_seq(element, compiler, **kw):
+    # Databases without sequences (SQLite) serialize writers, so MAX + 1 is monotonic
+    return '(SELECT COALESCE(MAX(change_seq), 0) + 1 FROM notes)'
+
+@compiles(next_change_seq, 'postgresql')
+def _compile_next_change_seq_postgresql(element, compiler, **kw):
+    return "nextval('notes_change_seq')"
+
+class current_change_xid(FunctionElement):
+    """Transaction ID of the write, orders delta sync by commit visibility"""
+    type = BigInteger()
+    inherit_cache = True
+
+@compiles(current_change_xid)
+def _compile_current_change_xid(element, compiler, **kw):
+    # Serialized writers commit in change_seq order, so change_seq alone is enough
+    return '0'
+
+@compiles(current_change_xid, 'postgresql')
+def _compile_current_change_xid_postgresql(element, compiler, **kw):
+    return 'pg_current_xact_id()::text::bigint'
+
+class change_watermark(FunctionElement):
+    """
+    Oldest transaction ID that may still be in flight
+    
+    Writes from transactions below it are all committed (or rolled back) and
+    visible; newer ones may still commit with a lower change_seq.
+    """
+    type = BigInteger()
+    inherit_cache = True
+
+@compiles(change_watermark)
+def _compile_change_watermark(element, compiler, **kw):
+    return '9223372036854775807'
+
+@compiles(change_watermark, 'postgresql')
+def _compile_change_watermark_postgresql(element, compiler, **kw):
+    return 'pg_snapshot_xmin(pg_current_snapshot())::text::bigint'
+
 class Note(db.Model):
     """Note model for encrypted notes storage"""
     __tablename__ = 'notes'
     
     id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
-    encrypted_content = Column(LargeBinary, nullable=False)  # Encrypted title + content
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    encrypted_content = Column(LargeBinary, nullable=False)  # Encrypted title + content (empty when in the blob store)
+    blob_ref = Column(String(64), nullable=True)  # Blob store reference of large ciphertext
+    blob_size = Column(BigInteger, nullable=True)  # Ciphertext size when stored as a blob
     iv = Column(LargeBinary, nullable=False)  # Initialization Vector
     auth_tag = Column(LargeBinary, nullable=False)  # Authentication tag for GCM
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
     is_deleted = Column(Boolean, default=False, nullable=False)
     deleted_at = Column(DateTime, nullable=True)
+    version = Column(Integer, default=1, onupdate=text('version + 1'), nullable=False)  # Bumped on every UPDATE (ETag)
+    change_seq = Column(BigInteger, default=next_change_seq(), onupdate=next_change_seq(), nullable=True)  # Delta sync order
+    change_xid = Column(BigInteger, default=current_change_xid(), onupdate=current_change_xid(), server_default='0', nullable=False)  # Writing transaction (delta sync watermark)
+    
+    # Ciphertext size computed by the database; only loaded when undeferred
+    content_size = column_property(func.coalesce(blob_size, func.length(encrypted_content)), deferred=True)
+    
+    # Fetch SQL-computed defaults (change_seq, change_xid, version) with RETURNING during the flush instead of a later SELECT
+    __mapper_args__ = {'eager_defaults': True}
+    
+    __table_args__ = (
+        # Matches the keyset pagination order of the note listing; tombstones are left out
+        Index('idx_notes_user_active', user_id, created_at.desc(), id.desc(), postgresql_where=is_deleted == False, sqlite_where=is_deleted == False),  # noqa: E712
+        # Delta sync: changes (including tombstones) since a (change_xid, change_seq, id) cursor
+        Index('idx_notes_user_changes', user_id, change_xid, change_seq, id),
+        # Purger: oldest tombstones first
+        Index('idx_notes_tombstones', deleted_at, id, postgresql_where=is_deleted == True, sqlite_where=is_deleted == True),  # noqa: E712
+        # Purger: is a blob file still referenced
+        Index('idx_notes_blob_ref', blob_ref, postgresql_where=blob_ref.isnot(None), sqlite_where=blob_ref.isnot(None)),
+    )
     
     def __repr__(self):
         return f'<Note {self.id} - User {self.user_id}>'
     
-    def to_dict(self):
-        """Convert note to dictionary"""
+    def to_dict(self, binary=False):
+        """Convert note to dictionary (binary=True keeps raw bytes instead of base64)"""
         import base64
         
+        encode = (lambda value: value) if binary else (lambda value: base64.b64encode(value).decode('utf-8'))
+        
         return {
             'id': self.id,
             'user_id': self.user_id,
-            'encrypted_content': base64.b64encode(self.encrypted_content).decode('utf-8'),
-            'iv': base64.b64encode(self.iv).decode('utf-8'),
-            'auth_tag': base64.b64encode(self.auth_tag).decode('utf-8'),
+            # Blob ciphertext is not loaded here: NoteService.to_inline_dict reads it, clients may also use content_url
+            'encrypted_content': None if self.blob_ref else encode(self.encrypted_content),
+            'content_external': self.blob_ref is not None,
+            'content_url': f'/api/notes/{self.id}/content' if self.blob_ref else None,
+            'iv': encode(self.iv),
+            'auth_tag': encode(self.auth_tag),
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
             'is_deleted': self.is_deleted,
-            'deleted_at': self.deleted_at.isoformat() if self.deleted_at else None
+            'deleted_at': self.deleted_at.isoformat() if self.deleted_at else None,
+            'version': self.version,
+            'change_seq': self.change_seq
         }
+    
+    def to_meta_dict(self):
+        """Convert note to metadata-only dictionary (no ciphertext)"""
+        return {
+            'id': self.id,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'content_size': self.content_size
+        }
+    
+    def to_tombstone_dict(self):
+        """Convert a deleted note to a tombstone (no ciphertext)"""
+        return {
+            'id': self.id,
+            'is_deleted': True,
+            'deleted_at': self.deleted_at.isoformat() if self.deleted_at else None,
+            'change_seq': self.change_seq
+        }
+
+class SyncHorizon(db.Model):
+    """Position of the newest purged tombstone per user; older delta sync cursors may have missed it"""
+    __tablename__ = 'sync_horizons'
+    
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    change_xid = Column(BigInteger, nullable=False)
+    change_seq = Column(BigInteger, nullable=False)
+    purges = Column(BigInteger, default=0, server_default='0', nullable=False)  # Purge passes that removed tombstones (vault version)
+    
+    def __repr__(self):
+        return f'<SyncHorizon User {self.user_id} - {self.change_xid}/{self.change_seq}>'
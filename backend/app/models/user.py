@@ -10,10 +10,11 @@ class User(db.Model):
     __tablename__ = 'users'
     
     id = Column(Integer, primary_key=True)
-    email = Column(String(255), unique=True, nullable=False, index=True)
+    email = Column(String(255), unique=True, nullable=False)
     password_hash = Column(String(255), nullable=False)
     name = Column(String(255), nullable=True)
     salt = Column(LargeBinary, nullable=False)  # For PBKDF2 key derivation
+    password_changed_at = Column(DateTime, nullable=True)  # Tokens issued before this are rejected
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
     
@@ -44,9 +45,10 @@ class JWTBlacklist(db.Model):
     __tablename__ = 'jwt_blacklist'
     
     id = Column(Integer, primary_key=True)
-    token = Column(String(500), nullable=False, index=True)
-    blacklisted_at = Column(DateTime, default=datetime.utcnow, nullable=False)
-    expires_at = Column(DateTime, nullable=False)
+    jti = Column(String(64), nullable=True, unique=True)  # Token ID (tokens issued with a jti claim)
+    token = Column(String(500), nullable=True, index=True)  # Legacy tokens without a jti claim
+    blacklisted_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    expires_at = Column(DateTime, nullable=False, index=True)  # Rows are purged once expired
     
     def __repr__(self):
         return f'<JWTBlacklist {self.id}>'
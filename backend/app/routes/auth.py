@@ -3,16 +3,22 @@ Routes untuk autentikasi (register & login)
 """
 from flask import Blueprint, request, jsonify
 import jwt
+import time
+import uuid
 import base64
 from datetime import datetime, timedelta
 from app.models.user import User
 from app.database import db
-from app.utils.security import hash_password, verify_password, generate_salt
+from app.utils.security import verify_password, PasswordHashingBusy
 from app.config import Config
+from app.services.auth_service import AuthService
+from app.middleware.rate_limit import rate_limit
 
 bp = Blueprint('auth', __name__)
+auth_service = AuthService()
 
 @bp.route('/register', methods=['POST'])
+@rate_limit('register')
 def register():
     """Daftar user baru"""
     try:
@@ -28,34 +34,26 @@ def register():
         if len(password) < 6:
             return jsonify({'error': 'Password minimal 6 karakter'}), 400
         
-        # Cek apakah email sudah terdaftar
-        if User.query.filter_by(email=email).first():
+        # Buat user baru (AuthService menolak email yang sudah terdaftar)
+        try:
+            user = auth_service.register_user(email, password, name or email.split('@')[0])
+        except ValueError:
             return jsonify({'error': 'Email sudah terdaftar'}), 400
         
-        # Buat user baru
-        salt = generate_salt()
-        password_hash = hash_password(password)
-        
-        user = User(
-            email=email,
-            password_hash=password_hash,
-            name=name or email.split('@')[0],
-            salt=salt
-        )
-        
-        db.session.add(user)
-        db.session.commit()
-        
         return jsonify({
             'message': 'Registrasi berhasil',
-            'user_id': user.id
+            'user_id': user['user_id']
         }), 201
         
+    except PasswordHashingBusy:
+        # Ditangani global error handler (503 + Retry-After)
+        raise
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 @bp.route('/login', methods=['POST'])
+@rate_limit('login')
 def login():
     """Login user"""
     try:
@@ -80,6 +78,8 @@ def login():
         token = jwt.encode({
             'user_id': user.id,
             'email': user.email,
+            'jti': uuid.uuid4().hex,
+            'iat': time.time(),  # Sub-second, compared with password_changed_at
             'exp': datetime.utcnow() + timedelta(hours=24)
         }, Config.JWT_SECRET_KEY, algorithm='HS256')
         
@@ -100,5 +100,45 @@ def login():
             }
         }), 200
         
+    except PasswordHashingBusy:
+        # Ditangani global error handler (503 + Retry-After)
+        raise
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+@bp.route('/logout', methods=['POST'])
+def logout():
+    """Logout user (token dicabut lewat jti)"""
+    token = request.headers.get('Authorization', '').replace('Bearer ', '')
+    
+    if not token:
+        return jsonify({
+            'success': False,
+            'error': 'Bad Request',
+            'message': 'Token tidak ditemukan',
+            'status_code': 400
+        }), 400
+    
+    try:
+        auth_service.logout_user(token)
+        
+        return jsonify({
+            'success': True,
+            'message': 'Logout berhasil'
+        }), 200
+        
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'error': 'Unauthorized',
+            'message': 'Token tidak valid',
+            'status_code': 401
+        }), 401
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'error': 'Internal Server Error',
+            'message': str(e),
+            'status_code': 500
+        }), 500
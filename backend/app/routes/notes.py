@@ -1,160 +1,325 @@
 """
 Routes untuk catatan (CRUD notes)
 """
-from flask import Blueprint, request, jsonify
-import jwt
+from flask import Blueprint, request, jsonify, Response, send_file, stream_with_context
+from pydantic import ValidationError
+from werkzeug.exceptions import HTTPException
+import json
 import base64
-from functools import wraps
-from app.models.user import User
 from app.models.note import Note
 from app.database import db
-from app.config import Config
+from app.schemas.note import NoteBatch, NoteIds
+from app.services.note_service import NoteService, NoteVersionConflict, SyncCursorExpired
+from app.middleware.auth_middleware import require_auth
+from app.utils.pagination import parse_limit
+from app.utils.validators import validate_request
+from app.utils.wire import get_request_data, respond, wants_msgpack
+from app.utils.etag import note_etag, vault_etag, is_not_modified, not_modified, expected_version, with_etag
 
 bp = Blueprint('notes', __name__)
+note_service = NoteService()
 
-# Helper function untuk autentikasi
-def login_required(f):
-    """Decorator untuk route yang butuh login"""
-    @wraps(f)
-    def decorated(*args, **kwargs):
-        token = request.headers.get('Authorization', '').replace('Bearer ', '')
-        
-        if not token:
-            return jsonify({'error': 'Token tidak ditemukan'}), 401
-        
-        try:
-            payload = jwt.decode(token, Config.JWT_SECRET_KEY, algorithms=['HS256'])
-            user = User.query.get(payload['user_id'])
-            if not user:
-                return jsonify({'error': 'User tidak valid'}), 401
-            return f(user, *args, **kwargs)
-        except jwt.ExpiredSignatureError:
-            return jsonify({'error': 'Token sudah expired'}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({'error': 'Token tidak valid'}), 401
+def wants_ndjson():
+    """Cek apakah client minta listing dalam format NDJSON"""
+    if request.args.get('stream') in ('1', 'true'):
+        return True
+    
+    best = request.accept_mimetypes.best_match(['application/json', 'application/x-ndjson'])
+    return best == 'application/x-ndjson'
+
+def stream_notes(user, meta=False):
+    """Kirim catatan user sebagai NDJSON langsung dari generator"""
+    def generate():
+        for note in note_service.iter_user_notes(user.id, meta=meta):
+            yield json.dumps(note) + '\n'
     
-    return decorated
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def batch_validation_error(error):
+    """Respon 422 untuk batch, dengan index operasi pertama yang gagal divalidasi"""
+    for detail in error.errors():
+        loc = detail['loc']
+        if len(loc) >= 2 and loc[0] == 'operations' and isinstance(loc[1], int):
+            field = '.'.join(str(part) for part in loc[2:])
+            return jsonify({
+                'error': f"Operasi {loc[1]} tidak valid: {field + ': ' if field else ''}{detail['msg']}",
+                'index': loc[1]
+            }), 422
+    
+    return jsonify({'error': str(error)}), 422
 
 @bp.route('', methods=['POST'])
-@login_required
-def create_note(user):
-    """Buat catatan baru"""
+@require_auth
+def create_note(current_user):
+    """Buat catatan baru (JSON base64 atau MessagePack bytes)"""
     try:
-        data = request.get_json()
+        data = get_request_data()
         
         # Validasi input
         if not data.get('encrypted_content'):
             return jsonify({'error': 'Konten tidak boleh kosong'}), 400
         
-        # Decode base64 ke bytes untuk disimpan
-        encrypted_content = base64.b64decode(data['encrypted_content']) if isinstance(data['encrypted_content'], str) else data['encrypted_content']
-        iv = base64.b64decode(data.get('iv', '')) if data.get('iv') and isinstance(data.get('iv'), str) else data.get('iv', b'')
-        auth_tag = base64.b64decode(data.get('auth_tag', '')) if data.get('auth_tag') and isinstance(data.get('auth_tag'), str) else data.get('auth_tag', b'')
-        
-        # Simpan catatan
-        note = Note(
-            user_id=user.id,
-            encrypted_content=encrypted_content,
-            iv=iv,
-            auth_tag=auth_tag
+        # Simpan catatan (base64 dari JSON atau bytes dari MessagePack)
+        note = note_service.create_note(
+            current_user.id,
+            data['encrypted_content'],
+            iv=data.get('iv', b''),
+            auth_tag=data.get('auth_tag', b'')
         )
         
-        db.session.add(note)
-        db.session.commit()
-        
-        return jsonify({
+        return respond({
             'message': 'Catatan berhasil dibuat',
-            'note_id': note.id
-        }), 201
+            'note_id': note['id']
+        }, 201)
         
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/batch', methods=['POST'])
+@require_auth
+def batch_notes(current_user):
+    """Create/update/hapus banyak catatan dalam satu transaksi"""
+    try:
+        data = validate_request(NoteBatch, get_request_data() or {})
+        results = note_service.apply_batch(current_user.id, data.operations)
+        
+        return respond({'results': results})
+        
+    except ValidationError as e:
+        return batch_validation_error(e)
+    except NoteVersionConflict as e:
+        # A note was deleted between the ownership check and the UPDATE; nothing was applied
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 409
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@bp.route('/fetch', methods=['POST'])
+@require_auth
+def fetch_notes(current_user):
+    """Ambil banyak catatan sekaligus berdasarkan daftar id (untuk list yang panjang)"""
+    try:
+        data = validate_request(NoteIds, get_request_data() or {})
+        meta = request.args.get('fields') == 'meta'
+        
+        return respond(note_service.get_notes_by_ids(current_user.id, data.ids, meta=meta, binary=wants_msgpack()))
+        
+    except ValidationError as e:
+        return jsonify({'error': str(e)}), 422
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @bp.route('', methods=['GET'])
-@login_required
-def get_notes(user):
-    """Ambil semua catatan user"""
+@require_auth
+def get_notes(current_user):
+    """Ambil semua catatan user (pakai ?limit=&cursor= untuk pagination)"""
+    try:
+        # fields=meta: hanya id, timestamp dan ukuran ciphertext (tanpa load konten)
+        fields = request.args.get('fields', 'full')
+        if fields not in ('full', 'meta'):
+            return jsonify({'error': 'Parameter fields tidak valid'}), 400
+        meta = fields == 'meta'
+        binary = wants_msgpack()
+        
+        # Mode streaming NDJSON: satu catatan per baris, memori tetap konstan
+        if wants_ndjson():
+            return stream_notes(current_user, meta)
+        
+        # Conditional GET: 304 kalau vault belum berubah sejak ETag terakhir
+        etag = vault_etag(note_service.get_vault_version(current_user.id))
+        if is_not_modified(etag):
+            return not_modified(etag)
+        
+        # Multi-get: ?ids=1,2,3 diambil dengan satu query
+        if 'ids' in request.args:
+            ids = [part for part in request.args.get('ids', '').split(',') if part.strip()]
+            try:
+                data = validate_request(NoteIds, {'ids': ids})
+            except ValidationError as e:
+                return jsonify({'error': str(e)}), 422
+            
+            return with_etag(respond(note_service.get_notes_by_ids(current_user.id, data.ids, meta=meta, binary=binary)), etag)
+        
+        # Keyset pagination: halaman ke-N sama murahnya dengan halaman pertama
+        if 'limit' in request.args or 'cursor' in request.args:
+            try:
+                limit = parse_limit(request.args.get('limit'))
+                page = note_service.get_user_notes_page(current_user.id, limit, request.args.get('cursor'), meta=meta, binary=binary)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            
+            return with_etag(respond(page), etag)
+        
+        return with_etag(respond({'notes': note_service.get_user_notes(current_user.id, meta=meta, binary=binary)}), etag)
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/changes', methods=['GET'])
+@require_auth
+def get_changes(current_user):
+    """Delta sync: catatan yang dibuat/diubah/dihapus sejak cursor ?since="""
     try:
-        notes = Note.query.filter_by(user_id=user.id).order_by(Note.created_at.desc()).all()
-        
-        return jsonify({
-            'notes': [{
-                'id': note.id,
-                'encrypted_content': base64.b64encode(note.encrypted_content).decode('utf-8') if note.encrypted_content else '',
-                'iv': base64.b64encode(note.iv).decode('utf-8') if note.iv else '',
-                'auth_tag': base64.b64encode(note.auth_tag).decode('utf-8') if note.auth_tag else '',
-                'created_at': note.created_at.isoformat(),
-                'updated_at': note.updated_at.isoformat()
-            } for note in notes]
-        }), 200
+        try:
+            limit = parse_limit(request.args.get('limit'))
+            changes = note_service.get_changes(
+                current_user.id,
+                since=request.args.get('since'),
+                limit=limit,
+                binary=wants_msgpack()
+            )
+        except SyncCursorExpired as e:
+            # Tombstone setelah cursor sudah di-purge: client harus full sync ulang
+            return jsonify({'error': str(e), 'reset': True}), 410
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return respond(changes)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @bp.route('/<int:note_id>', methods=['GET'])
-@login_required
-def get_note(user, note_id):
+@require_auth
+def get_note(current_user, note_id):
     """Ambil satu catatan"""
     try:
-        note = Note.query.filter_by(id=note_id, user_id=user.id).first()
+        note = Note.query.filter_by(id=note_id, user_id=current_user.id, is_deleted=False).first()
         
         if not note:
             return jsonify({'error': 'Catatan tidak ditemukan'}), 404
         
-        return jsonify({
-            'id': note.id,
-            'encrypted_content': base64.b64encode(note.encrypted_content).decode('utf-8') if note.encrypted_content else '',
-            'iv': base64.b64encode(note.iv).decode('utf-8') if note.iv else '',
-            'auth_tag': base64.b64encode(note.auth_tag).decode('utf-8') if note.auth_tag else '',
-            'created_at': note.created_at.isoformat(),
-            'updated_at': note.updated_at.isoformat()
-        }), 200
+        etag = note_etag(note.id, note.version)
+        if is_not_modified(etag):
+            return not_modified(etag)
+        
+        # Ciphertext selalu inline di sini, juga kalau disimpan di blob store
+        return with_etag(respond(note_service.to_inline_dict(note, binary=wants_msgpack())), etag)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@bp.route('/<int:note_id>', methods=['PUT'])
-@login_required
-def update_note(user, note_id):
-    """Update catatan"""
+@bp.route('/<int:note_id>/content', methods=['GET'])
+@require_auth
+def get_note_content(current_user, note_id):
+    """Ambil ciphertext mentah satu catatan (blob dikirim langsung dari file)"""
     try:
-        data = request.get_json()
+        content = note_service.get_note_content(note_id, current_user.id)
         
-        # Cari catatan
-        note = Note.query.filter_by(id=note_id, user_id=user.id).first()
-        if not note:
+        if not content:
+            return jsonify({'error': 'Catatan tidak ditemukan'}), 404
+        
+        etag = note_etag(note_id, content['version'])
+        if is_not_modified(etag):
+            return not_modified(etag)
+        
+        # send_file memakai wsgi.file_wrapper (sendfile) tanpa menyalin isi file lewat Python
+        if content['path']:
+            response = send_file(content['path'], mimetype='application/octet-stream', etag=False, conditional=True)
+            response.set_etag(etag)
+            return response
+        
+        # Konten inline: Range juga didukung
+        response = Response(content['content'], mimetype='application/octet-stream')
+        response.set_etag(etag)
+        return response.make_conditional(request, accept_ranges=True, complete_length=len(content['content']))
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/<int:note_id>/content', methods=['PUT'])
+@require_auth
+def put_note_content(current_user, note_id):
+    """Ganti ciphertext catatan dengan body mentah (application/octet-stream), dibaca per chunk"""
+    try:
+        # Ciphertext di body, iv dan auth_tag (base64) di header
+        try:
+            iv = base64.b64decode(request.headers['X-Note-IV'], validate=True)
+            auth_tag = base64.b64decode(request.headers['X-Note-Auth-Tag'], validate=True)
+        except (KeyError, ValueError):
+            return jsonify({'error': 'Header X-Note-IV dan X-Note-Auth-Tag (base64) wajib diisi'}), 400
+        
+        try:
+            version = expected_version(note_id)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 412
+        
+        new_version = note_service.update_note_content_stream(
+            note_id,
+            current_user.id,
+            request.stream,
+            iv,
+            auth_tag,
+            expected_version=version,
+            content_length=request.content_length
+        )
+        if new_version is None:
             return jsonify({'error': 'Catatan tidak ditemukan'}), 404
         
-        # Update data - decode base64 ke bytes
-        if 'encrypted_content' in data:
-            note.encrypted_content = base64.b64decode(data['encrypted_content']) if isinstance(data['encrypted_content'], str) else data['encrypted_content']
-        if 'iv' in data:
-            note.iv = base64.b64decode(data['iv']) if isinstance(data['iv'], str) else data['iv']
-        if 'auth_tag' in data:
-            note.auth_tag = base64.b64decode(data['auth_tag']) if isinstance(data['auth_tag'], str) else data['auth_tag']
+        return with_etag(respond({'message': 'Catatan berhasil diupdate'}), note_etag(note_id, new_version))
         
-        db.session.commit()
+    except NoteVersionConflict as e:
+        return jsonify({'error': str(e)}), 412
+    except HTTPException:
+        # 413 dari MAX_CONTENT_LENGTH
+        raise
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/<int:note_id>', methods=['PUT'])
+@require_auth
+def update_note(current_user, note_id):
+    """Update catatan (JSON base64 atau MessagePack bytes, If-Match opsional)"""
+    try:
+        data = get_request_data()
         
-        return jsonify({'message': 'Catatan berhasil diupdate'}), 200
+        # Decode base64 ke bytes (MessagePack sudah berupa bytes)
+        values = {}
+        for field in ('encrypted_content', 'iv', 'auth_tag'):
+            if field in data:
+                values[field] = base64.b64decode(data[field]) if isinstance(data[field], str) else data[field]
         
+        # If-Match: update hanya jika versi catatan belum berubah (tanpa SELECT dulu)
+        try:
+            version = expected_version(note_id)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 412
+        
+        new_version = note_service.update_note_fields(note_id, current_user.id, values, expected_version=version)
+        if new_version is None:
+            return jsonify({'error': 'Catatan tidak ditemukan'}), 404
+        
+        return with_etag(respond({'message': 'Catatan berhasil diupdate'}), note_etag(note_id, new_version))
+        
+    except NoteVersionConflict as e:
+        return jsonify({'error': str(e)}), 412
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 @bp.route('/<int:note_id>', methods=['DELETE'])
-@login_required
-def delete_note(user, note_id):
+@require_auth
+def delete_note(current_user, note_id):
     """Hapus catatan"""
     try:
-        note = Note.query.filter_by(id=note_id, user_id=user.id).first()
-        
-        if not note:
+        # Soft delete: tombstone tetap ada untuk delta sync
+        if not note_service.delete_note(note_id, current_user.id):
             return jsonify({'error': 'Catatan tidak ditemukan'}), 404
         
-        db.session.delete(note)
-        db.session.commit()
-        
         return jsonify({'message': 'Catatan berhasil dihapus'}), 200
         
     except Exception as e:
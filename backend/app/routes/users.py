@@ -6,7 +6,9 @@ from pydantic import ValidationError
 from app.schemas.user import ChangePassword
 from app.services.user_service import UserService
 from app.middleware.auth_middleware import require_auth
+from app.middleware.rate_limit import rate_limit
 from app.utils.validators import validate_request
+from app.utils.security import PasswordHashingBusy
 
 bp = Blueprint('users', __name__)
 user_service = UserService()
@@ -71,7 +73,9 @@ def update_profile(current_user):
         }), 500
 
 @bp.route('/change-password', methods=['POST'])
+@rate_limit('change_password', per_account=False)  # Per IP, before token verification and the user lookup
 @require_auth
+@rate_limit('change_password', per_ip=False)  # Per account, before bcrypt
 def change_password(current_user):
     """
     POST /api/user/change-password
@@ -100,6 +104,9 @@ def change_password(current_user):
             'message': str(e),
             'status_code': 422
         }), 422
+    except PasswordHashingBusy:
+        # Handled by the global error handler (503 + Retry-After)
+        raise
     except ValueError as e:
         return jsonify({
             'success': False,
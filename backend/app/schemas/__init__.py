@@ -2,9 +2,9 @@
 Pydantic schemas for request/response validation
 """
 from app.schemas.user import UserRegister, UserLogin, UserProfile, ChangePassword
-from app.schemas.note import NoteCreate, NoteUpdate, NoteResponse
+from app.schemas.note import NoteCreate, NoteUpdate, NoteResponse, NoteBatchOperation, NoteBatch, NoteIds
 
 __all__ = [
     'UserRegister', 'UserLogin', 'UserProfile', 'ChangePassword',
-    'NoteCreate', 'NoteUpdate', 'NoteResponse'
+    'NoteCreate', 'NoteUpdate', 'NoteResponse', 'NoteBatchOperation', 'NoteBatch', 'NoteIds'
 ]
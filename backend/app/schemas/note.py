@@ -1,7 +1,11 @@
 """
 Note schemas for validation
 """
-from pydantic import BaseModel, Field
+import base64
+import binascii
+from typing import Literal
+from pydantic import BaseModel, Field, validator
+from app.config import Config
 
 class NoteCreate(BaseModel):
     """Schema for creating a new note"""
@@ -26,3 +30,49 @@ class NoteResponse(BaseModel):
     updated_at: str
     is_deleted: bool
     deleted_at: str | None
+
+class NoteBatchOperation(BaseModel):
+    """Schema for a single operation in a batch request"""
+    op: Literal['create', 'update', 'delete']
+    id: int | None = Field(None, description="Note ID (required for update and delete)")
+    encrypted_content: str | bytes | None = Field(None, description="Encrypted content (base64 in JSON, raw bytes in MessagePack)")
+    iv: str | bytes | None = Field(None, description="Initialization vector (base64 in JSON, raw bytes in MessagePack)")
+    auth_tag: str | bytes | None = Field(None, description="Authentication tag (base64 in JSON, raw bytes in MessagePack)")
+    
+    @validator('encrypted_content', 'iv', 'auth_tag')
+    def decode_base64(cls, v):
+        """Decode base64 fields from JSON up front so a bad one fails validation, not the batch"""
+        if isinstance(v, str):
+            try:
+                return base64.b64decode(v, validate=True)
+            except binascii.Error:
+                raise ValueError('must be valid base64')
+        return v
+    
+    @validator('auth_tag', always=True)
+    def validate_fields_for_op(cls, v, values):
+        """Validate required fields for each operation type"""
+        op = values.get('op')
+        # Fields that failed decoding are missing from values and already reported
+        required = [values[field] for field in ('encrypted_content', 'iv') if field in values] + [v]
+        if op == 'create' and not all(required):
+            raise ValueError('create requires encrypted_content, iv and auth_tag')
+        if op in ('update', 'delete') and values.get('id') is None:
+            raise ValueError(f'{op} requires id')
+        return v
+
+class NoteBatch(BaseModel):
+    """Schema for a batch of note operations applied in one transaction (binary fields decoded to bytes)"""
+    operations: list[NoteBatchOperation] = Field(..., min_length=1, max_length=Config.NOTES_BATCH_MAX_OPS)
+    
+    @validator('operations')
+    def validate_unique_ids(cls, v):
+        """Validate each existing note is touched at most once"""
+        ids = [op.id for op in v if op.op != 'create']
+        if len(ids) != len(set(ids)):
+            raise ValueError('Each note id may appear only once per batch')
+        return v
+
+class NoteIds(BaseModel):
+    """Schema for fetching several notes by id"""
+    ids: list[int] = Field(..., min_length=1, max_length=Config.NOTES_MULTI_GET_MAX_IDS)
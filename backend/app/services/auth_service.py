@@ -2,10 +2,14 @@
 Authentication service
 """
 import os
+import time
+import uuid
 import jwt
 from datetime import datetime, timedelta
 from app.models.user import User, JWTBlacklist
 from app.database import db
+from app.services.revocation_cache import revocation_cache
+from app.services.token_cache import token_cache
 from app.utils.security import hash_password, verify_password, generate_salt
 from app.config import Config
 
@@ -45,13 +49,17 @@ class AuthService:
         )
         
         db.session.add(user)
-        db.session.commit()
+        db.session.flush()
         
-        return {
+        # Read before commit: afterwards the expired user would be re-loaded with another SELECT
+        result = {
             'user_id': user.id,
             'email': user.email,
             'name': user.name
         }
+        db.session.commit()
+        
+        return result
     
     def login_user(self, email: str, password: str) -> dict:
         """
@@ -103,17 +111,22 @@ class AuthService:
                 algorithms=[Config.JWT_ALGORITHM]
             )
             
-            expires_at = datetime.fromtimestamp(payload['exp'])
+            expires_at = datetime.utcfromtimestamp(payload['exp'])
+            jti = payload.get('jti')
             
-            # Add token to blacklist
+            # Add token to blacklist (by jti; full token only for legacy tokens)
             blacklist_entry = JWTBlacklist(
-                token=token,
+                jti=jti,
+                token=None if jti else token,
                 expires_at=expires_at
             )
             
             db.session.add(blacklist_entry)
             db.session.commit()
             
+            if jti:
+                revocation_cache.add(jti, expires_at)
+            
             return True
             
         except jwt.InvalidTokenError:
@@ -132,25 +145,36 @@ class AuthService:
         Raises:
             ValueError: If token is invalid or blacklisted
         """
-        try:
-            # Check if token is blacklisted
-            blacklisted = JWTBlacklist.query.filter_by(token=token).first()
-            if blacklisted:
-                raise ValueError('Token has been revoked')
-            
-            # Decode and verify token
-            payload = jwt.decode(
-                token,
-                Config.JWT_SECRET_KEY,
-                algorithms=[Config.JWT_ALGORITHM]
-            )
-            
-            return payload
-            
-        except jwt.ExpiredSignatureError:
-            raise ValueError('Token has expired')
-        except jwt.InvalidTokenError:
-            raise ValueError('Invalid token')
+        # Signature and expiry are checked once per token, then cached until exp
+        cache_key = token_cache.key(token)
+        payload = token_cache.get(cache_key)
+        
+        if payload is None:
+            try:
+                # Decode and verify token
+                payload = jwt.decode(
+                    token,
+                    Config.JWT_SECRET_KEY,
+                    algorithms=[Config.JWT_ALGORITHM]
+                )
+            except jwt.ExpiredSignatureError:
+                raise ValueError('Token has expired')
+            except jwt.InvalidTokenError:
+                raise ValueError('Invalid token')
+            
+            token_cache.put(cache_key, payload)
+        
+        # Check if token is revoked: in-memory by jti, database only for legacy tokens
+        jti = payload.get('jti')
+        if jti:
+            revoked = revocation_cache.is_revoked(jti)
+        else:
+            revoked = JWTBlacklist.query.filter_by(token=token).first() is not None
+        
+        if revoked:
+            raise ValueError('Token has been revoked')
+        
+        return payload
     
     def _generate_token(self, user_id: int) -> str:
         """
@@ -164,8 +188,9 @@ class AuthService:
         """
         payload = {
             'user_id': user_id,
+            'jti': uuid.uuid4().hex,
             'exp': datetime.utcnow() + Config.JWT_ACCESS_TOKEN_EXPIRES,
-            'iat': datetime.utcnow()
+            'iat': time.time()  # Sub-second, compared with password_changed_at
         }
         
         token = jwt.encode(
@@ -0,0 +1,251 @@
+"""
+Storage backends for large note ciphertext
+"""
+import hashlib
+import os
+import tempfile
+import threading
+from app.config import Config
+
+class BlobStore:
+    """
+    Interface of an external store for note ciphertext
+    
+    Blobs are immutable and addressed by the SHA-256 of their content, so
+    the same ciphertext is only stored once and a reference never changes
+    meaning.
+    """
+    
+    def put(self, data: bytes) -> str:
+        """
+        Store a blob
+        
+        Args:
+            data: Ciphertext bytes
+        
+        Returns:
+            str: Reference to save in the note row
+        """
+        raise NotImplementedError
+    
+    def put_stream(self, chunks) -> tuple:
+        """
+        Store a blob received in chunks
+        
+        Backends that can write incrementally should override this so the
+        whole blob is never held in memory.
+        
+        Args:
+            chunks: Iterable of ciphertext byte chunks
+        
+        Returns:
+            tuple: (reference, size in bytes)
+        """
+        data = b''.join(chunks)
+        return self.put(data), len(data)
+    
+    def get(self, ref: str) -> bytes:
+        """
+        Read a blob
+        
+        Args:
+            ref: Reference returned by put
+        
+        Returns:
+            bytes: Ciphertext bytes
+        """
+        raise NotImplementedError
+    
+    def path(self, ref: str) -> str:
+        """
+        Get the local file path of a blob (for send_file)
+        
+        Args:
+            ref: Reference returned by put
+        
+        Returns:
+            str: Absolute file path
+        """
+        raise NotImplementedError
+    
+    def delete(self, ref: str, older_than: float = None) -> bool:
+        """
+        Delete a blob
+        
+        Args:
+            ref: Reference returned by put
+            older_than: Only delete if the blob was not stored or re-used
+                        since this Unix time (checked atomically against put)
+        
+        Returns:
+            bool: True if the blob was deleted
+        """
+        raise NotImplementedError
+    
+    def recover(self, older_than: float) -> int:
+        """
+        Clean up after puts and deletes that were interrupted (e.g. by a crash)
+        
+        Backends that write through temporary files should override this.
+        
+        Args:
+            older_than: Unix time; unfinished writes from before it are abandoned
+        
+        Returns:
+            int: Leftover files removed
+        """
+        return 0
+
+class FilesystemBlobStore(BlobStore):
+    """Content-addressed blobs in a local directory (<root>/ab/cd/<sha256>)"""
+    
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+    
+    def put(self, data: bytes) -> str:
+        ref = hashlib.sha256(data).hexdigest()
+        path = self.path(ref)
+        
+        if self._touch(path):
+            return ref
+        
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        
+        # Write to a temp file in the same directory, then rename atomically
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        
+        return ref
+    
+    def put_stream(self, chunks) -> tuple:
+        os.makedirs(self.root, exist_ok=True)
+        
+        # Hash while writing, the final name is only known at the end
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in chunks:
+                    digest.update(chunk)
+                    size += len(chunk)
+                    f.write(chunk)
+            
+            ref = digest.hexdigest()
+            path = self.path(ref)
+            if self._touch(path):
+                os.unlink(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        
+        return ref, size
+    
+    def get(self, ref: str) -> bytes:
+        with open(self.path(ref), 'rb') as f:
+            return f.read()
+    
+    def path(self, ref: str) -> str:
+        if len(ref) != 64 or any(c not in '0123456789abcdef' for c in ref):
+            raise ValueError('Invalid blob reference')
+        
+        return os.path.join(self.root, ref[:2], ref[2:4], ref)
+    
+    def delete(self, ref: str, older_than: float = None) -> bool:
+        path = self.path(ref)
+        if older_than is None:
+            try:
+                os.unlink(path)
+                return True
+            except FileNotFoundError:
+                return False
+        
+        # Move the blob out of the way first: a put from here on no longer
+        # finds it and writes a fresh copy. A put that refreshed its mtime
+        # before the rename shows up in the re-check, and the blob goes back.
+        # A crash before the blob is restored or unlinked leaves the .del- file for recover.
+        doomed = os.path.join(os.path.dirname(path), f'.del-{ref}')
+        try:
+            os.rename(path, doomed)
+            if os.stat(doomed).st_mtime >= older_than:
+                # Same content, so replacing a copy written meanwhile is harmless
+                os.replace(doomed, path)
+                return False
+            
+            os.unlink(doomed)
+        except FileNotFoundError:
+            # Gone, or put back by recover in another process
+            return False
+        
+        return True
+    
+    def recover(self, older_than: float) -> int:
+        removed = 0
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                leftover = os.path.join(directory, name)
+                try:
+                    if name.startswith('.del-'):
+                        # Interrupted delete: the blob may have been re-used, so put it back
+                        # (the sweep checks it again). A link never replaces a copy a put wrote since.
+                        try:
+                            os.link(leftover, self.path(name[len('.del-'):]))
+                        except FileExistsError:
+                            pass
+                        os.unlink(leftover)
+                    elif name.startswith('.tmp-') and os.stat(leftover).st_mtime < older_than:
+                        # Interrupted put: nothing refers to a temp file
+                        os.unlink(leftover)
+                    else:
+                        continue
+                    removed += 1
+                except (FileNotFoundError, ValueError):
+                    pass
+        
+        return removed
+    
+    @staticmethod
+    def _touch(path: str) -> bool:
+        """Refresh the mtime of an existing blob so the purger's grace period covers a new reference"""
+        try:
+            os.utime(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+_blob_stores = {}
+_blob_stores_lock = threading.Lock()
+
+def get_blob_store():
+    """
+    Get the configured blob store
+    
+    Returns:
+        BlobStore: Store for ciphertext above NOTES_BLOB_THRESHOLD, or None
+                   when all ciphertext stays in the database
+    """
+    backend = Config.NOTES_BLOB_STORE
+    if backend == 'database':
+        return None
+    if backend != 'filesystem':
+        raise ValueError(f'Unknown NOTES_BLOB_STORE: {backend}')
+    
+    root = os.path.abspath(Config.NOTES_BLOB_DIR)
+    with _blob_stores_lock:
+        store = _blob_stores.get(root)
+        if store is None:
+            store = _blob_stores[root] = FilesystemBlobStore(root)
+    
+    return store
@@ -0,0 +1,76 @@
+"""
+Prometheus metrics
+
+With PROMETHEUS_MULTIPROC_DIR set (gunicorn.conf.py does this), every worker
+writes its samples to files in that directory and /metrics aggregates them,
+so any worker can answer for the whole server. The variable must be set
+before this module is imported.
+"""
+import os
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client import multiprocess
+
+# Latency buckets from sub-millisecond cache hits up to slow bcrypt-bound requests
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds',
+    'Request latency by route',
+    ['method', 'blueprint', 'endpoint'],
+    buckets=LATENCY_BUCKETS
+)
+REQUESTS = Counter(
+    'http_requests',
+    'Requests by route and status code',
+    ['method', 'blueprint', 'endpoint', 'status']
+)
+IN_PROGRESS = Gauge(
+    'http_requests_in_progress',
+    'Requests being handled right now',
+    multiprocess_mode='livesum'
+)
+REQUEST_DB_QUERIES = Histogram(
+    'http_request_db_queries',
+    'Database queries per request',
+    ['blueprint', 'endpoint'],
+    buckets=(0, 1, 2, 3, 4, 5, 7, 10, 15, 20, 50, 100)
+)
+REQUEST_DB_SECONDS = Histogram(
+    'http_request_db_seconds',
+    'Time spent executing database queries per request',
+    ['blueprint', 'endpoint'],
+    buckets=LATENCY_BUCKETS
+)
+DB_QUERIES = Counter(
+    'db_queries',
+    'Database queries, including those outside requests'
+)
+DB_POOL_CHECKOUT_SECONDS = Histogram(
+    'db_pool_checkout_seconds',
+    'Time waiting for a connection from the pool (including connecting)',
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+)
+PASSWORD_WORK_SECONDS = Histogram(
+    'password_hash_seconds',
+    'Time spent in bcrypt, excluding the wait for a worker',
+    ['operation'],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 1.0, 2.5)
+)
+
+def observe_password_work(operation: str, seconds: float):
+    """Record one bcrypt call ('hashpw' or 'checkpw')"""
+    PASSWORD_WORK_SECONDS.labels(operation).observe(seconds)
+
+def render() -> tuple:
+    """
+    Render all metrics in the text exposition format
+    
+    Returns:
+        tuple: (body, content type)
+    """
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
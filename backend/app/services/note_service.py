@@ -3,59 +3,198 @@ Note service
 """
 import base64
 from datetime import datetime
-from app.models.note import Note
+from itertools import chain
+from sqlalchemy import and_, or_, bindparam, insert, update, func
+from sqlalchemy.orm import defer, undefer
+from app.models.note import Note, SyncHorizon, change_watermark
 from app.database import db
+from app.config import Config
+from app.services.blob_store import get_blob_store
+from app.utils.pagination import encode_cursor, decode_cursor, encode_change_cursor, decode_change_cursor
+
+class NoteVersionConflict(Exception):
+    """Raised when a conditional update targets an outdated note version"""
+
+class SyncCursorExpired(Exception):
+    """Raised when tombstones after a delta sync cursor have been purged"""
 
 class NoteService:
     """Handle note CRUD operations"""
     
-    def create_note(self, user_id: int, encrypted_content: str, iv: str, auth_tag: str) -> dict:
+    def __init__(self, blob_store=None):
+        """
+        Args:
+            blob_store: Store for large ciphertext (default from config)
+        """
+        self._blob_store = blob_store
+    
+    @property
+    def blob_store(self):
+        """Blob store for ciphertext above NOTES_BLOB_THRESHOLD (None = database only)"""
+        return self._blob_store if self._blob_store is not None else get_blob_store()
+    
+    def content_columns(self, encrypted_content: bytes) -> dict:
+        """
+        Get the column values that store a note's ciphertext
+        
+        Ciphertext above NOTES_BLOB_THRESHOLD is written to the blob store and
+        only its reference is kept in the row.
+        
+        Args:
+            encrypted_content: Ciphertext bytes
+            
+        Returns:
+            dict: encrypted_content, blob_ref and blob_size values
+        """
+        store = self.blob_store
+        if store is None or len(encrypted_content) <= Config.NOTES_BLOB_THRESHOLD:
+            return {'encrypted_content': encrypted_content, 'blob_ref': None, 'blob_size': None}
+        
+        return {
+            'encrypted_content': b'',
+            'blob_ref': store.put(encrypted_content),
+            'blob_size': len(encrypted_content)
+        }
+    
+    def content_columns_from_stream(self, stream, chunk_size: int = None) -> dict:
+        """
+        Get the column values that store a note's ciphertext read from a stream
+        
+        At most NOTES_BLOB_THRESHOLD bytes are buffered. Anything larger is
+        passed on chunk by chunk to the blob store, so memory use stays
+        constant regardless of the upload size. Without a blob store the
+        ciphertext has to end up in the row and is read into memory.
+        
+        Args:
+            stream: File-like object with the raw ciphertext (request.stream)
+            chunk_size: Bytes read per chunk (default from config)
+            
+        Returns:
+            dict: encrypted_content, blob_ref and blob_size values
+        """
+        if chunk_size is None:
+            chunk_size = Config.NOTES_UPLOAD_CHUNK_SIZE
+        
+        store = self.blob_store
+        chunks = iter(lambda: stream.read(chunk_size), b'')
+        
+        head = bytearray()
+        for chunk in chunks:
+            head += chunk
+            if store is not None and len(head) > Config.NOTES_BLOB_THRESHOLD:
+                ref, size = store.put_stream(chain([bytes(head)], chunks))
+                return {'encrypted_content': b'', 'blob_ref': ref, 'blob_size': size}
+        
+        return {'encrypted_content': bytes(head), 'blob_ref': None, 'blob_size': None}
+    
+    def create_note(self, user_id: int, encrypted_content, iv=b'', auth_tag=b'') -> dict:
         """
         Create a new encrypted note
         
         Args:
             user_id: User ID
-            encrypted_content: Base64 encoded encrypted content
-            iv: Base64 encoded initialization vector
-            auth_tag: Base64 encoded authentication tag
+            encrypted_content: Encrypted content (base64 from JSON, bytes from MessagePack)
+            iv: Initialization vector (base64 or bytes)
+            auth_tag: Authentication tag (base64 or bytes)
             
         Returns:
             dict: Created note data
         """
-        # Decode base64 strings to bytes
-        encrypted_content_bytes = base64.b64decode(encrypted_content)
-        iv_bytes = base64.b64decode(iv)
-        auth_tag_bytes = base64.b64decode(auth_tag)
-        
-        # Create new note
+        # Create new note (large ciphertext goes to the blob store)
         note = Note(
             user_id=user_id,
-            encrypted_content=encrypted_content_bytes,
-            iv=iv_bytes,
-            auth_tag=auth_tag_bytes
+            iv=self._to_bytes(iv),
+            auth_tag=self._to_bytes(auth_tag),
+            **self.content_columns(self._to_bytes(encrypted_content))
         )
         
         db.session.add(note)
+        db.session.flush()
+        
+        # Serialize before commit: afterwards the expired note would be re-loaded with another SELECT
+        result = note.to_dict()
         db.session.commit()
         
-        return note.to_dict()
+        return result
     
-    def get_user_notes(self, user_id: int) -> list:
+    def get_user_notes(self, user_id: int, meta: bool = False, binary: bool = False) -> list:
         """
         Get all notes for a user (excluding deleted)
         
         Args:
             user_id: User ID
+            meta: Return metadata only, without loading ciphertext
+            binary: Keep binary fields as raw bytes instead of base64
             
         Returns:
             list: List of notes
         """
-        notes = Note.query.filter_by(
-            user_id=user_id,
-            is_deleted=False
-        ).order_by(Note.created_at.desc()).all()
+        notes = self._listing_query(user_id, meta).all()
         
-        return [note.to_dict() for note in notes]
+        return [self._serialize(note, meta, binary) for note in notes]
+    
+    def get_user_notes_page(self, user_id: int, limit: int, cursor: str = None, meta: bool = False, binary: bool = False) -> dict:
+        """
+        Get one page of a user's notes (excluding deleted) using keyset pagination
+        
+        Pages are ordered by (created_at, id) descending and served from
+        idx_notes_user_active, so every page costs the same as the first.
+        
+        Args:
+            user_id: User ID
+            limit: Maximum number of notes in the page
+            cursor: Opaque cursor from a previous page (optional)
+            meta: Return metadata only, without loading ciphertext
+            binary: Keep binary fields as raw bytes instead of base64
+            
+        Returns:
+            dict: Notes in the page and the cursor of the next page (None on the last page)
+            
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        query = self._listing_query(user_id, meta)
+        
+        if cursor:
+            created_at, note_id = decode_cursor(cursor)
+            query = query.filter(or_(
+                Note.created_at < created_at,
+                and_(Note.created_at == created_at, Note.id < note_id)
+            ))
+        
+        # Fetch one extra row to know whether another page exists
+        notes = query.limit(limit + 1).all()
+        
+        next_cursor = None
+        if len(notes) > limit:
+            notes = notes[:limit]
+            next_cursor = encode_cursor(notes[-1].created_at, notes[-1].id)
+        
+        return {
+            'notes': [self._serialize(note, meta, binary) for note in notes],
+            'next_cursor': next_cursor
+        }
+    
+    def iter_user_notes(self, user_id: int, batch_size: int = None, meta: bool = False):
+        """
+        Iterate over all notes for a user (excluding deleted) without loading them at once
+        
+        Rows are fetched in batches from a server-side cursor, so memory use
+        stays constant regardless of vault size.
+        
+        Args:
+            user_id: User ID
+            batch_size: Rows fetched per round trip (default from config)
+            meta: Yield metadata only, without loading ciphertext
+            
+        Yields:
+            dict: Notes ordered by newest first
+        """
+        if batch_size is None:
+            batch_size = Config.NOTES_STREAM_BATCH_SIZE
+        
+        for note in self._listing_query(user_id, meta).yield_per(batch_size):
+            yield self._serialize(note, meta)
     
     def get_note(self, note_id: int, user_id: int) -> dict:
         """
@@ -74,7 +213,55 @@ class NoteService:
             is_deleted=False
         ).first()
         
-        return note.to_dict() if note else None
+        return self.to_inline_dict(note) if note else None
+    
+    def to_inline_dict(self, note: Note, binary: bool = False) -> dict:
+        """
+        Serialize a note with its ciphertext inline, also when it lives in the blob store
+        
+        Args:
+            note: Note to serialize
+            binary: Keep binary fields as raw bytes instead of base64
+            
+        Returns:
+            dict: Note data
+        """
+        data = note.to_dict(binary=binary)
+        if note.blob_ref:
+            content = self.blob_store.get(note.blob_ref)
+            data['encrypted_content'] = content if binary else base64.b64encode(content).decode('utf-8')
+        
+        return data
+    
+    def get_notes_by_ids(self, user_id: int, note_ids: list, meta: bool = False, binary: bool = False) -> dict:
+        """
+        Get several notes by ID with a single query
+        
+        Args:
+            user_id: User ID (for authorization)
+            note_ids: Note IDs to fetch
+            meta: Return metadata only, without loading ciphertext
+            binary: Keep binary fields as raw bytes instead of base64
+            
+        Returns:
+            dict: Found notes (in request order) and the IDs that were not found
+        """
+        note_ids = list(dict.fromkeys(note_ids))
+        
+        query = Note.query.filter(
+            Note.id.in_(note_ids),
+            Note.user_id == user_id,
+            Note.is_deleted == False  # noqa: E712
+        )
+        if meta:
+            query = query.options(defer(Note.encrypted_content), undefer(Note.content_size))
+        
+        found = {note.id: note for note in query}
+        
+        return {
+            'notes': [self._serialize(found[note_id], meta, binary) for note_id in note_ids if note_id in found],
+            'missing': [note_id for note_id in note_ids if note_id not in found]
+        }
     
     def update_note(self, note_id: int, user_id: int, encrypted_content: str, iv: str, auth_tag: str) -> dict:
         """
@@ -105,7 +292,8 @@ class NoteService:
         auth_tag_bytes = base64.b64decode(auth_tag)
         
         # Update note
-        note.encrypted_content = encrypted_content_bytes
+        for column, value in self.content_columns(encrypted_content_bytes).items():
+            setattr(note, column, value)
         note.iv = iv_bytes
         note.auth_tag = auth_tag_bytes
         note.updated_at = datetime.utcnow()
@@ -114,6 +302,235 @@ class NoteService:
         
         return note.to_dict()
     
+    def update_note_fields(self, note_id: int, user_id: int, values: dict, expected_version: int = None) -> int:
+        """
+        Update a note with a single UPDATE ... RETURNING (no read before write)
+        
+        Args:
+            note_id: Note ID
+            user_id: User ID (for authorization)
+            values: Columns to set (binary fields as bytes)
+            expected_version: Only update if the note is still at this version (If-Match)
+            
+        Returns:
+            int: New note version, or None if not found
+            
+        Raises:
+            NoteVersionConflict: If expected_version no longer matches
+        """
+        values = dict(values)
+        if 'encrypted_content' in values:
+            values.update(self.content_columns(values.pop('encrypted_content')))
+        
+        return self._update_columns(note_id, user_id, values, expected_version)
+    
+    def update_note_content_stream(self, note_id: int, user_id: int, stream, iv: bytes, auth_tag: bytes, expected_version: int = None, content_length: int = None) -> int:
+        """
+        Replace the ciphertext of a note with a raw body read from a stream
+        
+        When the body may go to the blob store, the note and expected_version
+        are checked before anything is written, so a 404 or 412 does not leave
+        an unreferenced blob behind. Bodies known to stay inline skip that
+        SELECT; the conditional UPDATE checks them. A note changed between the
+        check and the UPDATE still leaves its new blob to the purger's sweep.
+        
+        Args:
+            note_id: Note ID
+            user_id: User ID (for authorization)
+            stream: File-like object with the raw ciphertext (request.stream)
+            iv: New initialization vector
+            auth_tag: New authentication tag
+            expected_version: Only update if the note is still at this version (If-Match)
+            content_length: Body size if known (Content-Length)
+            
+        Returns:
+            int: New note version, or None if not found
+            
+        Raises:
+            NoteVersionConflict: If expected_version no longer matches
+        """
+        if self.blob_store is not None and (content_length is None or content_length > Config.NOTES_BLOB_THRESHOLD):
+            version = self.get_note_version(note_id, user_id)
+            if version is None:
+                return None
+            if expected_version is not None and version != expected_version:
+                raise NoteVersionConflict('Note was modified by another client')
+        
+        values = self.content_columns_from_stream(stream)
+        values.update(iv=iv, auth_tag=auth_tag)
+        
+        return self._update_columns(note_id, user_id, values, expected_version)
+    
+    def _update_columns(self, note_id: int, user_id: int, values: dict, expected_version: int = None) -> int:
+        """Run the conditional UPDATE ... RETURNING behind update_note_fields"""
+        stmt = update(Note).where(
+            Note.id == note_id,
+            Note.user_id == user_id,
+            Note.is_deleted == False  # noqa: E712
+        )
+        if expected_version is not None:
+            stmt = stmt.where(Note.version == expected_version)
+        
+        values = dict(values, updated_at=datetime.utcnow())
+        new_version = db.session.execute(
+            stmt.values(**values).returning(Note.version),
+            execution_options={'synchronize_session': False}
+        ).scalar()
+        
+        if new_version is None:
+            db.session.rollback()
+            # Only on failure: tell a stale version apart from a missing note
+            if expected_version is not None and self.get_note_version(note_id, user_id) is not None:
+                raise NoteVersionConflict('Note was modified by another client')
+            return None
+        
+        db.session.commit()
+        
+        return new_version
+    
+    def get_note_version(self, note_id: int, user_id: int) -> int:
+        """
+        Get the current version of a note
+        
+        Args:
+            note_id: Note ID
+            user_id: User ID (for authorization)
+            
+        Returns:
+            int: Note version, or None if not found
+        """
+        return db.session.query(Note.version).filter(
+            Note.id == note_id,
+            Note.user_id == user_id,
+            Note.is_deleted == False  # noqa: E712
+        ).scalar()
+    
+    def get_note_content(self, note_id: int, user_id: int) -> dict:
+        """
+        Get where the ciphertext of a note lives
+        
+        Args:
+            note_id: Note ID
+            user_id: User ID (for authorization)
+            
+        Returns:
+            dict: Note version and either the blob file path (path) or the
+                  inline ciphertext (content), or None if not found
+        """
+        row = db.session.query(
+            Note.version,
+            Note.blob_ref,
+            Note.encrypted_content
+        ).filter(
+            Note.id == note_id,
+            Note.user_id == user_id,
+            Note.is_deleted == False  # noqa: E712
+        ).first()
+        
+        if row is None:
+            return None
+        
+        if row.blob_ref:
+            return {'version': row.version, 'path': self.blob_store.path(row.blob_ref), 'content': None}
+        
+        return {'version': row.version, 'path': None, 'content': row.encrypted_content}
+    
+    def get_vault_version(self, user_id: int) -> str:
+        """
+        Get a version string that changes whenever the user's notes change
+        
+        Every insert, update and soft delete takes a new change_seq, so the
+        highest one is served straight from idx_notes_user_changes. Purging
+        tombstones can lower that maximum back to an earlier version, so the
+        user's purge count (sync_horizons) is part of the version too.
+        
+        Args:
+            user_id: User ID
+            
+        Returns:
+            str: Vault version
+        """
+        last_change, purges = db.session.query(
+            db.session.query(func.max(Note.change_seq)).filter(Note.user_id == user_id).scalar_subquery(),
+            db.session.query(SyncHorizon.purges).filter(SyncHorizon.user_id == user_id).scalar_subquery()
+        ).one()
+        
+        return f'{last_change or 0}.{purges or 0}'
+    
+    def get_changes(self, user_id: int, since: str = None, limit: int = None, binary: bool = False) -> dict:
+        """
+        Get notes created, updated or deleted since a delta sync cursor
+        
+        change_seq is taken when a write runs, but transactions commit in
+        another order: a client could pass a committed change_seq 102 while
+        101 is still in flight and never see 101. Changes are therefore
+        ordered by the writing transaction (change_xid) first, and only
+        changes from transactions below the watermark (the oldest one still
+        in flight) are returned. Those are all settled, so nothing can later
+        commit behind the cursor; newer changes wait for the next call.
+        
+        Args:
+            user_id: User ID
+            since: Cursor from a previous call (None = from the beginning)
+            limit: Maximum number of changes (default from config)
+            binary: Keep binary fields as raw bytes instead of base64
+            
+        Returns:
+            dict: Changes ordered by (change_xid, change_seq) (deleted notes as
+                  tombstones), the cursor to resume from and whether more
+                  changes are waiting
+            
+        Raises:
+            ValueError: If the cursor is malformed
+            SyncCursorExpired: If tombstones after the cursor were purged
+                               (the client has to do a full sync)
+        """
+        if limit is None:
+            limit = Config.NOTES_PAGE_SIZE_DEFAULT
+        
+        query = Note.query.filter(
+            Note.user_id == user_id,
+            Note.change_seq.isnot(None),
+            Note.change_xid < self._change_watermark()
+        )
+        
+        if since:
+            change_xid, change_seq, note_id = decode_change_cursor(since)
+            
+            horizon = db.session.query(SyncHorizon.change_xid, SyncHorizon.change_seq).filter(
+                SyncHorizon.user_id == user_id
+            ).first()
+            if horizon is not None and (change_xid, change_seq) < tuple(horizon):
+                raise SyncCursorExpired('Deleted notes since this cursor were purged, a full sync is required')
+            
+            query = query.filter(or_(
+                Note.change_xid > change_xid,
+                and_(Note.change_xid == change_xid, Note.change_seq > change_seq),
+                and_(Note.change_xid == change_xid, Note.change_seq == change_seq, Note.id > note_id)
+            ))
+        
+        notes = query.order_by(Note.change_xid, Note.change_seq, Note.id).limit(limit + 1).all()
+        
+        has_more = len(notes) > limit
+        notes = notes[:limit]
+        
+        next_cursor = since
+        if notes:
+            next_cursor = encode_change_cursor(notes[-1].change_xid, notes[-1].change_seq, notes[-1].id)
+        
+        return {
+            'changes': [
+                note.to_tombstone_dict() if note.is_deleted else self.to_inline_dict(note, binary=binary)
+                for note in notes
+            ],
+            'next_cursor': next_cursor,
+            'has_more': has_more
+        }
+    
+    def _change_watermark(self):
+        """SQL expression for the delta sync watermark (evaluated in the query's own snapshot)"""
+        return change_watermark()
+    
     def delete_note(self, note_id: int, user_id: int) -> bool:
         """
         Delete a note (soft delete)
@@ -125,19 +542,143 @@ class NoteService:
         Returns:
             bool: Success status
         """
-        note = Note.query.filter_by(
-            id=note_id,
-            user_id=user_id,
-            is_deleted=False
-        ).first()
+        # Soft delete with a single UPDATE (no SELECT first)
+        return self._update_columns(note_id, user_id, {'is_deleted': True, 'deleted_at': datetime.utcnow()}) is not None
+    
+    def apply_batch(self, user_id: int, operations: list) -> list:
+        """
+        Apply a batch of create/update/delete operations in a single transaction
         
-        if not note:
-            return False
+        Creates are sent as one multi-row INSERT ... RETURNING, updates as one
+        executemany UPDATE by primary key (per set of changed columns) and
+        deletes as one UPDATE ... IN, after a single SELECT that checks
+        ownership of the referenced notes. The UPDATEs repeat the ownership
+        predicates, so a note deleted after that SELECT fails the batch.
+        
+        Args:
+            user_id: User ID
+            operations: Validated NoteBatchOperation items (binary fields decoded to bytes)
+            
+        Returns:
+            list: Result per operation, in request order
         
-        # Soft delete
-        note.is_deleted = True
-        note.deleted_at = datetime.utcnow()
+        Raises:
+            NoteVersionConflict: If a note was deleted while the batch ran
+        """
+        results = [None] * len(operations)
+        now = datetime.utcnow()
         
-        db.session.commit()
+        # Ownership check for every referenced note in one query
+        ids = [op.id for op in operations if op.op != 'create']
+        owned = set()
+        if ids:
+            owned = {row.id for row in db.session.query(Note.id).filter(
+                Note.id.in_(ids),
+                Note.user_id == user_id,
+                Note.is_deleted == False  # noqa: E712
+            )}
+        
+        creates, updates, deletes = [], [], []
+        for index, op in enumerate(operations):
+            if op.op != 'create' and op.id not in owned:
+                results[index] = {'index': index, 'op': op.op, 'id': op.id, 'status': 'not_found'}
+            elif op.op == 'create':
+                creates.append((index, {
+                    'user_id': user_id,
+                    **self.content_columns(self._to_bytes(op.encrypted_content)),
+                    'iv': self._to_bytes(op.iv),
+                    'auth_tag': self._to_bytes(op.auth_tag),
+                    'created_at': now,
+                    'updated_at': now,
+                    'is_deleted': False
+                }))
+            elif op.op == 'update':
+                values = {'id': op.id, 'updated_at': now}
+                for field in ('iv', 'auth_tag'):
+                    value = getattr(op, field)
+                    if value is not None:
+                        values[field] = self._to_bytes(value)
+                if op.encrypted_content is not None:
+                    values.update(self.content_columns(self._to_bytes(op.encrypted_content)))
+                updates.append((index, values))
+            else:
+                deletes.append((index, op.id))
         
-        return True
+        try:
+            if creates:
+                new_ids = db.session.execute(
+                    insert(Note).returning(Note.id, sort_by_parameter_order=True),
+                    [values for _, values in creates]
+                ).scalars().all()
+                for (index, _), note_id in zip(creates, new_ids):
+                    results[index] = {'index': index, 'op': 'create', 'id': note_id, 'status': 'created'}
+            
+            if updates:
+                notes = Note.__table__
+                stmt = update(notes).where(
+                    notes.c.id == bindparam('note_id'),
+                    notes.c.user_id == user_id,
+                    notes.c.is_deleted == False  # noqa: E712
+                )
+                # executemany needs the same columns in every row
+                groups = {}
+                for _, values in updates:
+                    row = {key: value for key, value in values.items() if key != 'id'}
+                    groups.setdefault(tuple(sorted(row)), []).append(dict(row, note_id=values['id']))
+                for rows in groups.values():
+                    if db.session.execute(stmt, rows).rowcount != len(rows):
+                        raise NoteVersionConflict('Note was deleted by another client')
+                for index, values in updates:
+                    results[index] = {'index': index, 'op': 'update', 'id': values['id'], 'status': 'updated'}
+            
+            if deletes:
+                result = db.session.execute(
+                    update(Note)
+                    .where(
+                        Note.id.in_([note_id for _, note_id in deletes]),
+                        Note.user_id == user_id,
+                        Note.is_deleted == False  # noqa: E712
+                    )
+                    .values(is_deleted=True, deleted_at=now, updated_at=now),
+                    execution_options={'synchronize_session': False}
+                )
+                if result.rowcount != len({note_id for _, note_id in deletes}):
+                    raise NoteVersionConflict('Note was deleted by another client')
+                for index, note_id in deletes:
+                    results[index] = {'index': index, 'op': 'delete', 'id': note_id, 'status': 'deleted'}
+            
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        
+        return results
+    
+    def _listing_query(self, user_id: int, meta: bool = False):
+        """
+        Build the base query for listing a user's notes (newest first)
+        
+        Args:
+            user_id: User ID
+            meta: Defer the ciphertext and load its size instead
+            
+        Returns:
+            Query: Listing query
+        """
+        query = Note.query.filter_by(
+            user_id=user_id,
+            is_deleted=False
+        ).order_by(Note.created_at.desc(), Note.id.desc())
+        
+        if meta:
+            query = query.options(defer(Note.encrypted_content), undefer(Note.content_size))
+        
+        return query
+    
+    def _serialize(self, note: Note, meta: bool = False, binary: bool = False) -> dict:
+        """Serialize a note for listing responses (blob ciphertext inline)"""
+        return note.to_meta_dict() if meta else self.to_inline_dict(note, binary=binary)
+    
+    def _to_bytes(self, value) -> bytes:
+        """Decode a base64 field from JSON; MessagePack fields are already bytes"""
+        return base64.b64decode(value) if isinstance(value, str) else value
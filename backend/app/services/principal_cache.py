@@ -0,0 +1,117 @@
+"""
+In-memory cache of authenticated user principals
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import timezone
+from sqlalchemy import event
+from app.models.user import User
+from app.database import db
+from app.config import Config
+
+class UserPrincipal:
+    """Lightweight authenticated user passed to route handlers"""
+    
+    __slots__ = ('id', 'email', 'salt', 'password_changed_at')
+    
+    def __init__(self, id: int, email: str, salt: bytes, password_changed_at=None):
+        self.id = id
+        self.email = email
+        self.salt = salt
+        self.password_changed_at = password_changed_at
+    
+    def __repr__(self):
+        return f'<UserPrincipal {self.id}>'
+    
+    def accepts_token(self, payload: dict) -> bool:
+        """
+        Check a token was not issued before the last password change
+        
+        Args:
+            payload: Verified JWT payload
+        
+        Returns:
+            bool: False if the token predates the password change
+        """
+        issued_at = payload.get('iat')
+        if self.password_changed_at is None or issued_at is None:
+            return True
+        
+        # Tokens carry a sub-second iat, so one issued in the same second but before the change
+        # is rejected; older whole-second tokens from that second are rejected too
+        changed_at = self.password_changed_at.replace(tzinfo=timezone.utc)
+        return issued_at > changed_at.timestamp()
+
+class PrincipalCache:
+    """
+    Per-process TTL + LRU cache of UserPrincipal by user id
+    
+    Saves the User lookup that every authenticated request used to run.
+    Entries are invalidated when the user's profile or password changes or
+    the account is deleted, but only in the process that made the change:
+    other processes keep the old entry (and accept tokens from before a
+    password change) for up to the TTL.
+    """
+    
+    def __init__(self, max_size: int = None, ttl: float = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # user_id -> (expires, principal)
+        self._lock = threading.Lock()
+    
+    def get(self, user_id: int):
+        """
+        Get the principal for a user, loading it on a cache miss
+        
+        Args:
+            user_id: User ID from the token payload
+        
+        Returns:
+            UserPrincipal: Principal, or None if the user does not exist
+        """
+        now = time.monotonic()
+        
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                return entry[1]
+        
+        row = db.session.query(
+            User.id,
+            User.email,
+            User.salt,
+            User.password_changed_at
+        ).filter(User.id == user_id).first()
+        if row is None:
+            return None
+        
+        principal = UserPrincipal(row.id, row.email, row.salt, row.password_changed_at)
+        ttl = self.ttl if self.ttl is not None else Config.AUTH_PRINCIPAL_CACHE_TTL
+        max_size = self.max_size if self.max_size is not None else Config.AUTH_PRINCIPAL_CACHE_SIZE
+        
+        with self._lock:
+            self._entries[user_id] = (now + ttl, principal)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > max_size:
+                self._entries.popitem(last=False)
+        
+        return principal
+    
+    def invalidate(self, user_id: int):
+        """Drop the cached principal for a user"""
+        with self._lock:
+            self._entries.pop(user_id, None)
+    
+    def clear(self):
+        """Drop all cached principals"""
+        with self._lock:
+            self._entries.clear()
+
+principal_cache = PrincipalCache()
+
+@event.listens_for(User, 'after_delete')
+def _invalidate_deleted_user(mapper, connection, target):
+    """Forget the principal of a deleted account"""
+    principal_cache.invalidate(target.id)
@@ -0,0 +1,85 @@
+"""
+Sampling profiler for single requests
+"""
+import hashlib
+import hmac
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+class StackSampler:
+    """
+    Statistical profiler for one thread
+    
+    A helper thread looks at the target thread's current stack every
+    interval and counts identical stacks. The profiled code itself runs
+    unmodified, so the overhead is the sampling thread only (unlike cProfile,
+    which hooks every call).
+    """
+    
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()  # (outermost, ..., innermost frame) -> samples
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def start(self):
+        """Start sampling"""
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+    
+    def stop(self) -> Counter:
+        """Stop sampling and return the stack counts"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        return self.stacks
+    
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                return
+            
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{frame.f_globals.get('__name__', '?')}:{getattr(code, 'co_qualname', code.co_name)}")
+                frame = frame.f_back
+            self.stacks[tuple(reversed(stack))] += 1
+
+def write_collapsed(path: str, stacks: Counter):
+    """
+    Write stack counts in the collapsed format of flamegraph.pl / speedscope
+    
+    One line per stack: frames from outermost to innermost joined by ';',
+    then a space and the number of samples.
+    """
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        for stack, count in stacks.most_common():
+            f.write(f"{';'.join(frame.replace(';', ':') for frame in stack)} {count}\n")
+    os.replace(tmp_path, path)
+
+def sign_profile_request(secret: str, expires: int) -> str:
+    """
+    Value of the X-Profile header that enables profiling until expires
+    
+    Args:
+        secret: PROFILE_SECRET_KEY
+        expires: Unix time after which the value is rejected
+    """
+    signature = hmac.new(secret.encode('utf-8'), str(expires).encode('utf-8'), hashlib.sha256).hexdigest()
+    return f'{expires}.{signature}'
+
+def verify_profile_request(secret: str, value: str) -> bool:
+    """Check an X-Profile header value is signed with secret and not expired"""
+    expires, _, signature = value.partition('.')
+    if not (expires.isascii() and expires.isdigit()) or int(expires) < time.time():
+        return False
+    # As bytes: compare_digest raises TypeError for non-ASCII str
+    return hmac.compare_digest(sign_profile_request(secret, int(expires)).encode('utf-8'), f'{expires}.{signature}'.encode('utf-8'))
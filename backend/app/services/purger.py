@@ -0,0 +1,322 @@
+"""
+Background purging of soft-deleted notes, expired revocations and orphaned blobs
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from sqlalchemy import and_, or_, delete, func, select
+from app.models.note import Note, SyncHorizon
+from app.models.user import JWTBlacklist
+from app.database import db
+from app.config import Config
+from app.services.blob_store import get_blob_store
+
+# pg_advisory_lock key held by the process that is purging ("purge" in ASCII)
+PURGE_LOCK_KEY = 0x7075726765
+
+class Purger:
+    """
+    Hard-delete rows that are no longer needed, in small batches
+    
+    Each batch is its own short transaction, selected with a keyset over an
+    index and deleted by primary key, so purging never holds long locks or
+    scans a whole table at once. A run stops when its time budget is spent
+    and the next run picks up where it left off.
+    """
+    
+    def __init__(self, batch_size: int = None, time_budget: float = None):
+        self.batch_size = batch_size
+        self.time_budget = time_budget
+        self._blob_cursor = ''  # Last blob reference checked by the sweep
+    
+    def run(self) -> dict:
+        """
+        Run one purge pass within the time budget
+        
+        Returns:
+            dict: Rows/blobs purged per kind and whether the pass finished
+        """
+        time_budget = self.time_budget if self.time_budget is not None else Config.PURGE_TIME_BUDGET_SECONDS
+        deadline = time.monotonic() + time_budget
+        
+        tombstones, tombstones_done = self.purge_tombstones(deadline)
+        revocations, revocations_done = self.purge_revocations(deadline)
+        blobs, blobs_done = self.purge_blobs(deadline)
+        
+        return {
+            'notes': tombstones,
+            'jwt_blacklist': revocations,
+            'blobs': blobs,
+            'complete': tombstones_done and revocations_done and blobs_done
+        }
+    
+    def purge_tombstones(self, deadline: float) -> tuple:
+        """
+        Hard-delete notes soft-deleted more than NOTES_TOMBSTONE_RETENTION_DAYS ago
+        
+        Args:
+            deadline: time.monotonic() value to stop at
+        
+        Returns:
+            tuple: (rows deleted, True if nothing is left to purge)
+        """
+        cutoff = datetime.utcnow() - timedelta(days=Config.NOTES_TOMBSTONE_RETENTION_DAYS)
+        
+        return self._purge_keyset(
+            Note,
+            Note.deleted_at,
+            and_(Note.is_deleted == True, Note.deleted_at < cutoff),  # noqa: E712
+            deadline,
+            columns=(Note.user_id, Note.change_xid, Note.change_seq),
+            before_commit=self._raise_sync_horizons
+        )
+    
+    def purge_revocations(self, deadline: float) -> tuple:
+        """
+        Delete blacklist rows of tokens that have expired anyway
+        
+        Args:
+            deadline: time.monotonic() value to stop at
+        
+        Returns:
+            tuple: (rows deleted, True if nothing is left to purge)
+        """
+        return self._purge_keyset(
+            JWTBlacklist,
+            JWTBlacklist.expires_at,
+            JWTBlacklist.expires_at < datetime.utcnow(),
+            deadline
+        )
+    
+    def purge_blobs(self, deadline: float) -> tuple:
+        """
+        Delete blob store files that no note references any more
+        
+        Files written or re-used within NOTES_BLOB_GRACE_SECONDS are kept, so
+        a blob is never removed between being stored and its row committing.
+        The age is checked again when deleting, atomically with a concurrent
+        put of the same content (see BlobStore.delete). Each sweep starts by
+        restoring blobs of interrupted deletes and removing temp files of
+        interrupted puts older than the grace period (BlobStore.recover).
+        
+        Args:
+            deadline: time.monotonic() value to stop at
+        
+        Returns:
+            tuple: (blobs deleted, True if the sweep reached the end)
+        """
+        store = get_blob_store()
+        if store is None or not os.path.isdir(store.root):
+            return 0, True
+        
+        batch_size = self.batch_size or Config.PURGE_BATCH_SIZE
+        grace_cutoff = time.time() - Config.NOTES_BLOB_GRACE_SECONDS
+        purged = 0
+        
+        if not self._blob_cursor:
+            store.recover(grace_cutoff)
+        
+        candidates = []
+        for ref in self._iter_blob_refs(store.root, self._blob_cursor):
+            try:
+                if os.stat(store.path(ref)).st_mtime < grace_cutoff:
+                    candidates.append(ref)
+            except FileNotFoundError:
+                pass
+            self._blob_cursor = ref
+            
+            if len(candidates) >= batch_size:
+                purged += self._delete_unreferenced_blobs(store, candidates, grace_cutoff)
+                candidates = []
+            
+            if time.monotonic() >= deadline:
+                purged += self._delete_unreferenced_blobs(store, candidates, grace_cutoff)
+                return purged, False
+        
+        purged += self._delete_unreferenced_blobs(store, candidates, grace_cutoff)
+        self._blob_cursor = ''
+        
+        return purged, True
+    
+    def _purge_keyset(self, model, order_column, condition, deadline: float, columns: tuple = (), before_commit=None) -> tuple:
+        """
+        Delete rows matching a condition in keyset batches of (order_column, id)
+        
+        Args:
+            columns: Extra columns to select for before_commit
+            before_commit: Called with each batch of rows in its delete transaction
+        
+        Returns:
+            tuple: (rows deleted, True if nothing is left to purge)
+        """
+        batch_size = self.batch_size or Config.PURGE_BATCH_SIZE
+        purged = 0
+        last = None
+        
+        while time.monotonic() < deadline:
+            query = db.session.query(order_column, model.id, *columns).filter(condition)
+            if last is not None:
+                query = query.filter(or_(
+                    order_column > last[0],
+                    and_(order_column == last[0], model.id > last[1])
+                ))
+            
+            rows = query.order_by(order_column, model.id).limit(batch_size).all()
+            if not rows:
+                return purged, True
+            
+            try:
+                result = db.session.execute(
+                    delete(model).where(model.id.in_([row.id for row in rows])),
+                    execution_options={'synchronize_session': False}
+                )
+                if before_commit is not None:
+                    before_commit(rows)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            
+            purged += result.rowcount
+            last = tuple(rows[-1])[:2]
+            
+            if len(rows) < batch_size:
+                return purged, True
+        
+        return purged, False
+    
+    def _raise_sync_horizons(self, rows: list):
+        """
+        Move each user's sync horizon past the tombstones being purged
+        
+        Delta sync cursors from before the horizon may have missed a purged
+        deletion and are answered with 410 (full sync). The purge count is
+        bumped as well, so the user's vault version (listing ETag) changes.
+        """
+        newest = {}
+        for row in rows:
+            position = (row.change_xid, row.change_seq or 0)
+            if position > newest.get(row.user_id, (0, 0)):
+                newest[row.user_id] = position
+        
+        horizons = {horizon.user_id: horizon for horizon in SyncHorizon.query.filter(SyncHorizon.user_id.in_(newest))}
+        for user_id, (change_xid, change_seq) in newest.items():
+            horizon = horizons.get(user_id)
+            if horizon is None:
+                db.session.add(SyncHorizon(user_id=user_id, change_xid=change_xid, change_seq=change_seq, purges=1))
+                continue
+            if (change_xid, change_seq) > (horizon.change_xid, horizon.change_seq):
+                horizon.change_xid, horizon.change_seq = change_xid, change_seq
+            horizon.purges = SyncHorizon.purges + 1
+    
+    def _delete_unreferenced_blobs(self, store, refs: list, grace_cutoff: float) -> int:
+        """Delete the blobs in refs that no note row points to and nobody re-used since grace_cutoff"""
+        if not refs:
+            return 0
+        
+        referenced = {row.blob_ref for row in db.session.query(Note.blob_ref).filter(Note.blob_ref.in_(refs))}
+        db.session.commit()
+        
+        # A put of the same content may have refreshed the blob after the stat
+        # above, its row not committed yet: delete re-checks the mtime
+        return sum(1 for ref in refs if ref not in referenced and store.delete(ref, older_than=grace_cutoff))
+    
+    @staticmethod
+    def _iter_blob_refs(root: str, after: str):
+        """Yield blob references under root in sorted order, starting after a reference"""
+        for first in sorted(os.listdir(root)):
+            if len(first) != 2 or first < after[:2]:
+                continue
+            first_dir = os.path.join(root, first)
+            for second in sorted(os.listdir(first_dir)):
+                if len(second) != 2 or first + second < after[:4]:
+                    continue
+                for name in sorted(os.listdir(os.path.join(first_dir, second))):
+                    if len(name) == 64 and not name.startswith('.') and name > after:
+                        yield name
+
+@contextmanager
+def purge_lock():
+    """
+    Hold the purge lock for one pass, so only one of many processes purges at a time
+    
+    Uses a session-level advisory lock on a dedicated autocommit connection,
+    which also covers several app servers sharing the database.
+    
+    Yields:
+        bool: True if this process got the lock (always on databases without advisory locks)
+    """
+    if db.engine.dialect.name != 'postgresql':
+        yield True
+        return
+    
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        acquired = conn.execute(select(func.pg_try_advisory_lock(PURGE_LOCK_KEY))).scalar()
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                conn.execute(select(func.pg_advisory_unlock(PURGE_LOCK_KEY)))
+
+class PurgeWorker:
+    """
+    Daemon thread that runs the purger every PURGE_INTERVAL_SECONDS
+    
+    Every serving process may run one; passes are serialized by purge_lock.
+    """
+    
+    def __init__(self, app, interval: float = None, purger: Purger = None):
+        self.app = app
+        self.interval = interval if interval is not None else Config.PURGE_INTERVAL_SECONDS
+        self.purger = purger or Purger()
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def start(self):
+        """Start the worker thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='purge-worker', daemon=True)
+            self._thread.start()
+    
+    def stop(self, timeout: float = None):
+        """Ask the worker to stop and wait for it"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+    
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            with self.app.app_context():
+                try:
+                    with purge_lock() as acquired:
+                        if not acquired:
+                            continue
+                        report = self.purger.run()
+                    if report['notes'] or report['jwt_blacklist'] or report['blobs']:
+                        self.app.logger.info(f'Purged {report}')
+                except Exception as e:
+                    self.app.logger.error(f'Purge failed: {str(e)}')
+                finally:
+                    db.session.remove()
+
+def start_purge_worker(app):
+    """
+    Start the background purger of a serving process, if PURGE_INTERVAL_SECONDS > 0
+    
+    Call this in the process that serves requests (run.py, asgi.py,
+    gunicorn's post_fork), not in create_app: a thread started in a
+    preloading gunicorn master does not survive the fork into the workers.
+    
+    Returns:
+        PurgeWorker: Started worker, or None if disabled
+    """
+    interval = app.config.get('PURGE_INTERVAL_SECONDS', 0)
+    if interval <= 0:
+        return None
+    
+    worker = PurgeWorker(app, interval=interval)
+    worker.start()
+    return worker
@@ -0,0 +1,165 @@
+"""
+Token bucket rate limiting for bcrypt-heavy endpoints
+"""
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from werkzeug.exceptions import TooManyRequests
+
+class RateLimitExceeded(TooManyRequests):
+    """Raised when a client has used up its token bucket"""
+    
+    def __init__(self, retry_after: float):
+        self.retry_after = max(1, int(retry_after + 0.999))
+        super().__init__('Too many attempts, please retry later', retry_after=self.retry_after)
+
+class LocalTokenBucketStore:
+    """
+    In-memory token buckets, sharded by key hash
+    
+    Each shard has its own lock, so concurrent requests for different keys
+    rarely contend. Shards are bounded LRUs: the least recently used buckets
+    (normally full ones from clients that went away) are evicted first.
+    Buckets are per process; use RedisTokenBucketStore to share them.
+    """
+    
+    def __init__(self, shards: int = 16, max_keys_per_shard: int = 10000):
+        self.max_keys_per_shard = max_keys_per_shard
+        self._shards = [(threading.Lock(), OrderedDict()) for _ in range(shards)]
+    
+    def consume(self, key: str, rate: float, capacity: float, cost: float = 1) -> tuple:
+        """
+        Take tokens from a bucket
+        
+        Args:
+            key: Bucket key (e.g. 'login:ip:1.2.3.4')
+            rate: Tokens added per second
+            capacity: Bucket size (burst)
+            cost: Tokens this request takes
+        
+        Returns:
+            tuple: (allowed, seconds until enough tokens are available)
+        """
+        lock, buckets = self._shards[zlib.crc32(key.encode('utf-8')) % len(self._shards)]
+        now = time.monotonic()
+        
+        with lock:
+            tokens, updated = buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            
+            if tokens >= cost:
+                allowed, retry_after = True, 0.0
+                tokens -= cost
+            else:
+                allowed, retry_after = False, (cost - tokens) / rate
+            
+            buckets[key] = (tokens, now)
+            buckets.move_to_end(key)
+            while len(buckets) > self.max_keys_per_shard:
+                buckets.popitem(last=False)
+        
+        return allowed, retry_after
+    
+    def clear(self):
+        """Reset all buckets"""
+        for lock, buckets in self._shards:
+            with lock:
+                buckets.clear()
+
+# Refill and take atomically on the Redis server, using the server clock
+_REDIS_TOKEN_BUCKET = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local allowed = 0
+local retry_after = 0
+if tokens >= cost then
+    allowed = 1
+    tokens = tokens - cost
+else
+    retry_after = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(retry_after)}
+"""
+
+class RedisTokenBucketStore:
+    """Token buckets shared by all processes through Redis"""
+    
+    def __init__(self, client, prefix: str = 'ratelimit:'):
+        self.client = client
+        self.prefix = prefix
+        self._script = client.register_script(_REDIS_TOKEN_BUCKET)
+    
+    def consume(self, key: str, rate: float, capacity: float, cost: float = 1) -> tuple:
+        allowed, retry_after = self._script(keys=[self.prefix + key], args=[rate, capacity, cost])
+        return bool(allowed), float(retry_after)
+    
+    def clear(self):
+        for key in self.client.scan_iter(match=self.prefix + '*'):
+            self.client.delete(key)
+
+class RateLimiter:
+    """Check requests against per-IP and per-email token buckets"""
+    
+    def __init__(self, store=None):
+        self._store = store
+        self._lock = threading.Lock()
+    
+    def store(self, config):
+        """
+        Get the bucket store, creating it from config on first use
+        
+        Args:
+            config: Flask app config (RATE_LIMIT_STORAGE, RATE_LIMIT_REDIS_URL, RATE_LIMIT_SHARDS)
+        """
+        if self._store is None:
+            with self._lock:
+                if self._store is None:
+                    if config['RATE_LIMIT_STORAGE'] == 'redis':
+                        import redis
+                        
+                        self._store = RedisTokenBucketStore(redis.Redis.from_url(config['RATE_LIMIT_REDIS_URL']))
+                    else:
+                        self._store = LocalTokenBucketStore(shards=config['RATE_LIMIT_SHARDS'])
+        return self._store
+    
+    def check(self, config, scope: str, ip: str = None, email: str = None):
+        """
+        Take one token from the IP bucket and the email bucket, each if given
+        
+        Args:
+            config: Flask app config
+            scope: Endpoint group sharing the buckets (e.g. 'login')
+            ip: Client IP address (optional)
+            email: Account email the request targets (optional)
+        
+        Raises:
+            RateLimitExceeded: If either bucket is empty
+        """
+        store = self.store(config)
+        checks = []
+        if ip:
+            checks.append((f'{scope}:ip:{ip}', config['RATE_LIMIT_IP_PER_MINUTE'], config['RATE_LIMIT_IP_BURST']))
+        if email:
+            checks.append((f'{scope}:email:{email.strip().lower()}', config['RATE_LIMIT_EMAIL_PER_MINUTE'], config['RATE_LIMIT_EMAIL_BURST']))
+        
+        for key, per_minute, burst in checks:
+            allowed, retry_after = store.consume(key, per_minute / 60.0, burst)
+            if not allowed:
+                raise RateLimitExceeded(retry_after)
+    
+    def reset(self):
+        """Reset all buckets (tests)"""
+        if self._store is not None:
+            self._store.clear()
+
+rate_limiter = RateLimiter()
@@ -0,0 +1,101 @@
+"""
+In-memory cache of revoked JWT IDs (jti)
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+from app.models.user import JWTBlacklist
+from app.database import db
+from app.config import Config
+
+# Re-read this much history on each refresh, so rows committed late (or by
+# processes with a slightly different clock) are not skipped
+REFRESH_OVERLAP = timedelta(seconds=60)
+
+class RevocationCache:
+    """
+    Per-process set of revoked token IDs
+    
+    Almost no tokens are ever revoked, so checking a token against an
+    in-memory set avoids a database round trip on every authenticated
+    request. New revocations are pulled incrementally by blacklisted_at at
+    most once per JWT_REVOCATION_REFRESH_SECONDS; revocations made by this
+    process are visible immediately.
+    """
+    
+    def __init__(self, refresh_seconds: float = None):
+        self.refresh_seconds = refresh_seconds
+        self._revoked = {}  # jti -> expires_at
+        self._watermark = None  # Latest blacklisted_at seen
+        self._next_refresh = 0.0
+        self._lock = threading.Lock()
+    
+    def is_revoked(self, jti: str) -> bool:
+        """
+        Check whether a token ID has been revoked
+        
+        Args:
+            jti: Token ID from the jti claim
+            
+        Returns:
+            bool: True if the token was revoked
+        """
+        self._maybe_refresh()
+        return jti in self._revoked
+    
+    def add(self, jti: str, expires_at: datetime):
+        """
+        Record a revocation made by this process
+        
+        Args:
+            jti: Token ID from the jti claim
+            expires_at: Token expiry (entry is dropped after this)
+        """
+        with self._lock:
+            self._revoked[jti] = expires_at
+    
+    def clear(self):
+        """Forget all cached revocations and reload on next check"""
+        with self._lock:
+            self._revoked.clear()
+            self._watermark = None
+            self._next_refresh = 0.0
+    
+    def _maybe_refresh(self):
+        """Pull revocations added since the last refresh, if it is due"""
+        refresh_seconds = self.refresh_seconds
+        if refresh_seconds is None:
+            refresh_seconds = Config.JWT_REVOCATION_REFRESH_SECONDS
+        
+        now = time.monotonic()
+        if now < self._next_refresh:
+            return
+        
+        with self._lock:
+            if now < self._next_refresh:
+                return
+            
+            query = db.session.query(
+                JWTBlacklist.jti,
+                JWTBlacklist.expires_at,
+                JWTBlacklist.blacklisted_at
+            ).filter(
+                JWTBlacklist.jti.isnot(None),
+                JWTBlacklist.expires_at > datetime.utcnow()
+            )
+            if self._watermark is not None:
+                query = query.filter(JWTBlacklist.blacklisted_at >= self._watermark - REFRESH_OVERLAP)
+            
+            for jti, expires_at, blacklisted_at in query:
+                self._revoked[jti] = expires_at
+                if self._watermark is None or blacklisted_at > self._watermark:
+                    self._watermark = blacklisted_at
+            
+            # Drop entries for tokens that have expired anyway
+            utcnow = datetime.utcnow()
+            for jti in [jti for jti, expires_at in self._revoked.items() if expires_at <= utcnow]:
+                del self._revoked[jti]
+            
+            self._next_refresh = now + refresh_seconds
+
+revocation_cache = RevocationCache()
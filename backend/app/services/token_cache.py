@@ -0,0 +1,76 @@
+"""
+In-memory cache of verified JWT payloads
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from app.config import Config
+
+class VerifiedTokenCache:
+    """
+    Per-process LRU of verified token payloads
+    
+    A client sends the same bearer token on every call, so the signature
+    only needs to be checked once. Entries are keyed by a SHA-256 of the
+    token (the raw token is never stored) and expire with the token's exp
+    claim. Revocation is checked separately on every request.
+    """
+    
+    def __init__(self, max_size: int = None):
+        self.max_size = max_size
+        self._entries = OrderedDict()  # token hash -> payload
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def key(token: str) -> bytes:
+        """Cache key for a token"""
+        return hashlib.sha256(token.encode('utf-8')).digest()
+    
+    def get(self, key: bytes):
+        """
+        Get a cached payload that has not expired yet
+        
+        Args:
+            key: Key from VerifiedTokenCache.key
+            
+        Returns:
+            dict: Verified payload, or None on a miss
+        """
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is None:
+                return None
+            
+            if payload['exp'] <= time.time():
+                del self._entries[key]
+                return None
+            
+            self._entries.move_to_end(key)
+            return payload
+    
+    def put(self, key: bytes, payload: dict):
+        """
+        Cache a verified payload
+        
+        Args:
+            key: Key from VerifiedTokenCache.key
+            payload: Payload returned by jwt.decode
+        """
+        if 'exp' not in payload:
+            return
+        
+        max_size = self.max_size if self.max_size is not None else Config.JWT_VERIFIED_CACHE_SIZE
+        
+        with self._lock:
+            self._entries[key] = payload
+            self._entries.move_to_end(key)
+            while len(self._entries) > max_size:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        """Drop all cached payloads"""
+        with self._lock:
+            self._entries.clear()
+
+token_cache = VerifiedTokenCache()
@@ -1,9 +1,11 @@
 """
 User service
 """
+from datetime import datetime
 from app.models.user import User
 from app.database import db
 from app.utils.security import hash_password, verify_password
+from app.services.principal_cache import principal_cache
 
 class UserService:
     """Handle user profile operations"""
@@ -47,6 +49,7 @@ class UserService:
         
         user.name = name
         db.session.commit()
+        principal_cache.invalidate(user_id)
         
         return True
     
@@ -73,8 +76,10 @@ class UserService:
         if not verify_password(old_password, user.password_hash):
             raise ValueError('Invalid old password')
         
-        # Hash and update new password
+        # Hash and update new password; tokens issued before now stop working
         user.password_hash = hash_password(new_password)
+        user.password_changed_at = datetime.utcnow()
         db.session.commit()
+        principal_cache.invalidate(user_id)
         
         return True
@@ -0,0 +1,87 @@
+"""
+ETag helpers for conditional requests on notes
+"""
+import hashlib
+from flask import request, Response
+from app.utils.wire import wants_msgpack
+
+def note_etag(note_id: int, version: int) -> str:
+    """
+    Build the ETag of a single note representation
+    
+    Args:
+        note_id: Note ID
+        version: Note version (bumped on every update)
+        
+    Returns:
+        str: Unquoted ETag value
+    """
+    suffix = '-mp' if wants_msgpack() else ''
+    return f'{note_id}-{version}{suffix}'
+
+def vault_etag(vault_version: str) -> str:
+    """
+    Build the ETag of a listing response
+    
+    The listing depends on the user's vault version, the query string
+    (page, fields, ids) and the negotiated format.
+    
+    Args:
+        vault_version: Version from NoteService.get_vault_version
+        
+    Returns:
+        str: Unquoted ETag value
+    """
+    variant = f'{vault_version}|{request.full_path}|{wants_msgpack()}'
+    return 'v-' + hashlib.sha256(variant.encode('utf-8')).hexdigest()[:32]
+
+def is_not_modified(etag: str) -> bool:
+    """Check If-None-Match against an ETag"""
+    return request.if_none_match.contains_weak(etag)
+
+def not_modified(etag: str):
+    """
+    Build an empty 304 response
+    
+    Returns:
+        tuple: (response, status)
+    """
+    response = Response(status=304)
+    response.set_etag(etag)
+    response.vary.add('Accept')
+    return response, 304
+
+def expected_version(note_id: int):
+    """
+    Get the note version required by If-Match
+    
+    Args:
+        note_id: Note ID being modified
+        
+    Returns:
+        int: Required version, or None if If-Match is absent or '*'
+        
+    Raises:
+        ValueError: If If-Match does not name a version of this note
+    """
+    if_match = request.if_match
+    if not if_match or if_match.star_tag:
+        return None
+    
+    for etag in if_match.as_set():
+        parts = etag.split('-')
+        if len(parts) >= 2 and parts[0] == str(note_id) and parts[1].isdigit():
+            return int(parts[1])
+    
+    raise ValueError('If-Match does not match this note')
+
+def with_etag(result, etag: str):
+    """
+    Attach an ETag to a (response, status) tuple from respond()
+    
+    Returns:
+        tuple: (response, status)
+    """
+    response, status = result
+    response.set_etag(etag)
+    return response, status
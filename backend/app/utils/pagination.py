@@ -0,0 +1,120 @@
+"""
+Keyset (cursor) pagination utilities
+"""
+import base64
+from datetime import datetime
+from app.config import Config
+
+def encode_cursor(created_at: datetime, note_id: int) -> str:
+    """
+    Encode the position of the last row of a page into an opaque cursor
+    
+    Args:
+        created_at: created_at of the last row
+        note_id: id of the last row
+    
+    Returns:
+        str: URL-safe opaque cursor
+    """
+    raw = f'{created_at.isoformat()}|{note_id}'.encode('utf-8')
+    
+    return base64.urlsafe_b64encode(raw).decode('utf-8').rstrip('=')
+
+def decode_cursor(cursor: str) -> tuple:
+    """
+    Decode an opaque cursor back into its (created_at, id) position
+    
+    Args:
+        cursor: Cursor previously returned by encode_cursor
+    
+    Returns:
+        tuple: (created_at, note_id)
+    
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode('utf-8')).decode('utf-8')
+        created_at, note_id = raw.split('|', 1)
+        return datetime.fromisoformat(created_at), int(note_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError('Invalid cursor')
+
+def encode_change_cursor(change_xid: int, change_seq: int, note_id: int) -> str:
+    """
+    Encode a delta sync position into an opaque cursor
+    
+    Args:
+        change_xid: change_xid of the last change returned
+        change_seq: change_seq of the last change returned
+        note_id: id of the last change returned
+        
+    Returns:
+        str: URL-safe opaque cursor
+    """
+    raw = f'x|{change_xid}|{change_seq}|{note_id}'.encode('utf-8')
+    
+    return base64.urlsafe_b64encode(raw).decode('utf-8').rstrip('=')
+
+def decode_change_cursor(cursor: str) -> tuple:
+    """
+    Decode a delta sync cursor back into its (change_xid, change_seq, id) position
+    
+    Cursors issued before change_xid existed ('c|seq|id') decode with
+    change_xid 0, which every row written before then still has.
+    
+    Args:
+        cursor: Cursor previously returned by encode_change_cursor
+        
+    Returns:
+        tuple: (change_xid, change_seq, note_id)
+        
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode('utf-8')).decode('utf-8')
+        kind, *position = raw.split('|')
+        if kind == 'c' and len(position) == 2:
+            position = [0] + position
+        elif kind != 'x' or len(position) != 3:
+            raise ValueError('Invalid cursor')
+        change_xid, change_seq, note_id = position
+        return int(change_xid), int(change_seq), int(note_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError('Invalid cursor')
+
+def parse_limit(value, default: int = None, maximum: int = None) -> int:
+    """
+    Parse and clamp a page size query parameter
+    
+    Args:
+        value: Raw query parameter value (may be None)
+        default: Page size when value is missing (default from config)
+        maximum: Upper bound for the page size (default from config)
+    
+    Returns:
+        int: Page size between 1 and maximum
+    
+    Raises:
+        ValueError: If value is not a positive integer
+    """
+    if default is None:
+        default = Config.NOTES_PAGE_SIZE_DEFAULT
+    if maximum is None:
+        maximum = Config.NOTES_PAGE_SIZE_MAX
+    
+    if value is None or value == '':
+        return default
+    
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise ValueError('Invalid limit')
+    
+    if limit < 1:
+        raise ValueError('Invalid limit')
+    
+    return min(limit, maximum)
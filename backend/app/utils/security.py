@@ -2,9 +2,106 @@
 Security utilities for password hashing and encryption
 """
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import bcrypt
+from flask import current_app, has_app_context
 from app.config import Config
 
+class PasswordHashingBusy(Exception):
+    """Raised when the password hashing pool is saturated"""
+    
+    def __init__(self, retry_after: int = None):
+        super().__init__('Password hashing is busy, please retry later')
+        self.retry_after = retry_after if retry_after is not None else Config.PASSWORD_HASH_RETRY_AFTER
+
+class PasswordWorkerPool:
+    """
+    Bounded thread pool for bcrypt work with admission control
+    
+    bcrypt releases the GIL, so a few threads are enough to keep password
+    work off the request path. At most workers + queue_size jobs are admitted;
+    anything beyond that fails fast with PasswordHashingBusy instead of
+    queueing behind an auth storm.
+    """
+    
+    def __init__(self, workers: int, queue_size: int):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bcrypt')
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+    
+    def run(self, fn, *args):
+        """
+        Run fn(*args) on the pool and wait for its result
+        
+        Raises:
+            PasswordHashingBusy: If the pool and its queue are full
+        """
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHashingBusy()
+        
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result()
+    
+    def shutdown(self):
+        """Stop the pool threads"""
+        self._executor.shutdown(wait=False)
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+def get_password_pool():
+    """
+    Get the per-process password worker pool (None when running inline)
+    
+    The pool is created lazily and re-created after fork, since worker
+    threads do not survive into child processes.
+    """
+    global _pool, _pool_pid
+    
+    if Config.PASSWORD_HASH_WORKERS <= 0:
+        return None
+    
+    if _pool is None or _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool_pid != os.getpid():
+                _pool = PasswordWorkerPool(Config.PASSWORD_HASH_WORKERS, Config.PASSWORD_HASH_QUEUE_SIZE)
+                _pool_pid = os.getpid()
+    
+    return _pool
+
+def _run_password_work(fn, *args):
+    """Run bcrypt work on the worker pool, or inline if the pool is disabled"""
+    # The app's own setting when there is one (metrics are registered per app)
+    if current_app.config['METRICS_ENABLED'] if has_app_context() else Config.METRICS_ENABLED:
+        fn = _timed_password_work(fn)
+    
+    pool = get_password_pool()
+    if pool is None:
+        return fn(*args)
+    
+    return pool.run(fn, *args)
+
+def _timed_password_work(fn):
+    """Wrap fn so the time it runs (not its wait for a worker) is recorded"""
+    from app.services.metrics import observe_password_work
+    
+    def timed(*args):
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            observe_password_work(fn.__name__, time.perf_counter() - started)
+    
+    return timed
+
 def generate_salt(size: int = None) -> bytes:
     """
     Generate a random salt for PBKDF2 key derivation
@@ -29,10 +126,13 @@ def hash_password(password: str) -> str:
         
     Returns:
         str: Hashed password
+        
+    Raises:
+        PasswordHashingBusy: If the password worker pool is saturated
     """
     password_bytes = password.encode('utf-8')
     salt = bcrypt.gensalt(rounds=Config.BCRYPT_LOG_ROUNDS)
-    hashed = bcrypt.hashpw(password_bytes, salt)
+    hashed = _run_password_work(bcrypt.hashpw, password_bytes, salt)
     
     return hashed.decode('utf-8')
 
@@ -46,11 +146,14 @@ def verify_password(password: str, password_hash: str) -> bool:
         
     Returns:
         bool: True if password matches hash
+        
+    Raises:
+        PasswordHashingBusy: If the password worker pool is saturated
     """
     password_bytes = password.encode('utf-8')
     hash_bytes = password_hash.encode('utf-8')
     
-    return bcrypt.checkpw(password_bytes, hash_bytes)
+    return _run_password_work(bcrypt.checkpw, password_bytes, hash_bytes)
 
 def derive_key_pbkdf2(password: str, salt: bytes, iterations: int = None) -> bytes:
     """
@@ -0,0 +1,25 @@
+"""
+ASGI Application Entry Point
+Run this with an ASGI server: uvicorn asgi:app --host 0.0.0.0 --port 5000
+
+Connections (including idle keep-alive ones) are handled by the server's
+event loop. Requests run the same Flask app on a thread pool sized to the
+database pool (ASGI_THREADS), so concurrency is bounded by database
+connections instead of by the number of worker processes.
+"""
+
+import sys
+import os
+
+# Add backend directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from a2wsgi import WSGIMiddleware
+from app.main import app as flask_app
+from app.config import Config
+from app.services.purger import start_purge_worker
+
+# Each server process imports this module itself (no fork after import)
+start_purge_worker(flask_app)
+
+app = WSGIMiddleware(flask_app, workers=Config.ASGI_THREADS)
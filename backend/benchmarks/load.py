@@ -0,0 +1,279 @@
+"""
+End-to-end load benchmark with vault-size scaling scenarios
+
+For each vault size, creates a fresh schema, seeds one user with that many
+notes and drives register, login, list, get, update and delete at a fixed
+concurrency through the full Flask stack (routes, auth, services, database).
+Each size runs in its own interpreter so peak RSS is per scenario.
+
+Reports p50/p95/p99 latency, throughput and errors per operation and peak
+RSS per scenario as JSON.
+
+Usage (from backend/):
+    python benchmarks/load.py --sizes 10,1000,100000 --output load.json
+    python benchmarks/load.py --database-url postgresql://localhost/notes_bench
+
+The schema is dropped and re-created: only point --database-url at a
+database dedicated to benchmarking. Without it a temporary SQLite file is
+used as a stand-in.
+"""
+
+import argparse
+import base64
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+OPERATIONS = ('register', 'login', 'list', 'get', 'update', 'delete')
+VAULT_EMAIL = 'vault@example.com'
+PASSWORD = 'BenchPassword123!'
+SEED_BATCH_SIZE = 5000
+
+def percentile(latencies: list, p: float):
+    """Latency percentile in milliseconds of a sorted list (None if empty)"""
+    return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else None
+
+def random_note(rng: random.Random, note_size: int) -> dict:
+    """Random ciphertext, IV and tag, base64 encoded like the client sends them"""
+    return {
+        'encrypted_content': base64.b64encode(rng.randbytes(note_size)).decode(),
+        'iv': base64.b64encode(rng.randbytes(16)).decode(),
+        'auth_tag': base64.b64encode(rng.randbytes(16)).decode()
+    }
+
+def seed_notes(db, Note, user_id: int, count: int, note_size: int, rng: random.Random, start: int = 0):
+    """Insert count notes for a user in batches, bypassing the API"""
+    from sqlalchemy import insert, text
+    
+    base_time = datetime(2024, 1, 1)
+    for batch_start in range(start, start + count, SEED_BATCH_SIZE):
+        rows = []
+        for i in range(batch_start, min(batch_start + SEED_BATCH_SIZE, start + count)):
+            created_at = base_time + timedelta(seconds=i)
+            rows.append({
+                'user_id': user_id,
+                'encrypted_content': rng.randbytes(note_size),
+                'iv': rng.randbytes(16),
+                'auth_tag': rng.randbytes(16),
+                'created_at': created_at,
+                'updated_at': created_at,
+                'is_deleted': False,
+                'version': 1,
+                'change_seq': i + 1
+            })
+        db.session.execute(insert(Note), rows)
+        db.session.commit()
+    
+    # Keep the change sequence ahead of the explicit values above
+    if db.engine.dialect.name == 'postgresql':
+        db.session.execute(text("SELECT setval('notes_change_seq', :value)"), {'value': start + count})
+        db.session.commit()
+
+def run_operation(app, name: str, requests: list, concurrency: int, expected_status: int) -> dict:
+    """
+    Send requests with a fixed number in flight and collect latencies
+    
+    Args:
+        requests: (method, path, kwargs) tuples for the test client
+    """
+    local = threading.local()
+    
+    def send(spec):
+        if not hasattr(local, 'client'):
+            local.client = app.test_client()
+        method, path, kwargs = spec
+        start = time.perf_counter()
+        response = local.client.open(path, method=method, **kwargs)
+        elapsed = time.perf_counter() - start
+        response.close()
+        return elapsed, response.status_code == expected_status
+    
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix=f'bench-{name}') as executor:
+        results = list(executor.map(send, requests))
+    duration = time.perf_counter() - start
+    
+    latencies = sorted(elapsed for elapsed, ok in results if ok)
+    return {
+        'requests': len(results),
+        'errors': sum(1 for _, ok in results if not ok),
+        'throughput_rps': len(latencies) / duration if duration else None,
+        'p50_ms': percentile(latencies, 0.50),
+        'p95_ms': percentile(latencies, 0.95),
+        'p99_ms': percentile(latencies, 0.99)
+    }
+
+def run_scenario(size: int, args) -> dict:
+    """Seed a vault of the given size and benchmark every operation against it"""
+    from app.main import create_app
+    from app.config import Config
+    from app.database import db
+    from app.models.user import User
+    from app.models.note import Note
+    from app.utils.security import hash_password, generate_salt
+    
+    sqlite_path = None
+    if args.database_url:
+        database_url = args.database_url
+        engine_options = dict(Config.SQLALCHEMY_ENGINE_OPTIONS, pool_size=max(args.concurrency, 5))
+    else:
+        fd, sqlite_path = tempfile.mkstemp(prefix='notes-bench-', suffix='.db')
+        os.close(fd)
+        database_url = f'sqlite:///{sqlite_path}'
+        engine_options = {'connect_args': {'timeout': 30}}
+    
+    class BenchmarkConfig(Config):
+        SQLALCHEMY_DATABASE_URI = database_url
+        SQLALCHEMY_ENGINE_OPTIONS = engine_options
+        RATE_LIMIT_ENABLED = False
+    
+    app = create_app(BenchmarkConfig)
+    rng = random.Random(args.seed)
+    
+    try:
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            
+            # Seed the vault user and its notes (not timed)
+            seed_start = time.perf_counter()
+            user = User(email=VAULT_EMAIL, password_hash=hash_password(PASSWORD), name='Vault', salt=generate_salt())
+            db.session.add(user)
+            db.session.commit()
+            user_id = user.id
+            seed_notes(db, Note, user_id, size, args.note_size, rng)
+            seed_seconds = time.perf_counter() - seed_start
+            note_ids = [row.id for row in db.session.query(Note.id).filter(Note.user_id == user_id)]
+        
+        client = app.test_client()
+        token = client.post('/api/auth/login', json={'email': VAULT_EMAIL, 'password': PASSWORD}).json['token']
+        headers = {'Authorization': f'Bearer {token}'}
+        n = args.requests
+        
+        plans = {
+            'register': (201, [
+                ('POST', '/api/auth/register', {'json': {'email': f'bench-{i}@example.com', 'password': PASSWORD}})
+                for i in range(n)
+            ]),
+            'login': (200, [
+                ('POST', '/api/auth/login', {'json': {'email': VAULT_EMAIL, 'password': PASSWORD}})
+                for _ in range(n)
+            ]),
+            'list': (200, [
+                ('GET', f'/api/notes?limit={args.page_size}', {'headers': headers})
+                for _ in range(n)
+            ]),
+            'get': (200, [
+                ('GET', f'/api/notes/{rng.choice(note_ids)}', {'headers': headers})
+                for _ in range(n)
+            ]),
+            'update': (200, [
+                ('PUT', f'/api/notes/{rng.choice(note_ids)}', {'headers': headers, 'json': random_note(rng, args.note_size)})
+                for _ in range(n)
+            ])
+        }
+        
+        operations = {}
+        for name in args.operations:
+            if name == 'delete':
+                # Delete extra notes seeded just for this, so earlier operations saw exactly `size` notes
+                with app.app_context():
+                    seed_notes(db, Note, user_id, n, args.note_size, rng, start=size)
+                    delete_ids = [row.id for row in db.session.query(Note.id).filter(Note.user_id == user_id).order_by(Note.id.desc()).limit(n)]
+                operations[name] = run_operation(app, name, [
+                    ('DELETE', f'/api/notes/{note_id}', {'headers': headers}) for note_id in delete_ids
+                ], args.concurrency, 200)
+            else:
+                expected_status, requests = plans[name]
+                operations[name] = run_operation(app, name, requests, args.concurrency, expected_status)
+        
+        return {
+            'notes': size,
+            'seed_seconds': seed_seconds,
+            'operations': operations,
+            # ru_maxrss is in kilobytes on Linux and bytes on macOS
+            'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+        }
+    finally:
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        if sqlite_path:
+            os.remove(sqlite_path)
+
+def run_isolated(size: int, argv: list) -> dict:
+    """Run one scenario in a fresh interpreter and return its result"""
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--scenario', str(size)] + argv,
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f'Scenario with {size} notes failed:\n{result.stderr}')
+    return json.loads(result.stdout)
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end load benchmark over vault sizes')
+    parser.add_argument('--sizes', default='10,1000,100000', help='Comma separated notes per seeded vault')
+    parser.add_argument('--operations', default=','.join(OPERATIONS), help='Comma separated: ' + ', '.join(OPERATIONS))
+    parser.add_argument('--requests', type=int, default=200, help='Requests per operation')
+    parser.add_argument('--concurrency', type=int, default=8, help='Requests in flight')
+    parser.add_argument('--note-size', type=int, default=512, help='Ciphertext bytes per note')
+    parser.add_argument('--page-size', type=int, default=50, help='Notes per page when listing')
+    parser.add_argument('--bcrypt-rounds', type=int, default=None, help='Override BCRYPT_LOG_ROUNDS')
+    parser.add_argument('--database-url', default=os.getenv('BENCH_DATABASE_URL'),
+                        help='Dedicated benchmark database (default: temporary SQLite file)')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed')
+    parser.add_argument('--output', default='-', help='JSON report path (- for stdout)')
+    parser.add_argument('--scenario', type=int, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    args.operations = [name for name in args.operations.split(',') if name]
+    unknown = set(args.operations) - set(OPERATIONS)
+    if unknown:
+        parser.error(f'Unknown operations: {", ".join(sorted(unknown))}')
+    
+    # Config reads the environment at import time
+    if args.bcrypt_rounds is not None:
+        os.environ['BCRYPT_LOG_ROUNDS'] = str(args.bcrypt_rounds)
+    os.environ['PURGE_INTERVAL_SECONDS'] = '0'
+    
+    if args.scenario is not None:
+        print(json.dumps(run_scenario(args.scenario, args)))
+        return
+    
+    from sqlalchemy.engine import make_url
+    
+    scenarios = [run_isolated(int(size), sys.argv[1:]) for size in args.sizes.split(',')]
+    
+    report = {
+        'timestamp': datetime.utcnow().isoformat() + 'Z',
+        'database': make_url(args.database_url).get_backend_name() if args.database_url else 'sqlite',
+        'requests': args.requests,
+        'concurrency': args.concurrency,
+        'note_size': args.note_size,
+        'bcrypt_rounds': int(os.getenv('BCRYPT_LOG_ROUNDS', 12)),
+        'scenarios': scenarios
+    }
+    
+    output = json.dumps(report, indent=2)
+    if args.output == '-':
+        print(output)
+    else:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,306 @@
+"""
+Micro-benchmarks for the code every request runs
+
+Times small hot paths in-process (serialization, base64, token checks, the
+auth decorator, request validation, key derivation) and compares them with
+a stored baseline.
+
+Usage (from backend/):
+    python benchmarks/micro.py run                       # print results
+    python benchmarks/micro.py save                      # run and store as the baseline
+    python benchmarks/micro.py compare --max-slowdown 1.25
+    python benchmarks/micro.py compare --filter base64,to_dict
+
+compare exits with status 1 when any benchmark is slower than the baseline
+by more than --max-slowdown. Baselines are only comparable on the same
+machine and Python version; save a new one after changing either.
+"""
+
+import argparse
+import base64
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+DEFAULT_BASELINE = os.path.join(BACKEND_DIR, 'benchmarks', 'baselines', 'micro.json')
+NOTE_SIZES = (512, 4096, 65536)
+PASSWORD = 'BenchPassword123!'
+
+BENCHMARKS = {}  # name -> setup(context) returning a zero-argument callable
+
+def benchmark(name: str):
+    """Register a benchmark setup function under a name"""
+    def decorator(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return decorator
+
+def payload(size: int) -> bytes:
+    """Deterministic ciphertext-like bytes"""
+    return bytes(range(256)) * (size // 256) + bytes(size % 256)
+
+def make_note(size: int = 512):
+    """Transient note with every column set, as loaded from the database"""
+    from app.models.note import Note
+    
+    now = datetime(2024, 1, 1)
+    return Note(
+        id=1, user_id=1, encrypted_content=payload(size), iv=payload(16), auth_tag=payload(16),
+        created_at=now, updated_at=now, is_deleted=False, deleted_at=None, version=1, change_seq=1
+    )
+
+@benchmark('note_to_dict')
+def bench_note_to_dict(context):
+    note = make_note()
+    return note.to_dict
+
+@benchmark('note_to_dict_binary')
+def bench_note_to_dict_binary(context):
+    note = make_note()
+    return lambda: note.to_dict(binary=True)
+
+for _size in NOTE_SIZES:
+    @benchmark(f'base64_encode_{_size}')
+    def bench_base64_encode(context, size=_size):
+        data = payload(size)
+        return lambda: base64.b64encode(data).decode('utf-8')
+    
+    @benchmark(f'base64_decode_{_size}')
+    def bench_base64_decode(context, size=_size):
+        data = base64.b64encode(payload(size)).decode('utf-8')
+        return lambda: base64.b64decode(data)
+
+@benchmark('verify_token_decode')
+def bench_verify_token_decode(context):
+    from app.services.token_cache import token_cache
+    
+    verify_token, token = context['auth_service'].verify_token, context['token']
+    
+    def run():
+        # Miss the verified token cache so jwt.decode runs every time
+        token_cache.clear()
+        verify_token(token)
+    return run
+
+@benchmark('verify_token_cached')
+def bench_verify_token_cached(context):
+    verify_token, token = context['auth_service'].verify_token, context['token']
+    verify_token(token)
+    return lambda: verify_token(token)
+
+@benchmark('require_auth')
+def bench_require_auth(context):
+    from app.middleware.auth_middleware import require_auth
+    
+    @require_auth
+    def view(current_user):
+        return current_user
+    
+    # The request context stays pushed for the whole run (popped in run_benchmarks)
+    request_context = context['app'].test_request_context(headers={'Authorization': f"Bearer {context['token']}"})
+    request_context.push()
+    context['cleanup'].append(request_context.pop)
+    view()
+    return view
+
+@benchmark('validate_change_password')
+def bench_validate_change_password(context):
+    from app.schemas.user import ChangePassword
+    from app.utils.validators import validate_request
+    
+    data = {'old_password': PASSWORD, 'new_password': 'NewBenchPassword456!'}
+    return lambda: validate_request(ChangePassword, data)
+
+@benchmark('validate_note_create')
+def bench_validate_note_create(context):
+    from app.schemas.note import NoteCreate
+    from app.utils.validators import validate_request
+    
+    data = {
+        'encrypted_content': base64.b64encode(payload(512)).decode('utf-8'),
+        'iv': base64.b64encode(payload(16)).decode('utf-8'),
+        'auth_tag': base64.b64encode(payload(16)).decode('utf-8')
+    }
+    return lambda: validate_request(NoteCreate, data)
+
+@benchmark('derive_key_pbkdf2')
+def bench_derive_key_pbkdf2(context):
+    from app.utils.security import derive_key_pbkdf2
+    
+    salt = payload(16)
+    return lambda: derive_key_pbkdf2(PASSWORD, salt)
+
+def create_context() -> dict:
+    """App with an in-memory database, one user and a token for that user"""
+    from app.main import create_app
+    from app.config import TestingConfig
+    from app.database import db
+    from app.models.user import User
+    from app.services.auth_service import AuthService
+    from app.utils.security import generate_salt
+    
+    app = create_app(TestingConfig)
+    app_context = app.app_context()
+    app_context.push()
+    db.create_all()
+    
+    user = User(email='bench@example.com', password_hash='unused', name='Bench', salt=generate_salt())
+    db.session.add(user)
+    db.session.commit()
+    
+    auth_service = AuthService()
+    return {
+        'app': app,
+        'auth_service': auth_service,
+        'token': auth_service._generate_token(user.id),
+        'cleanup': [app_context.pop]
+    }
+
+def measure(fn, min_time: float, repeat: int) -> dict:
+    """
+    Time fn in loops of at least min_time seconds
+    
+    Returns:
+        dict: Best and median time per call in microseconds, and loops per repeat
+    """
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        loops *= 2 if elapsed < min_time / 10 else max(2, int(min_time / elapsed) + 1)
+    
+    timings = [elapsed / loops]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        timings.append((time.perf_counter() - start) / loops)
+    
+    return {
+        'best_us': min(timings) * 1e6,
+        'median_us': statistics.median(timings) * 1e6,
+        'loops': loops
+    }
+
+def environment() -> dict:
+    """What a baseline is only comparable with"""
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'system': platform.system(),
+        'cpu_count': os.cpu_count()
+    }
+
+def run_benchmarks(names: list, min_time: float, repeat: int) -> dict:
+    """Run the named benchmarks and return a results document"""
+    context = create_context()
+    results = {}
+    try:
+        for name in names:
+            results[name] = measure(BENCHMARKS[name](context), min_time, repeat)
+            print(f"{name:<28} {results[name]['best_us']:>12.2f} us", file=sys.stderr)
+    finally:
+        for cleanup in reversed(context['cleanup']):
+            cleanup()
+    
+    return {
+        'timestamp': datetime.utcnow().isoformat() + 'Z',
+        'environment': environment(),
+        'benchmarks': results
+    }
+
+def compare(baseline: dict, results: dict, max_slowdown: float) -> list:
+    """
+    Compare best times against a baseline
+    
+    Args:
+        baseline: Results document stored with `save`
+        results: Results document of the current run
+        max_slowdown: Largest accepted ratio of current to baseline time
+    
+    Returns:
+        list: (name, baseline us, current us, ratio) of each benchmark over the limit
+    """
+    regressions = []
+    for name, current in results['benchmarks'].items():
+        reference = baseline['benchmarks'].get(name)
+        if reference is None:
+            continue
+        ratio = current['best_us'] / reference['best_us']
+        if ratio > max_slowdown:
+            regressions.append((name, reference['best_us'], current['best_us'], ratio))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Micro-benchmarks of per-request hot paths')
+    parser.add_argument('command', choices=('run', 'save', 'compare', 'list'))
+    parser.add_argument('--filter', default='', help='Comma separated substrings of benchmark names')
+    parser.add_argument('--min-time', type=float, default=0.1, help='Seconds per timing loop')
+    parser.add_argument('--repeat', type=int, default=5, help='Timing loops per benchmark')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='Baseline file')
+    parser.add_argument('--results', default=None, help='compare: existing results file instead of running')
+    parser.add_argument('--max-slowdown', type=float, default=1.25, help='compare: fail above this ratio to the baseline')
+    parser.add_argument('--output', default=None, help='run: also write results to this file')
+    args = parser.parse_args()
+    
+    patterns = [pattern for pattern in args.filter.split(',') if pattern]
+    names = [name for name in BENCHMARKS if not patterns or any(pattern in name for pattern in patterns)]
+    
+    if args.command == 'list':
+        print('\n'.join(names))
+        return 0
+    
+    if args.command == 'compare' and args.results:
+        with open(args.results) as f:
+            results = json.load(f)
+    else:
+        results = run_benchmarks(names, args.min_time, args.repeat)
+    
+    if args.command in ('run', 'save'):
+        path = args.baseline if args.command == 'save' else args.output
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with open(path, 'w') as f:
+                f.write(json.dumps(results, indent=2) + '\n')
+            print(f'Wrote {path}', file=sys.stderr)
+        else:
+            print(json.dumps(results, indent=2))
+        return 0
+    
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    
+    if baseline['environment'] != results['environment']:
+        print(f"Warning: baseline was measured on {baseline['environment']}, now {results['environment']}", file=sys.stderr)
+    
+    regressions = compare(baseline, results, args.max_slowdown)
+    
+    print(f"{'benchmark':<28} {'baseline us':>12} {'current us':>12} {'ratio':>7}")
+    for name, current in results['benchmarks'].items():
+        reference = baseline['benchmarks'].get(name)
+        if reference is None:
+            print(f"{name:<28} {'-':>12} {current['best_us']:>12.2f} {'new':>7}")
+            continue
+        ratio = current['best_us'] / reference['best_us']
+        marker = '  SLOWER' if ratio > args.max_slowdown else ''
+        print(f"{name:<28} {reference['best_us']:>12.2f} {current['best_us']:>12.2f} {ratio:>6.2f}x{marker}")
+    
+    if regressions:
+        print(f'{len(regressions)} benchmark(s) slower than {args.max_slowdown:.2f}x the baseline', file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,183 @@
+"""
+Serving mode benchmark: sync WSGI (gunicorn) vs ASGI (uvicorn + asgi.py)
+
+Starts the API in each mode, holds --idle connections open without sending
+anything (slow or idle clients) and measures the throughput and latency of
+--concurrency active keep-alive clients listing notes.
+
+Usage (from backend/):
+    DATABASE_URL=postgresql://... python benchmarks/serving.py --idle 200 --concurrency 32
+"""
+
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+EMAIL = 'bench@example.com'
+PASSWORD = 'BenchPassword123!'
+
+def server_command(mode: str, port: int, workers: int) -> list:
+    """Command line that serves the API in the given mode"""
+    if mode == 'sync':
+        return [sys.executable, '-m', 'gunicorn', '--workers', str(workers), '--worker-class', 'sync',
+                '--bind', f'127.0.0.1:{port}', '--log-level', 'warning', 'app.main:app']
+    
+    return [sys.executable, '-m', 'uvicorn', '--workers', str(workers), '--host', '127.0.0.1',
+            '--port', str(port), '--log-level', 'warning', 'asgi:app']
+
+def wait_until_up(port: int, timeout: float = 30):
+    """Wait until the server answers /health"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            conn.request('GET', '/health')
+            if conn.getresponse().status == 200:
+                conn.close()
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError('Server did not start')
+
+def request(conn, method: str, path: str, body: dict = None, token: str = None):
+    """Send one request and return (status, parsed JSON body)"""
+    headers = {'Content-Type': 'application/json'}
+    if token:
+        headers['Authorization'] = f'Bearer {token}'
+    
+    conn.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+    response = conn.getresponse()
+    data = response.read()
+    return response.status, json.loads(data) if data else None
+
+def get_token(port: int) -> str:
+    """Register (if needed) and log in the benchmark user"""
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    request(conn, 'POST', '/api/auth/register', {'email': EMAIL, 'password': PASSWORD})
+    status, body = request(conn, 'POST', '/api/auth/login', {'email': EMAIL, 'password': PASSWORD})
+    conn.close()
+    
+    if status != 200:
+        raise RuntimeError(f'Login failed: {body}')
+    return body['token']
+
+def open_idle_connections(port: int, count: int) -> list:
+    """Open connections that never send a request"""
+    sockets = []
+    for _ in range(count):
+        try:
+            sockets.append(socket.create_connection(('127.0.0.1', port), timeout=5))
+        except OSError:
+            break
+    return sockets
+
+def run_clients(port: int, token: str, path: str, concurrency: int, duration: float, timeout: float) -> dict:
+    """Run active clients for a fixed duration and collect latencies"""
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+    
+    def client():
+        conn = None
+        local = []
+        local_errors = 0
+        while time.monotonic() < stop_at:
+            try:
+                if conn is None:
+                    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+                start = time.perf_counter()
+                status, _ = request(conn, 'GET', path, token=token)
+                if status != 200:
+                    local_errors += 1
+                else:
+                    local.append(time.perf_counter() - start)
+            except (OSError, http.client.HTTPException):
+                local_errors += 1
+                if conn is not None:
+                    conn.close()
+                conn = None
+        if conn is not None:
+            conn.close()
+        with lock:
+            latencies.extend(local)
+            errors[0] += local_errors
+    
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    latencies.sort()
+    
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else None
+    
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'rps': len(latencies) / duration,
+        'p50_ms': percentile(0.50),
+        'p99_ms': percentile(0.99)
+    }
+
+def bench_mode(mode: str, args) -> dict:
+    """Start the server in one mode and benchmark it"""
+    env = dict(os.environ, PYTHONPATH=BACKEND_DIR, DEBUG='False')
+    server = subprocess.Popen(server_command(mode, args.port, args.workers), cwd=BACKEND_DIR, env=env)
+    
+    try:
+        wait_until_up(args.port)
+        token = get_token(args.port)
+        
+        idle = open_idle_connections(args.port, args.idle)
+        try:
+            result = run_clients(args.port, token, args.path, args.concurrency, args.duration, args.timeout)
+        finally:
+            for sock in idle:
+                sock.close()
+        
+        result['idle_connections'] = len(idle)
+        return result
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare sync WSGI and ASGI serving modes')
+    parser.add_argument('--modes', default='sync,asgi', help='Comma separated: sync, asgi')
+    parser.add_argument('--workers', type=int, default=2, help='Server processes per mode')
+    parser.add_argument('--idle', type=int, default=200, help='Idle connections held open')
+    parser.add_argument('--concurrency', type=int, default=32, help='Active clients')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds per mode')
+    parser.add_argument('--timeout', type=float, default=10, help='Client timeout in seconds')
+    parser.add_argument('--path', default='/api/notes?limit=20', help='Path requested by active clients')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--create-tables', action='store_true', help='Create tables before running')
+    args = parser.parse_args()
+    
+    if args.create_tables:
+        from app.main import app
+        from app.database import db
+        with app.app_context():
+            db.create_all()
+    
+    print(f"{'mode':<6} {'idle':>5} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for mode in args.modes.split(','):
+        result = bench_mode(mode, args)
+        p50 = f"{result['p50_ms']:.1f}" if result['p50_ms'] is not None else '-'
+        p99 = f"{result['p99_ms']:.1f}" if result['p99_ms'] is not None else '-'
+        print(f"{mode:<6} {result['idle_connections']:>5} {result['rps']:>9.1f} {p50:>8} {p99:>8} {result['errors']:>7}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Gunicorn configuration (production)
+Run: gunicorn app.main:app   (this file is picked up from the working directory)
+  or: python run.py --prod
+
+The app is imported once in the master (preload_app) and gc.freeze() moves
+everything allocated so far into the permanent generation, so the garbage
+collector in the workers never touches (and copies) those shared pages.
+Each worker then replaces the inherited SQLAlchemy pool with its own.
+"""
+
+import gc
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+_started = time.perf_counter()
+
+# Add backend directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.config import Config
+
+bind = os.getenv('GUNICORN_BIND', f'{Config.HOST}:{Config.PORT}')
+
+# One process per core; threads overlap database and bcrypt waits inside a process
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+worker_class = 'gthread'
+# Never more threads than the database pool can serve at once
+threads = min(
+    int(os.getenv('GUNICORN_THREADS', 4)),
+    Config.SQLALCHEMY_ENGINE_OPTIONS['pool_size'] + Config.SQLALCHEMY_ENGINE_OPTIONS.get('max_overflow', 10)
+)
+
+preload_app = True
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = 30
+
+# Recycle workers now and then to bound slow leaks (jitter avoids restarting all at once)
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 10000))
+max_requests_jitter = max_requests // 10
+
+# Workers write metrics to files in one directory so /metrics can sum them up.
+# It must be set before the app (and prometheus_client) is imported; it is
+# emptied in on_starting, since this file is read again on every reload (HUP)
+if Config.METRICS_ENABLED:
+    os.environ.setdefault(
+        'PROMETHEUS_MULTIPROC_DIR',
+        os.path.join(tempfile.gettempdir(), f"notes-metrics-{bind.rsplit(':', 1)[-1]}")
+    )
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+def on_starting(server):
+    """Master starts (once, not on reload): drop metric samples of old processes"""
+    if Config.METRICS_ENABLED:
+        metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+        os.makedirs(metrics_dir)
+
+def when_ready(server):
+    """App is loaded in the master: freeze the heap before the first fork"""
+    gc.collect()
+    gc.freeze()
+    server.log.info(
+        f'Warm-up took {time.perf_counter() - _started:.2f}s '
+        f'({gc.get_freeze_count()} objects frozen), '
+        f'starting {workers} workers x {threads} threads'
+    )
+
+def post_fork(server, worker):
+    """Give each worker its own database connections and background purger"""
+    from app.main import app
+    from app.database import db
+    from app.services.purger import start_purge_worker
+    
+    with app.app_context():
+        for engine in db.engines.values():
+            # close=False: leave the parent's connections alone, just stop sharing them
+            engine.dispose(close=False)
+    
+    # Threads don't survive fork, so it is started here and not in the master;
+    # the workers' passes are serialized by an advisory lock
+    start_purge_worker(app)
+
+def child_exit(server, worker):
+    """Drop live gauges (in-progress requests) of a worker that exited"""
+    if Config.METRICS_ENABLED:
+        from prometheus_client import multiprocess
+        
+        multiprocess.mark_process_dead(worker.pid)
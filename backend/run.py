@@ -1,6 +1,7 @@
 """
 Flask Application Entry Point
-Run this file to start the server: python run.py
+Run this file to start the development server: python run.py
+Production server (gunicorn): python run.py --prod
 """
 
 import sys
@@ -9,6 +10,11 @@ import os
 # Add backend directory to Python path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+if __name__ == '__main__' and '--prod' in sys.argv:
+    # Production: gunicorn with gunicorn.conf.py (preload, gc.freeze, workers from CPU count)
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    os.execv(sys.executable, [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py', 'app.main:app'])
+
 from app.main import app
 from app.config import Config
 
@@ -23,6 +29,12 @@ if __name__ == '__main__':
     print("=" * 60)
     print("\n⚡ Server running... Press CTRL+C to stop\n")
     
+    # Background purger (PURGE_INTERVAL_SECONDS); with the reloader only in the serving child
+    if not Config.DEBUG or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        from app.services.purger import start_purge_worker
+        
+        start_purge_worker(app)
+    
     app.run(
         host=Config.HOST,
         port=Config.PORT,
@@ -1,15 +1,21 @@
 """
 Test configuration
 """
+import os
+import uuid
 import pytest
-from app.main import app, db
+from app.main import create_app
+from app.database import db
 from app.config import TestingConfig
 
 @pytest.fixture
-def client():
+def app():
+    """Create application for the tests"""
+    return create_app(TestingConfig)
+
+@pytest.fixture
+def client(app):
     """Create test client"""
-    app.config.from_object(TestingConfig)
-    
     with app.test_client() as client:
         with app.app_context():
             db.create_all()
@@ -39,3 +45,28 @@ def auth_headers(client):
     return {
         'Authorization': f'Bearer {token}'
     }
+
+@pytest.fixture
+def postgres_url():
+    """
+    URL of a new, empty PostgreSQL database, dropped afterwards
+    
+    Needs TEST_DATABASE_URL pointing to a server where the user may create
+    databases; tests using this fixture are skipped without it.
+    """
+    url = os.getenv('TEST_DATABASE_URL')
+    if not url:
+        pytest.skip('TEST_DATABASE_URL not set')
+    
+    import psycopg2
+    from sqlalchemy.engine import make_url
+    
+    name = f'test_{uuid.uuid4().hex[:12]}'
+    admin = psycopg2.connect(url)
+    admin.autocommit = True
+    admin.cursor().execute(f'CREATE DATABASE {name}')
+    try:
+        yield make_url(url).set(database=name).render_as_string(hide_password=False)
+    finally:
+        admin.cursor().execute(f'DROP DATABASE {name} WITH (FORCE)')
+        admin.close()
@@ -134,6 +134,79 @@ class TestLogout:
         assert response.status_code == 400
         assert response.json['success'] is False
 
+class TestTokenRevocation:
+    """Test jti-based token revocation"""
+    
+    def test_token_has_jti(self, client, auth_headers):
+        """Test issued tokens carry a jti claim"""
+        import jwt
+        
+        token = auth_headers['Authorization'].split(' ')[1]
+        payload = jwt.decode(token, options={'verify_signature': False})
+        
+        assert payload.get('jti')
+    
+    def test_revoked_token_rejected(self, client, auth_headers):
+        """Test token is rejected after logout"""
+        client.post('/api/auth/logout', headers=auth_headers)
+        
+        response = client.get('/api/user/profile', headers=auth_headers)
+        
+        assert response.status_code == 401
+
+class TestVerifiedTokenCache:
+    """Test caching of verified token payloads"""
+    
+    def test_verified_token_cached(self, client, auth_headers):
+        """Test a verified token is served from the cache"""
+        from app.services.token_cache import token_cache
+        
+        token = auth_headers['Authorization'].split(' ')[1]
+        client.get('/api/notes', headers=auth_headers)
+        
+        assert token_cache.get(token_cache.key(token)) is not None
+    
+    def test_cached_token_still_revocable(self, client, auth_headers):
+        """Test revocation applies to cached tokens"""
+        client.get('/api/notes', headers=auth_headers)
+        client.post('/api/auth/logout', headers=auth_headers)
+        
+        response = client.get('/api/notes', headers=auth_headers)
+        
+        assert response.status_code == 401
+
+class TestPrincipalCache:
+    """Test cached user principals used by authenticated routes"""
+    
+    def test_cached_principal_reused(self, client, auth_headers):
+        """Test repeated calls reuse the cached principal"""
+        from app.services.principal_cache import principal_cache
+        
+        client.get('/api/user/profile', headers=auth_headers)
+        
+        user_id = client.get('/api/user/profile', headers=auth_headers).json['user']['id']
+        assert principal_cache.get(user_id) is principal_cache.get(user_id)
+    
+    def test_token_rejected_after_password_change(self, client, auth_headers):
+        """Test tokens issued before a password change stop working, even within the same second"""
+        client.post('/api/user/change-password', headers=auth_headers, json={
+            'old_password': 'TestPassword123!',
+            'new_password': 'NewTestPassword456!'
+        })
+        
+        response = client.get('/api/user/profile', headers=auth_headers)
+        
+        assert response.status_code == 401
+        
+        # A token issued right after the change (usually in the same second) works
+        token = client.post('/api/auth/login', json={
+            'email': 'test@example.com',
+            'password': 'NewTestPassword456!'
+        }).json['token']
+        response = client.get('/api/user/profile', headers={'Authorization': f'Bearer {token}'})
+        
+        assert response.status_code == 200
+
 class TestTokenVerification:
     """Test token verification"""
     
@@ -152,3 +225,130 @@ class TestTokenVerification:
         
         assert response.status_code == 401
         assert response.json['valid'] is False
+
+class TestRateLimiting:
+    """Test token bucket rate limiting of password endpoints"""
+    
+    @pytest.fixture
+    def limited(self, app):
+        """Enable rate limiting with small buckets"""
+        from app.services.rate_limiter import rate_limiter
+        
+        app.config.update(
+            RATE_LIMIT_ENABLED=True,
+            RATE_LIMIT_IP_PER_MINUTE=60,
+            RATE_LIMIT_IP_BURST=10,
+            RATE_LIMIT_EMAIL_PER_MINUTE=1,
+            RATE_LIMIT_EMAIL_BURST=3
+        )
+        rate_limiter.reset()
+        yield
+        rate_limiter.reset()
+    
+    def test_login_limited_per_email(self, client, limited):
+        """Test repeated logins for one email get 429 with Retry-After"""
+        credentials = {'email': 'victim@example.com', 'password': 'WrongPassword1!'}
+        
+        statuses = [client.post('/api/auth/login', json=credentials).status_code for _ in range(4)]
+        
+        assert statuses == [401, 401, 401, 429]
+        response = client.post('/api/auth/login', json=credentials)
+        assert response.status_code == 429
+        assert int(response.headers['Retry-After']) >= 1
+        
+        # Other accounts are unaffected
+        response = client.post('/api/auth/login', json={'email': 'other@example.com', 'password': 'x'})
+        assert response.status_code == 401
+    
+    def test_login_limited_per_ip(self, client, limited):
+        """Test one client cycling through emails is limited by IP"""
+        statuses = [
+            client.post('/api/auth/login', json={'email': f'user{i}@example.com', 'password': 'x'}).status_code
+            for i in range(11)
+        ]
+        
+        assert statuses[:10] == [401] * 10
+        assert statuses[10] == 429
+    
+    def test_rejected_before_hashing(self, client, limited, monkeypatch):
+        """Test limited requests never reach bcrypt"""
+        from app.services import auth_service
+        
+        for _ in range(3):
+            client.post('/api/auth/register', json={'email': 'spam@example.com', 'password': 'SecurePass123!'})
+        
+        def fail(*args, **kwargs):
+            raise AssertionError('hashed a rate limited request')
+        
+        monkeypatch.setattr(auth_service, 'hash_password', fail)
+        response = client.post('/api/auth/register', json={'email': 'spam@example.com', 'password': 'SecurePass123!'})
+        
+        assert response.status_code == 429
+    
+    def test_change_password_limited_before_auth(self, client, limited, monkeypatch):
+        """Test the IP bucket is checked before the token is verified"""
+        from app.services.auth_service import AuthService
+        
+        headers = {'Authorization': 'Bearer invalid'}
+        for _ in range(10):
+            assert client.post('/api/user/change-password', headers=headers, json={}).status_code == 401
+        
+        def fail(*args, **kwargs):
+            raise AssertionError('verified the token of a rate limited request')
+        
+        monkeypatch.setattr(AuthService, 'verify_token', fail)
+        response = client.post('/api/user/change-password', headers=headers, json={})
+        
+        assert response.status_code == 429
+    
+    def test_change_password_limited_per_account(self, client, auth_headers, limited):
+        """Test change-password still counts attempts per account"""
+        payload = {'old_password': 'WrongPassword1!', 'new_password': 'NewPassword123!'}
+        
+        statuses = [client.post('/api/user/change-password', headers=auth_headers, json=payload).status_code for _ in range(4)]
+        
+        assert statuses[3] == 429
+        assert 429 not in statuses[:3]
+    
+    def test_trusted_proxy_client_ip(self, limited):
+        """Test the IP bucket keys on X-Forwarded-For only behind trusted proxies"""
+        from app.main import create_app
+        from app.config import TestingConfig
+        from app.database import db
+        from app.services.rate_limiter import rate_limiter
+        
+        def statuses(config):
+            app = create_app(config)
+            app.config.update(RATE_LIMIT_ENABLED=True, RATE_LIMIT_IP_BURST=1)
+            with app.test_client() as client, app.app_context():
+                db.create_all()
+                try:
+                    return [
+                        client.post('/api/auth/login', json={'email': f'user{i}@example.com', 'password': 'x'},
+                                    headers={'X-Forwarded-For': f'203.0.113.{i}'}).status_code
+                        for i in range(2)
+                    ]
+                finally:
+                    db.session.remove()
+                    db.drop_all()
+        
+        class ProxiedConfig(TestingConfig):
+            TRUSTED_PROXIES = 1
+        
+        assert statuses(TestingConfig) == [401, 429]
+        rate_limiter.reset()
+        assert statuses(ProxiedConfig) == [401, 401]
+    
+    def test_bucket_refills(self):
+        """Test tokens come back at the configured rate"""
+        from app.services.rate_limiter import LocalTokenBucketStore
+        
+        store = LocalTokenBucketStore(shards=4)
+        
+        assert store.consume('k', rate=1000, capacity=1) == (True, 0.0)
+        allowed, retry_after = store.consume('k', rate=1000, capacity=1)
+        assert not allowed and 0 < retry_after <= 0.001
+        
+        import time
+        time.sleep(0.005)
+        assert store.consume('k', rate=1000, capacity=1)[0]
@@ -0,0 +1,66 @@
+"""
+Benchmark harness smoke tests
+"""
+import json
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class TestLoadBenchmark:
+    """Test the end-to-end load benchmark runs and reports"""
+    
+    def test_report(self, tmp_path):
+        """Test a tiny run reports every operation without errors"""
+        output = tmp_path / 'load.json'
+        subprocess.run(
+            [sys.executable, 'benchmarks/load.py', '--sizes', '10', '--requests', '5',
+             '--concurrency', '2', '--bcrypt-rounds', '4', '--output', str(output)],
+            cwd=BACKEND_DIR,
+            check=True,
+            env=dict(os.environ, BENCH_DATABASE_URL='')
+        )
+        
+        report = json.loads(output.read_text())
+        scenario = report['scenarios'][0]
+        
+        assert scenario['notes'] == 10
+        assert scenario['peak_rss_mb'] > 0
+        assert set(scenario['operations']) == {'register', 'login', 'list', 'get', 'update', 'delete'}
+        for result in scenario['operations'].values():
+            assert result['errors'] == 0
+            assert result['p50_ms'] <= result['p95_ms'] <= result['p99_ms']
+
+class TestMicroBenchmarks:
+    """Test micro-benchmark baselines and the slowdown check"""
+    
+    def run_micro(self, *args):
+        return subprocess.run(
+            [sys.executable, 'benchmarks/micro.py', *args, '--filter', 'base64_encode_512,to_dict', '--min-time', '0.01', '--repeat', '2'],
+            cwd=BACKEND_DIR,
+            capture_output=True,
+            text=True
+        )
+    
+    def test_compare_against_baseline(self, tmp_path):
+        """Test compare passes against its own results and fails on a slowdown"""
+        results = tmp_path / 'results.json'
+        assert self.run_micro('run', '--output', str(results)).returncode == 0
+        
+        data = json.loads(results.read_text())
+        assert set(data['benchmarks']) == {'base64_encode_512', 'note_to_dict', 'note_to_dict_binary'}
+        
+        # Same numbers: no slowdown
+        result = self.run_micro('compare', '--results', str(results), '--baseline', str(results))
+        assert result.returncode == 0
+        
+        # A baseline ten times faster: every benchmark regressed
+        for timing in data['benchmarks'].values():
+            timing['best_us'] /= 10
+        baseline = tmp_path / 'baseline.json'
+        baseline.write_text(json.dumps(data))
+        
+        result = self.run_micro('compare', '--results', str(results), '--baseline', str(baseline), '--max-slowdown', '1.5')
+        assert result.returncode == 1
+        assert 'SLOWER' in result.stdout
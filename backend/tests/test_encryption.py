@@ -2,7 +2,11 @@
 Encryption tests
 """
 import pytest
-from app.utils.security import hash_password, verify_password, generate_salt, derive_key_pbkdf2
+import threading
+from app.utils.security import (
+    hash_password, verify_password, generate_salt, derive_key_pbkdf2,
+    PasswordWorkerPool, PasswordHashingBusy
+)
 
 class TestPasswordHashing:
     """Test password hashing functions"""
@@ -30,6 +34,37 @@ class TestPasswordHashing:
         
         assert verify_password("WrongPassword123!", hashed) is False
 
+class TestPasswordWorkerPool:
+    """Test bounded bcrypt worker pool"""
+    
+    def test_pool_runs_work(self):
+        """Test pool returns the result of the job"""
+        pool = PasswordWorkerPool(workers=1, queue_size=0)
+        
+        assert pool.run(lambda x: x * 2, 21) == 42
+        pool.shutdown()
+    
+    def test_pool_rejects_when_full(self):
+        """Test pool fails fast when workers and queue are busy"""
+        pool = PasswordWorkerPool(workers=1, queue_size=0)
+        release = threading.Event()
+        started = threading.Event()
+        
+        def blocking_job():
+            started.set()
+            release.wait()
+        
+        worker = threading.Thread(target=pool.run, args=(blocking_job,))
+        worker.start()
+        started.wait()
+        
+        with pytest.raises(PasswordHashingBusy):
+            pool.run(lambda: None)
+        
+        release.set()
+        worker.join()
+        pool.shutdown()
+
 class TestSaltGeneration:
     """Test salt generation"""
     
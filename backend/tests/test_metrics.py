@@ -0,0 +1,82 @@
+"""
+Metrics endpoint tests
+"""
+import re
+
+def sample(body: str, name: str, **labels) -> float:
+    """Value of one sample in the text exposition format (0 if missing)"""
+    for line in body.splitlines():
+        match = re.match(r'(\w+)(?:\{(.*)\})? (\S+)$', line)
+        if not match or match.group(1) != name:
+            continue
+        found = dict(re.findall(r'(\w+)="([^"]*)"', match.group(2) or ''))
+        if all(found.get(key) == value for key, value in labels.items()):
+            return float(match.group(3))
+    return 0.0
+
+class TestMetrics:
+    """Test the /metrics endpoint"""
+    
+    def test_request_counted(self, client):
+        """Test requests are counted per route and status"""
+        before = sample(client.get('/metrics').text, 'http_requests_total', endpoint='health_check', status='200')
+        
+        client.get('/health')
+        response = client.get('/metrics')
+        
+        assert response.status_code == 200
+        assert response.content_type.startswith('text/plain')
+        assert sample(response.text, 'http_requests_total', endpoint='health_check', status='200') == before + 1
+        assert sample(response.text, 'http_request_duration_seconds_count', method='GET', endpoint='health_check') >= 1
+    
+    def test_route_labels(self, client, auth_headers):
+        """Test blueprint routes are labelled by blueprint and endpoint"""
+        client.get('/api/notes/999999', headers=auth_headers)
+        body = client.get('/metrics').text
+        
+        assert sample(body, 'http_requests_total', blueprint='notes', endpoint='notes.get_note', status='404') >= 1
+    
+    def test_database_time_recorded(self, client, auth_headers):
+        """Test queries made by a request are counted"""
+        before = sample(client.get('/metrics').text, 'http_request_db_queries_sum', endpoint='notes.get_notes')
+        
+        client.get('/api/notes', headers=auth_headers)
+        body = client.get('/metrics').text
+        
+        assert sample(body, 'http_request_db_queries_sum', endpoint='notes.get_notes') > before
+        assert sample(body, 'db_pool_checkout_seconds_count') >= 1
+    
+    def test_bcrypt_time_recorded(self, client):
+        """Test password hashing time is recorded"""
+        before = sample(client.get('/metrics').text, 'password_hash_seconds_count', operation='hashpw')
+        
+        client.post('/api/auth/register', json={'email': 'metrics@example.com', 'password': 'SecurePass123!'})
+        body = client.get('/metrics').text
+        
+        assert sample(body, 'password_hash_seconds_count', operation='hashpw') == before + 1
+    
+    def test_token_required(self):
+        """Test /metrics requires the bearer token when METRICS_TOKEN is set"""
+        from app.main import create_app
+        from app.config import TestingConfig
+        
+        class TokenConfig(TestingConfig):
+            METRICS_TOKEN = 'scrape-secret'
+        
+        guarded = create_app(TokenConfig).test_client()
+        
+        assert guarded.get('/metrics').status_code == 401
+        assert guarded.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+        assert guarded.get('/metrics', headers={'Authorization': 'Bearer scrape-secret'}).status_code == 200
+        # Non-ASCII header values are rejected, not a 500
+        assert guarded.get('/metrics', headers={'Authorization': 'Bearer \u00e9'}).status_code == 401
+    
+    def test_disabled_by_default(self):
+        """Test metrics are off unless METRICS_ENABLED is set"""
+        from app.main import create_app
+        from app.config import Config, TestingConfig
+        
+        class DefaultConfig(TestingConfig):
+            METRICS_ENABLED = Config.METRICS_ENABLED
+        
+        assert create_app(DefaultConfig).test_client().get('/metrics').status_code == 404
@@ -0,0 +1,120 @@
+"""
+Migration runner tests
+
+The migrations are PostgreSQL-only (CONCURRENTLY, BYTEA, sequences). Set
+TEST_DATABASE_URL to a server where the test user may create databases;
+each test runs in a database of its own that is dropped afterwards.
+"""
+import os
+import sys
+import pytest
+
+DATABASE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'database')
+sys.path.insert(0, DATABASE_DIR)
+
+import migrations  # noqa: E402
+
+@pytest.fixture
+def conn(postgres_url):
+    """Connection to a new, empty PostgreSQL database"""
+    import psycopg2
+    
+    connection = psycopg2.connect(postgres_url)
+    try:
+        yield connection
+    finally:
+        connection.close()
+
+def indexes(conn, table: str) -> dict:
+    """Index name -> definition of a table"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s", (table,))
+    result = dict(cursor.fetchall())
+    conn.commit()
+    return result
+
+def applied(conn) -> list:
+    """Versions recorded in schema_migrations"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT version FROM schema_migrations ORDER BY version")
+    result = [row[0] for row in cursor.fetchall()]
+    conn.commit()
+    return result
+
+ALL_VERSIONS = [migration.version for migration in migrations.MIGRATIONS]
+
+REDUNDANT_INDEXES = {'idx_notes_user_listing', 'idx_notes_is_deleted', 'idx_notes_user_id', 'idx_notes_created_at'}
+
+class TestMigrationList:
+    """Test the migration list itself"""
+    
+    def test_versions_ascending(self):
+        """Test versions are unique and listed in order"""
+        assert ALL_VERSIONS == sorted(set(ALL_VERSIONS))
+    
+    def test_initial_schema_skips_dropped_indexes(self):
+        """Test migration 1 does not create indexes that migration 3 drops"""
+        initial = '\n'.join(migrations.MIGRATIONS[0].statements)
+        
+        for index in REDUNDANT_INDEXES | {'idx_users_email'}:
+            assert f'INDEX IF NOT EXISTS {index} ' not in initial
+
+class TestRunMigrations:
+    """Test applying migrations to a PostgreSQL database"""
+    
+    def test_fresh_database(self, conn):
+        """Test all migrations apply to an empty database"""
+        assert migrations.run_migrations(conn) == ALL_VERSIONS
+        assert applied(conn) == ALL_VERSIONS
+        
+        note_indexes = indexes(conn, 'notes')
+        assert 'WHERE (is_deleted = false)' in note_indexes['idx_notes_user_active']
+        assert '(user_id, change_xid, change_seq, id)' in note_indexes['idx_notes_user_changes']
+        assert not REDUNDANT_INDEXES & set(note_indexes)
+        assert not any(name.endswith('_new') for name in note_indexes)
+        assert 'idx_users_email' not in indexes(conn, 'users')
+    
+    def test_rerun_is_noop(self, conn):
+        """Test running the migrations again applies nothing"""
+        migrations.run_migrations(conn)
+        before = indexes(conn, 'notes')
+        
+        assert migrations.run_migrations(conn) == []
+        assert applied(conn) == ALL_VERSIONS
+        assert indexes(conn, 'notes') == before
+    
+    def test_upgrade_partially_migrated(self, conn):
+        """Test a database stopped at an older version is upgraded and keeps its rows"""
+        assert migrations.run_migrations(conn, target=2) == [1, 2]
+        
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO users (email, password_hash, salt) VALUES ('a@example.com', 'x', 'salt') RETURNING id")
+        user_id = cursor.fetchone()[0]
+        cursor.execute(
+            "INSERT INTO notes (user_id, encrypted_content, iv, auth_tag, change_seq) VALUES (%s, 'c', 'i', 't', nextval('notes_change_seq'))",
+            (user_id,)
+        )
+        conn.commit()
+        
+        assert migrations.run_migrations(conn) == ALL_VERSIONS[2:]
+        
+        cursor.execute("SELECT change_xid FROM notes")
+        assert cursor.fetchall() == [(0,)]
+        conn.commit()
+        assert '(user_id, change_xid, change_seq, id)' in indexes(conn, 'notes')['idx_notes_user_changes']
+    
+    def test_database_from_before_versioning(self, conn):
+        """Test a database created before schema_migrations loses the redundant indexes"""
+        cursor = conn.cursor()
+        cursor.execute(migrations.CREATE_USERS_TABLE)
+        cursor.execute(migrations.CREATE_NOTES_TABLE)
+        cursor.execute("CREATE INDEX idx_notes_user_id ON notes(user_id)")
+        cursor.execute("CREATE INDEX idx_notes_user_listing ON notes(user_id, is_deleted, created_at DESC, id DESC)")
+        cursor.execute("CREATE INDEX idx_notes_user_changes ON notes(user_id, change_seq, id)")
+        conn.commit()
+        
+        assert migrations.run_migrations(conn) == ALL_VERSIONS
+        
+        note_indexes = indexes(conn, 'notes')
+        assert not REDUNDANT_INDEXES & set(note_indexes)
+        assert '(user_id, change_xid, change_seq, id)' in note_indexes['idx_notes_user_changes']
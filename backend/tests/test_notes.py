@@ -3,6 +3,7 @@ Note tests
 """
 import pytest
 import base64
+import json
 
 class TestCreateNote:
     """Test note creation"""
@@ -173,3 +174,927 @@ class TestDeleteNote:
         
         assert response.status_code == 404
         assert response.json['success'] is False
+
+class TestPaginateNotes:
+    """Test keyset pagination of the note listing"""
+    
+    def test_paginate_notes_with_cursor(self, client, auth_headers):
+        """Test walking all pages with next_cursor"""
+        for i in range(5):
+            client.post('/api/notes',
+                headers=auth_headers,
+                json={
+                    'encrypted_content': base64.b64encode(f'note {i}'.encode()).decode(),
+                    'iv': base64.b64encode(b'initialization vector').decode(),
+                    'auth_tag': base64.b64encode(b'authentication tag').decode()
+                }
+            )
+        
+        seen = []
+        cursor = None
+        while True:
+            url = '/api/notes?limit=2' + (f'&cursor={cursor}' if cursor else '')
+            response = client.get(url, headers=auth_headers)
+            
+            assert response.status_code == 200
+            assert len(response.json['notes']) <= 2
+            
+            seen.extend(note['id'] for note in response.json['notes'])
+            cursor = response.json['next_cursor']
+            if not cursor:
+                break
+        
+        assert len(seen) == 5
+        assert seen == sorted(seen, reverse=True)
+    
+    def test_paginate_notes_invalid_cursor(self, client, auth_headers):
+        """Test listing with a malformed cursor"""
+        response = client.get('/api/notes?cursor=not-a-cursor', headers=auth_headers)
+        
+        assert response.status_code == 400
+
+class TestStreamNotes:
+    """Test NDJSON streaming of the note listing"""
+    
+    def test_stream_notes_ndjson(self, client, auth_headers):
+        """Test listing notes one per line"""
+        for i in range(3):
+            client.post('/api/notes',
+                headers=auth_headers,
+                json={
+                    'encrypted_content': base64.b64encode(f'note {i}'.encode()).decode(),
+                    'iv': base64.b64encode(b'initialization vector').decode(),
+                    'auth_tag': base64.b64encode(b'authentication tag').decode()
+                }
+            )
+        
+        response = client.get('/api/notes',
+            headers={**auth_headers, 'Accept': 'application/x-ndjson'}
+        )
+        
+        assert response.status_code == 200
+        assert response.mimetype == 'application/x-ndjson'
+        
+        lines = response.data.decode().splitlines()
+        assert len(lines) == 3
+        assert all('encrypted_content' in json.loads(line) for line in lines)
+
+class TestNoteMetadata:
+    """Test metadata-only note listing"""
+    
+    def test_get_notes_meta(self, client, auth_headers):
+        """Test listing returns sizes instead of ciphertext"""
+        client.post('/api/notes',
+            headers=auth_headers,
+            json={
+                'encrypted_content': base64.b64encode(b'encrypted data').decode(),
+                'iv': base64.b64encode(b'initialization vector').decode(),
+                'auth_tag': base64.b64encode(b'authentication tag').decode()
+            }
+        )
+        
+        response = client.get('/api/notes?fields=meta', headers=auth_headers)
+        
+        assert response.status_code == 200
+        note = response.json['notes'][0]
+        assert 'encrypted_content' not in note
+        assert note['content_size'] == len(b'encrypted data')
+    
+    def test_get_notes_invalid_fields(self, client, auth_headers):
+        """Test listing with unknown fields value"""
+        response = client.get('/api/notes?fields=everything', headers=auth_headers)
+        
+        assert response.status_code == 400
+
+class TestBatchNotes:
+    """Test batch note operations"""
+    
+    def test_batch_create_update_delete(self, client, auth_headers):
+        """Test applying mixed operations in one request"""
+        create_response = client.post('/api/notes',
+            headers=auth_headers,
+            json={
+                'encrypted_content': base64.b64encode(b'original data').decode(),
+                'iv': base64.b64encode(b'original iv').decode(),
+                'auth_tag': base64.b64encode(b'original tag').decode()
+            }
+        )
+        note_id = create_response.json['note_id']
+        
+        response = client.post('/api/notes/batch',
+            headers=auth_headers,
+            json={'operations': [
+                {
+                    'op': 'create',
+                    'encrypted_content': base64.b64encode(b'new data').decode(),
+                    'iv': base64.b64encode(b'new iv').decode(),
+                    'auth_tag': base64.b64encode(b'new tag').decode()
+                },
+                {
+                    'op': 'update',
+                    'id': note_id,
+                    'encrypted_content': base64.b64encode(b'updated data').decode()
+                },
+                {'op': 'delete', 'id': 99999}
+            ]}
+        )
+        
+        assert response.status_code == 200
+        statuses = [result['status'] for result in response.json['results']]
+        assert statuses == ['created', 'updated', 'not_found']
+        
+        get_response = client.get(f'/api/notes/{note_id}', headers=auth_headers)
+        assert get_response.json['encrypted_content'] == base64.b64encode(b'updated data').decode()
+    
+    def test_batch_invalid_operation(self, client, auth_headers):
+        """Test batch with an update missing its id"""
+        response = client.post('/api/notes/batch',
+            headers=auth_headers,
+            json={'operations': [{'op': 'update'}]}
+        )
+        
+        assert response.status_code == 422
+        assert response.json['index'] == 0
+    
+    def test_batch_invalid_base64(self, client, auth_headers):
+        """Test batch reports which operation has bad base64, without applying any"""
+        response = client.post('/api/notes/batch',
+            headers=auth_headers,
+            json={'operations': [
+                {
+                    'op': 'create',
+                    'encrypted_content': base64.b64encode(b'new data').decode(),
+                    'iv': base64.b64encode(b'new iv').decode(),
+                    'auth_tag': base64.b64encode(b'new tag').decode()
+                },
+                {
+                    'op': 'create',
+                    'encrypted_content': 'not base64!',
+                    'iv': base64.b64encode(b'new iv').decode(),
+                    'auth_tag': base64.b64encode(b'new tag').decode()
+                }
+            ]}
+        )
+        
+        assert response.status_code == 422
+        assert response.json['index'] == 1
+        assert 'encrypted_content' in response.json['error']
+        
+        list_response = client.get('/api/notes', headers=auth_headers)
+        assert list_response.json['notes'] == []
+    
+    @pytest.mark.parametrize('op', ['update', 'delete'])
+    def test_batch_note_deleted_concurrently(self, client, auth_headers, op):
+        """Test a note deleted after the ownership check fails the batch instead of being rewritten"""
+        from sqlalchemy import event
+        from app.database import db
+        
+        note_ids = [
+            client.post('/api/notes', headers=auth_headers, json={
+                'encrypted_content': base64.b64encode(b'data').decode(),
+                'iv': base64.b64encode(b'iv').decode(),
+                'auth_tag': base64.b64encode(b'tag').decode()
+            }).json['note_id']
+            for _ in range(2)
+        ]
+        
+        raced = []
+        
+        def delete_first(conn, cursor, statement, parameters, context, executemany):
+            # Right before the batch's first UPDATE, another client deletes the note
+            if statement.startswith('UPDATE notes') and not raced:
+                raced.append(statement)
+                cursor.connection.execute('UPDATE notes SET is_deleted = 1 WHERE id = ?', (note_ids[1],))
+        
+        event.listen(db.engine, 'before_cursor_execute', delete_first)
+        try:
+            response = client.post('/api/notes/batch', headers=auth_headers, json={'operations': [
+                {'op': op, 'id': note_ids[1], 'iv': base64.b64encode(b'new iv').decode()},
+                {'op': 'create', 'encrypted_content': base64.b64encode(b'new').decode(),
+                 'iv': base64.b64encode(b'iv').decode(), 'auth_tag': base64.b64encode(b'tag').decode()}
+            ]})
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', delete_first)
+        
+        assert raced
+        assert response.status_code == 409, response.json
+        # The create was rolled back too (so was the simulated delete, which shared the connection)
+        assert sorted(note['id'] for note in client.get('/api/notes', headers=auth_headers).json['notes']) == note_ids
+
+class TestMultiGetNotes:
+    """Test fetching several notes by id"""
+    
+    def test_get_notes_by_ids(self, client, auth_headers):
+        """Test multi-get reports missing ids"""
+        create_response = client.post('/api/notes',
+            headers=auth_headers,
+            json={
+                'encrypted_content': base64.b64encode(b'encrypted data').decode(),
+                'iv': base64.b64encode(b'initialization vector').decode(),
+                'auth_tag': base64.b64encode(b'authentication tag').decode()
+            }
+        )
+        note_id = create_response.json['note_id']
+        
+        response = client.get(f'/api/notes?ids={note_id},99999', headers=auth_headers)
+        
+        assert response.status_code == 200
+        assert [note['id'] for note in response.json['notes']] == [note_id]
+        assert response.json['missing'] == [99999]
+    
+    def test_fetch_notes_by_ids_body(self, client, auth_headers):
+        """Test multi-get with ids in the request body"""
+        response = client.post('/api/notes/fetch',
+            headers=auth_headers,
+            json={'ids': [99998, 99999]}
+        )
+        
+        assert response.status_code == 200
+        assert response.json['notes'] == []
+        assert response.json['missing'] == [99998, 99999]
+
+class TestMsgpackNotes:
+    """Test MessagePack wire format for notes"""
+    
+    def test_create_and_get_note_msgpack(self, client, auth_headers):
+        """Test binary fields travel as raw bytes"""
+        import msgpack
+        
+        body = msgpack.packb({
+            'encrypted_content': b'\x00\x01encrypted data',
+            'iv': b'initialization vector',
+            'auth_tag': b'authentication tag'
+        }, use_bin_type=True)
+        
+        create_response = client.post('/api/notes',
+            headers={**auth_headers, 'Accept': 'application/msgpack'},
+            data=body,
+            content_type='application/msgpack'
+        )
+        
+        assert create_response.status_code == 201
+        note_id = msgpack.unpackb(create_response.data)['note_id']
+        
+        response = client.get(f'/api/notes/{note_id}',
+            headers={**auth_headers, 'Accept': 'application/msgpack'}
+        )
+        
+        assert response.mimetype == 'application/msgpack'
+        assert msgpack.unpackb(response.data)['encrypted_content'] == b'\x00\x01encrypted data'
+        
+        # JSON clients still get base64
+        json_response = client.get(f'/api/notes/{note_id}', headers=auth_headers)
+        assert base64.b64decode(json_response.json['encrypted_content']) == b'\x00\x01encrypted data'
+
+class TestConditionalRequests:
+    """Test ETag / If-None-Match / If-Match handling"""
+    
+    def _create_note(self, client, auth_headers):
+        response = client.post('/api/notes',
+            headers=auth_headers,
+            json={
+                'encrypted_content': base64.b64encode(b'encrypted data').decode(),
+                'iv': base64.b64encode(b'initialization vector').decode(),
+                'auth_tag': base64.b64encode(b'authentication tag').decode()
+            }
+        )
+        return response.json['note_id']
+    
+    def test_get_note_not_modified(self, client, auth_headers):
+        """Test 304 when the note has not changed"""
+        note_id = self._create_note(client, auth_headers)
+        etag = client.get(f'/api/notes/{note_id}', headers=auth_headers).headers['ETag']
+        
+        response = client.get(f'/api/notes/{note_id}',
+            headers={**auth_headers, 'If-None-Match': etag}
+        )
+        
+        assert response.status_code == 304
+    
+    def test_list_etag_changes_after_write(self, client, auth_headers):
+        """Test the listing ETag changes when the vault changes"""
+        self._create_note(client, auth_headers)
+        etag = client.get('/api/notes', headers=auth_headers).headers['ETag']
+        
+        assert client.get('/api/notes', headers={**auth_headers, 'If-None-Match': etag}).status_code == 304
+        
+        self._create_note(client, auth_headers)
+        
+        assert client.get('/api/notes', headers={**auth_headers, 'If-None-Match': etag}).status_code == 200
+    
+    def test_update_with_stale_if_match(self, client, auth_headers):
+        """Test concurrent editors get 412 on a stale version"""
+        note_id = self._create_note(client, auth_headers)
+        etag = client.get(f'/api/notes/{note_id}', headers=auth_headers).headers['ETag']
+        update = {'encrypted_content': base64.b64encode(b'updated data').decode()}
+        
+        first = client.put(f'/api/notes/{note_id}', headers={**auth_headers, 'If-Match': etag}, json=update)
+        second = client.put(f'/api/notes/{note_id}', headers={**auth_headers, 'If-Match': etag}, json=update)
+        
+        assert first.status_code == 200
+        assert first.headers['ETag'] != etag
+        assert second.status_code == 412
+
+class TestDeltaSync:
+    """Test delta sync of note changes"""
+    
+    def test_changes_since_cursor(self, client, auth_headers):
+        """Test changes include updates and tombstones after the cursor"""
+        note_ids = []
+        for i in range(2):
+            response = client.post('/api/notes',
+                headers=auth_headers,
+                json={
+                    'encrypted_content': base64.b64encode(f'note {i}'.encode()).decode(),
+                    'iv': base64.b64encode(b'initialization vector').decode(),
+                    'auth_tag': base64.b64encode(b'authentication tag').decode()
+                }
+            )
+            note_ids.append(response.json['note_id'])
+        
+        initial = client.get('/api/notes/changes', headers=auth_headers)
+        assert [change['id'] for change in initial.json['changes']] == note_ids
+        cursor = initial.json['next_cursor']
+        
+        client.delete(f'/api/notes/{note_ids[0]}', headers=auth_headers)
+        
+        response = client.get(f'/api/notes/changes?since={cursor}', headers=auth_headers)
+        
+        assert response.status_code == 200
+        assert len(response.json['changes']) == 1
+        tombstone = response.json['changes'][0]
+        assert tombstone['id'] == note_ids[0]
+        assert tombstone['is_deleted'] is True
+        assert 'encrypted_content' not in tombstone
+    
+    def test_changes_commit_out_of_order(self, client, auth_headers, monkeypatch):
+        """Test overlapping writes that commit in reverse order are both delivered"""
+        from app.database import db
+        from app.models.note import Note
+        from app.services.note_service import NoteService
+        
+        note_ids = []
+        for i in range(2):
+            response = client.post('/api/notes',
+                headers=auth_headers,
+                json={
+                    'encrypted_content': base64.b64encode(f'note {i}'.encode()).decode(),
+                    'iv': base64.b64encode(b'initialization vector').decode(),
+                    'auth_tag': base64.b64encode(b'authentication tag').decode()
+                }
+            )
+            note_ids.append(response.json['note_id'])
+        cursor = client.get('/api/notes/changes', headers=auth_headers).json['next_cursor']
+        
+        def commit(note_id, change_xid, change_seq):
+            db.session.query(Note).filter(Note.id == note_id).update(
+                {'change_xid': change_xid, 'change_seq': change_seq},
+                synchronize_session=False
+            )
+            db.session.commit()
+        
+        def sync(since, oldest_in_flight):
+            # pg_snapshot_xmin() as Postgres would report it at that moment
+            monkeypatch.setattr(NoteService, '_change_watermark', lambda self: oldest_in_flight)
+            return client.get(f'/api/notes/changes?since={since}', headers=auth_headers).json
+        
+        # Transaction 100 takes change_seq 101, transaction 101 takes 102 and commits first
+        commit(note_ids[1], 101, 102)
+        response = sync(cursor, 100)
+        assert response['changes'] == []
+        assert response['next_cursor'] == cursor
+        
+        # Once 100 commits with the lower change_seq, both arrive
+        commit(note_ids[0], 100, 101)
+        response = sync(cursor, 102)
+        assert [change['id'] for change in response['changes']] == note_ids
+        cursor = response['next_cursor']
+        
+        # Transaction 200 started first but takes the higher change_seq
+        commit(note_ids[1], 200, 202)
+        response = sync(cursor, 201)
+        assert [change['id'] for change in response['changes']] == [note_ids[1]]
+        cursor = response['next_cursor']
+        
+        commit(note_ids[0], 201, 201)
+        response = sync(cursor, 202)
+        assert [change['id'] for change in response['changes']] == [note_ids[0]]
+    
+    def test_changes_overlapping_transactions_postgres(self, postgres_url):
+        """Test two overlapping writes that commit in reverse order on PostgreSQL"""
+        from sqlalchemy import update
+        from app.main import create_app
+        from app.config import TestingConfig
+        from app.database import db
+        from app.models.note import Note
+        
+        config = type('PostgresTestingConfig', (TestingConfig,), {'SQLALCHEMY_DATABASE_URI': postgres_url})
+        app = create_app(config)
+        with app.app_context():
+            db.create_all()
+            client = app.test_client()
+            
+            client.post('/api/auth/register', json={
+                'email': 'test@example.com',
+                'password': 'TestPassword123!',
+                'confirm_password': 'TestPassword123!',
+                'name': 'Test User'
+            })
+            token = client.post('/api/auth/login', json={
+                'email': 'test@example.com',
+                'password': 'TestPassword123!'
+            }).json['token']
+            headers = {'Authorization': f'Bearer {token}'}
+            
+            note_ids = []
+            for i in range(2):
+                response = client.post('/api/notes',
+                    headers=headers,
+                    json={
+                        'encrypted_content': base64.b64encode(f'note {i}'.encode()).decode(),
+                        'iv': base64.b64encode(b'initialization vector').decode(),
+                        'auth_tag': base64.b64encode(b'authentication tag').decode()
+                    }
+                )
+                note_ids.append(response.json['note_id'])
+            cursor = client.get('/api/notes/changes', headers=headers).json['next_cursor']
+            
+            with db.engine.connect() as first, db.engine.connect() as second:
+                # first takes the lower change_seq, second commits before it
+                first.execute(update(Note).where(Note.id == note_ids[0]).values(iv=b'first'))
+                second.execute(update(Note).where(Note.id == note_ids[1]).values(iv=b'second'))
+                second.commit()
+                
+                during = client.get(f'/api/notes/changes?since={cursor}', headers=headers).json
+                assert during['changes'] == []
+                
+                first.commit()
+            
+            after = client.get(f'/api/notes/changes?since={during["next_cursor"]}', headers=headers).json
+            assert [change['id'] for change in after['changes']] == note_ids
+            
+            db.session.remove()
+            db.engine.dispose()
+    
+    def test_changes_legacy_cursor(self, client, auth_headers):
+        """Test cursors issued before change_xid still resume after their change_seq"""
+        note_ids = []
+        for i in range(2):
+            response = client.post('/api/notes',
+                headers=auth_headers,
+                json={
+                    'encrypted_content': base64.b64encode(f'note {i}'.encode()).decode(),
+                    'iv': base64.b64encode(b'initialization vector').decode(),
+                    'auth_tag': base64.b64encode(b'authentication tag').decode()
+                }
+            )
+            note_ids.append(response.json['note_id'])
+        first = client.get('/api/notes/changes', headers=auth_headers).json['changes'][0]
+        legacy_cursor = base64.urlsafe_b64encode(f"c|{first['change_seq']}|{first['id']}".encode()).decode().rstrip('=')
+        
+        response = client.get(f'/api/notes/changes?since={legacy_cursor}', headers=auth_headers)
+        
+        assert response.status_code == 200
+        assert [change['id'] for change in response.json['changes']] == note_ids[1:]
+    
+    def test_changes_invalid_cursor(self, client, auth_headers):
+        """Test delta sync with a malformed cursor"""
+        response = client.get('/api/notes/changes?since=not-a-cursor', headers=auth_headers)
+        
+        assert response.status_code == 400
+
+class TestBlobStorage:
+    """Test large ciphertext in the filesystem blob store"""
+    
+    @pytest.fixture
+    def blob_dir(self, tmp_path, monkeypatch):
+        """Store ciphertext above 16 bytes as blobs under tmp_path"""
+        from app.config import Config
+        
+        monkeypatch.setattr(Config, 'NOTES_BLOB_STORE', 'filesystem')
+        monkeypatch.setattr(Config, 'NOTES_BLOB_DIR', str(tmp_path))
+        monkeypatch.setattr(Config, 'NOTES_BLOB_THRESHOLD', 16)
+        return tmp_path
+    
+    def test_large_note_served_from_blob(self, client, auth_headers, blob_dir):
+        """Test large ciphertext is stored on disk and served as raw bytes"""
+        ciphertext = b'x' * 1024
+        response = client.post('/api/notes',
+            headers=auth_headers,
+            json={
+                'encrypted_content': base64.b64encode(ciphertext).decode(),
+                'iv': base64.b64encode(b'initialization vector').decode(),
+                'auth_tag': base64.b64encode(b'authentication tag').decode()
+            }
+        )
+        note_id = response.json['note_id']
+        
+        assert len([path for path in blob_dir.rglob('*') if path.is_file()]) == 1
+        
+        note = client.get(f'/api/notes/{note_id}', headers=auth_headers)
+        assert note.json['content_external'] is True
+        assert note.json['encrypted_content'] == base64.b64encode(ciphertext).decode()
+        
+        listing = client.get('/api/notes', headers=auth_headers)
+        listed = listing.json['notes'][0]
+        assert listed['encrypted_content'] == base64.b64encode(ciphertext).decode()
+        assert listed['content_external'] is True
+        assert listed['content_url'] == f'/api/notes/{note_id}/content'
+        
+        content = client.get(f'/api/notes/{note_id}/content', headers=auth_headers)
+        assert content.status_code == 200
+        assert content.mimetype == 'application/octet-stream'
+        assert content.data == ciphertext
+        
+        cached = client.get(f'/api/notes/{note_id}/content',
+            headers={**auth_headers, 'If-None-Match': content.headers['ETag']}
+        )
+        assert cached.status_code == 304
+    
+    def test_listings_inline_blob_content(self, client, auth_headers, blob_dir):
+        """Test every listing returns blob-backed ciphertext inline, so clients can decrypt it"""
+        import msgpack
+        
+        ciphertext = bytes(range(256)) * 4
+        note_id = client.post('/api/notes',
+            headers=auth_headers,
+            json={
+                'encrypted_content': base64.b64encode(ciphertext).decode(),
+                'iv': base64.b64encode(b'initialization vector').decode(),
+                'auth_tag': base64.b64encode(b'authentication tag').decode()
+            }
+        ).json['note_id']
+        
+        listed = [
+            client.get('/api/notes', headers=auth_headers).json['notes'][0],
+            client.get('/api/notes?limit=10', headers=auth_headers).json['notes'][0],
+            json.loads(client.get('/api/notes', headers={**auth_headers, 'Accept': 'application/x-ndjson'}).data.splitlines()[0]),
+            client.post('/api/notes/fetch', headers=auth_headers, json={'ids': [note_id]}).json['notes'][0],
+            client.get('/api/notes/changes', headers=auth_headers).json['changes'][0]
+        ]
+        for note in listed:
+            assert note['id'] == note_id
+            assert base64.b64decode(note['encrypted_content']) == ciphertext
+        
+        packed = client.get('/api/notes', headers={**auth_headers, 'Accept': 'application/msgpack'})
+        assert msgpack.unpackb(packed.data)['notes'][0]['encrypted_content'] == ciphertext
+        
+        # Metadata listings still leave the blob alone
+        meta = client.get('/api/notes?fields=meta', headers=auth_headers).json['notes'][0]
+        assert 'encrypted_content' not in meta
+        assert meta['content_size'] == len(ciphertext)
+    
+    def test_small_note_stays_inline(self, client, auth_headers, blob_dir):
+        """Test ciphertext under the threshold stays in the database"""
+        response = client.post('/api/notes',
+            headers=auth_headers,
+            json={
+                'encrypted_content': base64.b64encode(b'small').decode(),
+                'iv': base64.b64encode(b'initialization vector').decode(),
+                'auth_tag': base64.b64encode(b'authentication tag').decode()
+            }
+        )
+        note_id = response.json['note_id']
+        
+        assert not any(path.is_file() for path in blob_dir.rglob('*'))
+        
+        content = client.get(f'/api/notes/{note_id}/content', headers=auth_headers)
+        assert content.data == b'small'
+
+class TestStreamingUpload:
+    """Test raw ciphertext uploads to PUT /api/notes/{id}/content"""
+    
+    @pytest.fixture
+    def note_id(self, client, auth_headers):
+        """Create a note to upload content to"""
+        response = client.post('/api/notes',
+            headers=auth_headers,
+            json={
+                'encrypted_content': base64.b64encode(b'encrypted data').decode(),
+                'iv': base64.b64encode(b'initialization vector').decode(),
+                'auth_tag': base64.b64encode(b'authentication tag').decode()
+            }
+        )
+        return response.json['note_id']
+    
+    def upload_headers(self, auth_headers):
+        """Auth headers plus the iv and auth tag of the uploaded ciphertext"""
+        return {
+            **auth_headers,
+            'Content-Type': 'application/octet-stream',
+            'X-Note-IV': base64.b64encode(b'new iv').decode(),
+            'X-Note-Auth-Tag': base64.b64encode(b'new tag').decode()
+        }
+    
+    def test_upload_inline(self, client, auth_headers, note_id):
+        """Test uploading small ciphertext stored in the database"""
+        response = client.put(f'/api/notes/{note_id}/content',
+            headers=self.upload_headers(auth_headers),
+            data=b'new ciphertext'
+        )
+        
+        assert response.status_code == 200
+        assert response.headers['ETag'] == f'"{note_id}-2"'
+        
+        note = client.get(f'/api/notes/{note_id}', headers=auth_headers)
+        assert base64.b64decode(note.json['encrypted_content']) == b'new ciphertext'
+        assert base64.b64decode(note.json['iv']) == b'new iv'
+    
+    def test_upload_to_blob_store(self, client, auth_headers, note_id, tmp_path, monkeypatch):
+        """Test large uploads are streamed in chunks to the blob store"""
+        from app.config import Config
+        
+        monkeypatch.setattr(Config, 'NOTES_BLOB_STORE', 'filesystem')
+        monkeypatch.setattr(Config, 'NOTES_BLOB_DIR', str(tmp_path))
+        monkeypatch.setattr(Config, 'NOTES_BLOB_THRESHOLD', 1024)
+        monkeypatch.setattr(Config, 'NOTES_UPLOAD_CHUNK_SIZE', 256)
+        ciphertext = bytes(range(256)) * 64
+        
+        response = client.put(f'/api/notes/{note_id}/content',
+            headers=self.upload_headers(auth_headers),
+            data=ciphertext
+        )
+        
+        assert response.status_code == 200
+        assert [path.read_bytes() for path in tmp_path.rglob('*') if path.is_file()] == [ciphertext]
+        
+        content = client.get(f'/api/notes/{note_id}/content', headers=auth_headers)
+        assert content.data == ciphertext
+    
+    def test_rejected_upload_writes_no_blob(self, client, auth_headers, note_id, tmp_path, monkeypatch):
+        """Test a stale If-Match or missing note is rejected before the body reaches the blob store"""
+        from app.config import Config
+        
+        monkeypatch.setattr(Config, 'NOTES_BLOB_STORE', 'filesystem')
+        monkeypatch.setattr(Config, 'NOTES_BLOB_DIR', str(tmp_path))
+        monkeypatch.setattr(Config, 'NOTES_BLOB_THRESHOLD', 1024)
+        ciphertext = bytes(range(256)) * 64
+        
+        stale = client.put(f'/api/notes/{note_id}/content',
+            headers={**self.upload_headers(auth_headers), 'If-Match': f'"{note_id}-99"'},
+            data=ciphertext
+        )
+        missing = client.put('/api/notes/99999/content',
+            headers=self.upload_headers(auth_headers),
+            data=ciphertext
+        )
+        
+        assert stale.status_code == 412
+        assert missing.status_code == 404
+        assert not any(path.is_file() for path in tmp_path.rglob('*'))
+    
+    def test_range_inline(self, client, auth_headers, note_id):
+        """Test Range requests on ciphertext stored in the database"""
+        response = client.get(f'/api/notes/{note_id}/content',
+            headers={**auth_headers, 'Range': 'bytes=0-8'}
+        )
+        
+        assert response.status_code == 206
+        assert response.data == b'encrypted'
+        assert response.headers['Content-Range'] == f'bytes 0-8/{len(b"encrypted data")}'
+    
+    def test_upload_missing_headers(self, client, auth_headers, note_id):
+        """Test uploads without iv and auth tag headers are rejected"""
+        response = client.put(f'/api/notes/{note_id}/content',
+            headers=auth_headers,
+            data=b'new ciphertext'
+        )
+        
+        assert response.status_code == 400
+
+class TestPurger:
+    """Test purging of old tombstones and expired blacklist rows"""
+    
+    def test_purge_old_tombstones(self, client, auth_headers):
+        """Test only tombstones past the retention are hard-deleted"""
+        from datetime import datetime, timedelta
+        from app.database import db
+        from app.models.note import Note
+        from app.services.purger import Purger
+        
+        note_ids = []
+        for i in range(3):
+            response = client.post('/api/notes',
+                headers=auth_headers,
+                json={
+                    'encrypted_content': base64.b64encode(f'note {i}'.encode()).decode(),
+                    'iv': base64.b64encode(b'initialization vector').decode(),
+                    'auth_tag': base64.b64encode(b'authentication tag').decode()
+                }
+            )
+            note_ids.append(response.json['note_id'])
+        
+        client.delete(f'/api/notes/{note_ids[0]}', headers=auth_headers)
+        client.delete(f'/api/notes/{note_ids[1]}', headers=auth_headers)
+        db.session.query(Note).filter(Note.id == note_ids[0]).update(
+            {'deleted_at': datetime.utcnow() - timedelta(days=365)},
+            synchronize_session=False
+        )
+        db.session.commit()
+        
+        report = Purger(batch_size=1).run()
+        
+        assert report['notes'] == 1
+        assert report['complete'] is True
+        assert sorted(row.id for row in db.session.query(Note.id)) == note_ids[1:]
+    
+    def test_purged_tombstones_expire_older_cursors(self, client, auth_headers):
+        """Test a delta sync cursor from before a purged tombstone asks for a full sync"""
+        from datetime import datetime, timedelta
+        from app.database import db
+        from app.models.note import Note
+        from app.services.purger import Purger
+        
+        note_ids = []
+        for i in range(2):
+            response = client.post('/api/notes',
+                headers=auth_headers,
+                json={
+                    'encrypted_content': base64.b64encode(f'note {i}'.encode()).decode(),
+                    'iv': base64.b64encode(b'initialization vector').decode(),
+                    'auth_tag': base64.b64encode(b'authentication tag').decode()
+                }
+            )
+            note_ids.append(response.json['note_id'])
+        old_cursor = client.get('/api/notes/changes', headers=auth_headers).json['next_cursor']
+        
+        client.delete(f'/api/notes/{note_ids[0]}', headers=auth_headers)
+        db.session.query(Note).filter(Note.id == note_ids[0]).update(
+            {'deleted_at': datetime.utcnow() - timedelta(days=365)},
+            synchronize_session=False
+        )
+        db.session.commit()
+        synced_cursor = client.get(f'/api/notes/changes?since={old_cursor}', headers=auth_headers).json['next_cursor']
+        
+        assert Purger().run()['notes'] == 1
+        
+        expired = client.get(f'/api/notes/changes?since={old_cursor}', headers=auth_headers)
+        assert expired.status_code == 410
+        assert expired.json['reset'] is True
+        
+        # A device that saw the deletion before the purge keeps syncing
+        current = client.get(f'/api/notes/changes?since={synced_cursor}', headers=auth_headers)
+        assert current.status_code == 200
+        
+        full = client.get('/api/notes/changes', headers=auth_headers)
+        assert [change['id'] for change in full.json['changes']] == note_ids[1:]
+    
+    def test_purge_changes_vault_etag(self, client, auth_headers):
+        """Test purging the newest tombstone does not bring back an older listing ETag"""
+        from datetime import datetime, timedelta
+        from app.database import db
+        from app.models.note import Note
+        from app.services.purger import Purger
+        
+        note_ids = []
+        for i in range(2):
+            response = client.post('/api/notes',
+                headers=auth_headers,
+                json={
+                    'encrypted_content': base64.b64encode(f'note {i}'.encode()).decode(),
+                    'iv': base64.b64encode(b'initialization vector').decode(),
+                    'auth_tag': base64.b64encode(b'authentication tag').decode()
+                }
+            )
+            note_ids.append(response.json['note_id'])
+        # Cached while both notes were live
+        etag = client.get('/api/notes', headers=auth_headers).headers['ETag']
+        
+        client.delete(f'/api/notes/{note_ids[0]}', headers=auth_headers)
+        db.session.query(Note).filter(Note.id == note_ids[0]).update(
+            {'deleted_at': datetime.utcnow() - timedelta(days=365)},
+            synchronize_session=False
+        )
+        db.session.commit()
+        
+        assert Purger().run()['notes'] == 1
+        
+        response = client.get('/api/notes', headers={**auth_headers, 'If-None-Match': etag})
+        assert response.status_code == 200
+        assert [note['id'] for note in response.json['notes']] == note_ids[1:]
+    
+    def test_purge_orphaned_blobs(self, client, tmp_path, monkeypatch):
+        """Test old unreferenced blobs are deleted, unless re-used while the sweep runs"""
+        import os
+        from app.config import Config
+        from app.services.blob_store import get_blob_store
+        from app.services.purger import Purger
+        
+        monkeypatch.setattr(Config, 'NOTES_BLOB_STORE', 'filesystem')
+        monkeypatch.setattr(Config, 'NOTES_BLOB_DIR', str(tmp_path))
+        store = get_blob_store()
+        
+        orphan = store.put(b'orphaned ciphertext')
+        reused = store.put(b'ciphertext stored again')
+        for ref in (orphan, reused):
+            os.utime(store.path(ref), (0, 0))
+        
+        # A deduplicating put refreshes the blob after the sweep picked it, its row not yet committed
+        delete_unreferenced_blobs = Purger._delete_unreferenced_blobs
+        def put_during_sweep(self, store, refs, grace_cutoff):
+            store.put(b'ciphertext stored again')
+            return delete_unreferenced_blobs(self, store, refs, grace_cutoff)
+        monkeypatch.setattr(Purger, '_delete_unreferenced_blobs', put_during_sweep)
+        
+        report = Purger().run()
+        
+        assert report['blobs'] == 1
+        assert not os.path.exists(store.path(orphan))
+        assert store.get(reused) == b'ciphertext stored again'
+    
+    def test_purge_recovers_interrupted_blob_writes(self, client, tmp_path, monkeypatch):
+        """Test the sweep restores blobs of crashed deletes and removes stale temp files"""
+        import os
+        from app.config import Config
+        from app.services.blob_store import get_blob_store
+        from app.services.purger import Purger
+        
+        monkeypatch.setattr(Config, 'NOTES_BLOB_STORE', 'filesystem')
+        monkeypatch.setattr(Config, 'NOTES_BLOB_DIR', str(tmp_path))
+        store = get_blob_store()
+        
+        # Crashed after renaming aside, with the blob re-used meanwhile
+        reused = store.put(b'ciphertext stored again')
+        os.rename(store.path(reused), os.path.join(os.path.dirname(store.path(reused)), f'.del-{reused}'))
+        # Crashed after renaming aside, and a put has written a new copy since
+        rewritten = store.put(b'ciphertext written again')
+        doomed = os.path.join(os.path.dirname(store.path(rewritten)), f'.del-{rewritten}')
+        with open(doomed, 'wb') as f:
+            f.write(b'ciphertext written again')
+        
+        stale_tmp = [tmp_path / '.tmp-stream', tmp_path / reused[:2] / reused[2:4] / '.tmp-put']
+        fresh_tmp = tmp_path / '.tmp-uploading'
+        for path in stale_tmp + [fresh_tmp]:
+            path.write_bytes(b'partial')
+        for path in stale_tmp:
+            os.utime(path, (0, 0))
+        
+        Purger().run()
+        
+        assert store.get(reused) == b'ciphertext stored again'
+        assert store.get(rewritten) == b'ciphertext written again'
+        assert not any(path.name.startswith('.del-') for path in tmp_path.rglob('*'))
+        assert not any(path.exists() for path in stale_tmp)
+        assert fresh_tmp.exists()
+    
+    def test_purge_worker_started_by_serving_process(self):
+        """Test create_app leaves the purge thread to the serving process (gunicorn preload forks it away)"""
+        import threading
+        from app.main import create_app
+        from app.config import TestingConfig
+        from app.services.purger import start_purge_worker
+        
+        config = type('PurgingTestingConfig', (TestingConfig,), {'PURGE_INTERVAL_SECONDS': 3600})
+        app = create_app(config)
+        
+        assert 'purge-worker' not in [thread.name for thread in threading.enumerate()]
+        
+        worker = start_purge_worker(app)
+        try:
+            assert 'purge-worker' in [thread.name for thread in threading.enumerate()]
+        finally:
+            worker.stop()
+    
+    def test_purge_lock_single_runner(self, postgres_url):
+        """Test only one process at a time gets the purge lock on PostgreSQL"""
+        import psycopg2
+        from app.main import create_app
+        from app.config import TestingConfig
+        from app.database import db
+        from app.services.purger import PURGE_LOCK_KEY, purge_lock
+        
+        config = type('PostgresTestingConfig', (TestingConfig,), {'SQLALCHEMY_DATABASE_URI': postgres_url})
+        app = create_app(config, register_blueprints=False)
+        other_process = psycopg2.connect(postgres_url)
+        other_process.autocommit = True
+        try:
+            with app.app_context():
+                other_process.cursor().execute('SELECT pg_advisory_lock(%s)', (PURGE_LOCK_KEY,))
+                with purge_lock() as acquired:
+                    assert acquired is False
+                
+                other_process.cursor().execute('SELECT pg_advisory_unlock(%s)', (PURGE_LOCK_KEY,))
+                with purge_lock() as acquired:
+                    assert acquired is True
+        finally:
+            other_process.close()
+            with app.app_context():
+                db.engine.dispose()
+    
+    def test_purge_expired_blacklist(self, client):
+        """Test blacklist rows are removed once the token has expired"""
+        from datetime import datetime, timedelta
+        from app.database import db
+        from app.models.user import JWTBlacklist
+        from app.services.purger import Purger
+        
+        db.session.add_all([
+            JWTBlacklist(jti='expired', expires_at=datetime.utcnow() - timedelta(hours=1)),
+            JWTBlacklist(jti='active', expires_at=datetime.utcnow() + timedelta(hours=1))
+        ])
+        db.session.commit()
+        
+        report = Purger().run()
+        
+        assert report['jwt_blacklist'] == 1
+        assert [row.jti for row in JWTBlacklist.query.all()] == ['active']
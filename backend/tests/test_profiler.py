@@ -0,0 +1,72 @@
+"""
+Request profiler tests
+"""
+import time
+import pytest
+from app.main import create_app
+from app.database import db
+from app.config import TestingConfig
+from app.services.profiler import sign_profile_request, verify_profile_request
+
+SECRET = 'profile-secret'
+
+@pytest.fixture
+def profiled_client(tmp_path):
+    """Client of an app with profiling enabled, writing to a temporary directory"""
+    class ProfilingConfig(TestingConfig):
+        PROFILE_ENABLED = True
+        PROFILE_SECRET_KEY = SECRET
+        PROFILE_DIR = str(tmp_path)
+        PROFILE_INTERVAL_MS = 1
+    
+    app = create_app(ProfilingConfig)
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+            yield client
+            db.session.remove()
+            db.drop_all()
+
+class TestProfiler:
+    """Test on-demand request profiling"""
+    
+    def test_signed_request_profiled(self, profiled_client, tmp_path):
+        """Test a request with a signed X-Profile header writes collapsed stacks"""
+        response = profiled_client.post('/api/auth/register', json={
+            'email': 'profiled@example.com',
+            'password': 'SecurePass123!'
+        }, headers={'X-Profile': sign_profile_request(SECRET, int(time.time()) + 60)})
+        
+        assert response.status_code == 201
+        profile = tmp_path / response.headers['X-Profile-Id']
+        lines = profile.read_text().splitlines()
+        
+        assert lines
+        stacks = [line.rsplit(' ', 1) for line in lines]
+        assert all(int(count) > 0 for _, count in stacks)
+        assert any('app.routes.auth:register' in stack.split(';') for stack, _ in stacks)
+    
+    def test_unsigned_request_not_profiled(self, profiled_client, tmp_path):
+        """Test requests without a valid signature are not profiled"""
+        for header in ({}, {'X-Profile': '1'}, {'X-Profile': sign_profile_request('wrong', int(time.time()) + 60)},
+                       {'X-Profile': '9999999999.\u00e9'}):
+            response = profiled_client.get('/health', headers=header)
+            
+            assert response.status_code == 200
+            assert 'X-Profile-Id' not in response.headers
+        assert list(tmp_path.iterdir()) == []
+    
+    def test_signature_expires(self):
+        """Test signed header values expire"""
+        assert verify_profile_request(SECRET, sign_profile_request(SECRET, int(time.time()) + 60))
+        assert not verify_profile_request(SECRET, sign_profile_request(SECRET, int(time.time()) - 1))
+        assert not verify_profile_request(SECRET, 'garbage')
+        # Unicode digits pass str.isdigit() but not int()
+        assert not verify_profile_request(SECRET, '\u00b2.' + '0' * 64)
+        assert not verify_profile_request(SECRET, f'{int(time.time()) + 60}.\u00e9')
+    
+    def test_disabled_by_default(self, client):
+        """Test no profiling hooks run unless enabled"""
+        response = client.get('/health', headers={'X-Profile': sign_profile_request(SECRET, int(time.time()) + 60)})
+        
+        assert 'X-Profile-Id' not in response.headers
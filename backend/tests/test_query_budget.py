@@ -0,0 +1,96 @@
+"""
+Query budget tests
+
+Every endpoint has a budget of SQL statements (X-Query-Count, sent in testing
+and debug mode). A change that adds a round trip fails here; lower the budget
+when a change removes one.
+"""
+import base64
+import logging
+import pytest
+from app.database import db
+from app.models.note import Note
+
+NOTE = {
+    'encrypted_content': base64.b64encode(b'ciphertext' * 8).decode(),
+    'iv': base64.b64encode(b'i' * 16).decode(),
+    'auth_tag': base64.b64encode(b't' * 16).decode()
+}
+
+QUERY_BUDGETS = [
+    # (method, path, JSON body, queries)
+    ('POST', '/api/auth/register', {'email': 'budget@example.com', 'password': 'SecurePass123!'}, 2),  # email check, INSERT
+    ('POST', '/api/auth/login', {'email': 'test@example.com', 'password': 'TestPassword123!'}, 1),
+    ('POST', '/api/auth/logout', None, 1),
+    ('GET', '/api/user/profile', None, 1),
+    ('POST', '/api/notes', NOTE, 1),  # INSERT ... RETURNING
+    ('GET', '/api/notes', None, 2),  # vault version, listing
+    ('GET', '/api/notes?limit=20', None, 2),
+    ('GET', '/api/notes?fields=meta', None, 2),
+    ('GET', '/api/notes/changes', None, 1),
+    ('POST', '/api/notes/fetch', {'ids': ['{id}']}, 1),
+    ('GET', '/api/notes/{id}', None, 1),
+    ('PUT', '/api/notes/{id}', NOTE, 1),  # UPDATE ... RETURNING, no SELECT first
+    ('DELETE', '/api/notes/{id}', None, 1),
+    ('POST', '/api/notes/batch', {'operations': [
+        {'op': 'create', **NOTE},
+        {'op': 'update', 'id': '{id}', **NOTE},
+        {'op': 'delete', 'id': '{other_id}'}
+    ]}, 4),  # ownership check, INSERT, UPDATE, UPDATE
+]
+
+def fill(value, ids: dict):
+    """Replace '{id}' placeholders in a path or body"""
+    if isinstance(value, str):
+        return int(ids[value[1:-1]]) if value in ('{id}', '{other_id}') else value.format(**ids)
+    if isinstance(value, dict):
+        return {key: fill(item, ids) for key, item in value.items()}
+    if isinstance(value, list):
+        return [fill(item, ids) for item in value]
+    return value
+
+@pytest.fixture
+def note_ids(client, auth_headers):
+    """Two notes of the test user, and warm per-process auth caches"""
+    ids = {
+        'id': client.post('/api/notes', json=NOTE, headers=auth_headers).json['note_id'],
+        'other_id': client.post('/api/notes', json=NOTE, headers=auth_headers).json['note_id']
+    }
+    client.get('/api/user/profile', headers=auth_headers)
+    return ids
+
+class TestQueryBudget:
+    """Test endpoints stay within their query budgets"""
+    
+    @pytest.mark.parametrize('method, path, body, budget', QUERY_BUDGETS, ids=[f'{m} {p}' for m, p, _, _ in QUERY_BUDGETS])
+    def test_endpoint_budget(self, client, auth_headers, note_ids, method, path, body, budget):
+        """Test an endpoint runs at most its budgeted number of queries"""
+        response = client.open(fill(path, note_ids), method=method, json=fill(body, note_ids), headers=auth_headers)
+        
+        assert response.status_code < 400, response.json
+        assert int(response.headers['X-Query-Count']) <= budget
+    
+    def test_listing_independent_of_vault_size(self, client, auth_headers, note_ids):
+        """Test listing more notes does not add queries (no N+1)"""
+        one = int(client.get('/api/notes?limit=1', headers=auth_headers).headers['X-Query-Count'])
+        
+        for _ in range(10):
+            client.post('/api/notes', json=NOTE, headers=auth_headers)
+        many = int(client.get('/api/notes?limit=20', headers=auth_headers).headers['X-Query-Count'])
+        
+        assert many == one
+    
+    def test_repeated_statement_logged(self, app, client, caplog):
+        """Test a statement repeated within one request is reported as a possible N+1"""
+        def n_plus_one():
+            for note_id in range(app.config['QUERY_REPEAT_WARNING']):
+                db.session.get(Note, note_id + 1)
+            return ''
+        
+        app.add_url_rule('/n-plus-one', 'n_plus_one', n_plus_one)
+        
+        with caplog.at_level(logging.WARNING):
+            response = client.get('/n-plus-one')
+        
+        assert int(response.headers['X-Query-Count']) == app.config['QUERY_REPEAT_WARNING']
+        assert 'Possible N+1' in caplog.text
@@ -0,0 +1,61 @@
+"""
+Startup time tests
+"""
+import os
+import re
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Budgets in milliseconds, generous enough for slow CI machines
+APP_IMPORT_BUDGET_MS = float(os.getenv('APP_IMPORT_BUDGET_MS', 250))
+MAINTENANCE_BOOT_BUDGET_MS = float(os.getenv('MAINTENANCE_BOOT_BUDGET_MS', 1500))
+
+MAINTENANCE_BOOT = 'from app.main import create_app; import app.models; create_app(register_blueprints=False)'
+
+def import_times(code: str) -> dict:
+    """
+    Run code with python -X importtime in a fresh interpreter
+    
+    Returns:
+        dict: module name -> (self microseconds, cumulative microseconds, nesting depth)
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    
+    times = {}
+    for line in result.stderr.splitlines():
+        match = re.match(r'import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)', line)
+        if match:
+            times.setdefault(match.group(4), (int(match.group(1)), int(match.group(2)), len(match.group(3)) // 2))
+    return times
+
+class TestStartupTime:
+    """Test import cost of the application"""
+    
+    def test_maintenance_boot_skips_api(self):
+        """Test database-only boot does not import the web API stack"""
+        times = import_times(MAINTENANCE_BOOT)
+        
+        for module in ('app.routes', 'app.middleware.error_handler', 'flask_cors', 'pydantic', 'email_validator'):
+            assert module not in times
+    
+    def test_maintenance_boot_budget(self):
+        """Test database-only boot stays within its import time budget"""
+        times = import_times(MAINTENANCE_BOOT)
+        
+        total_us = sum(cumulative for _, cumulative, depth in times.values() if depth == 0)
+        assert total_us / 1000 < MAINTENANCE_BOOT_BUDGET_MS
+    
+    def test_app_import_budget(self):
+        """Test the application's own modules import within budget"""
+        times = import_times('from app.main import app')
+        
+        own_us = sum(times[name][0] for name in times if name == 'app' or name.startswith('app.'))
+        assert own_us / 1000 < APP_IMPORT_BUDGET_MS
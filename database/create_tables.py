@@ -9,11 +9,14 @@ import sys
 backend_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
 sys.path.insert(0, backend_path)
 
-from app.main import app
+from app.main import create_app
 from app.database import db
 from app.models.user import User, JWTBlacklist
 from app.models.note import Note
 
+# Database only: skip routes, CORS and validation imports
+app = create_app(register_blueprints=False)
+
 def create_tables():
     """Create all database tables"""
     with app.app_context():
@@ -9,9 +9,12 @@ import sys
 backend_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
 sys.path.insert(0, backend_path)
 
-from app.main import app
+from app.main import create_app
 from app.database import db
 
+# Database only: skip routes, CORS and validation imports
+app = create_app(register_blueprints=False)
+
 def init_db():
     """Initialize database tables"""
     with app.app_context():
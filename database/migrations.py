@@ -1,6 +1,23 @@
 """
 Database migration script
-Creates initial database schema
+Applies versioned schema migrations and records them in schema_migrations
+
+Each migration runs once. Transactional migrations run in a single
+transaction together with their version record. Migrations with
+transactional=False run statement by statement in autocommit mode, which
+CREATE/DROP INDEX CONCURRENTLY requires, so indexes can be changed on a
+live database without blocking writes.
+"""
+from collections import namedtuple
+
+Migration = namedtuple('Migration', ['version', 'name', 'statements', 'transactional'])
+
+CREATE_SCHEMA_MIGRATIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INTEGER PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
 """
 
 CREATE_USERS_TABLE = """
@@ -10,11 +27,12 @@ CREATE TABLE IF NOT EXISTS users (
     password_hash VARCHAR(255) NOT NULL,
     name VARCHAR(255),
     salt BYTEA NOT NULL,
+    password_changed_at TIMESTAMP,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
-CREATE INDEX IF NOT EXISTS idx_users_email ON users(email);
+ALTER TABLE users ADD COLUMN IF NOT EXISTS password_changed_at TIMESTAMP;
 """
 
 CREATE_NOTES_TABLE = """
@@ -27,62 +45,221 @@ CREATE TABLE IF NOT EXISTS notes (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     is_deleted BOOLEAN DEFAULT FALSE,
-    deleted_at TIMESTAMP
+    deleted_at TIMESTAMP,
+    version INTEGER NOT NULL DEFAULT 1,
+    change_seq BIGINT,
+    blob_ref VARCHAR(64),
+    blob_size BIGINT
 );
 
-CREATE INDEX IF NOT EXISTS idx_notes_user_id ON notes(user_id);
-CREATE INDEX IF NOT EXISTS idx_notes_created_at ON notes(created_at);
-CREATE INDEX IF NOT EXISTS idx_notes_is_deleted ON notes(is_deleted);
+ALTER TABLE notes ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;
+
+CREATE SEQUENCE IF NOT EXISTS notes_change_seq;
+ALTER TABLE notes ADD COLUMN IF NOT EXISTS change_seq BIGINT;
+UPDATE notes SET change_seq = nextval('notes_change_seq') WHERE change_seq IS NULL;
+
+ALTER TABLE notes ADD COLUMN IF NOT EXISTS blob_ref VARCHAR(64);
+ALTER TABLE notes ADD COLUMN IF NOT EXISTS blob_size BIGINT;
+
+CREATE INDEX IF NOT EXISTS idx_notes_tombstones ON notes(deleted_at, id) WHERE is_deleted = TRUE;
+CREATE INDEX IF NOT EXISTS idx_notes_blob_ref ON notes(blob_ref) WHERE blob_ref IS NOT NULL;
 """
 
 CREATE_JWT_BLACKLIST_TABLE = """
 CREATE TABLE IF NOT EXISTS jwt_blacklist (
     id SERIAL PRIMARY KEY,
-    token VARCHAR(500) NOT NULL,
+    jti VARCHAR(64),
+    token VARCHAR(500),
     blacklisted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     expires_at TIMESTAMP NOT NULL
 );
 
 CREATE INDEX IF NOT EXISTS idx_jwt_blacklist_token ON jwt_blacklist(token);
 CREATE INDEX IF NOT EXISTS idx_jwt_blacklist_expires_at ON jwt_blacklist(expires_at);
+
+ALTER TABLE jwt_blacklist ADD COLUMN IF NOT EXISTS jti VARCHAR(64);
+ALTER TABLE jwt_blacklist ALTER COLUMN token DROP NOT NULL;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_jwt_blacklist_jti ON jwt_blacklist(jti);
+CREATE INDEX IF NOT EXISTS idx_jwt_blacklist_blacklisted_at ON jwt_blacklist(blacklisted_at);
+"""
+
+# Listing of non-deleted notes; replaces idx_notes_user_listing and skips tombstones entirely.
+# A failed CONCURRENTLY build leaves an INVALID index behind, so drop it before retrying.
+CREATE_ACTIVE_NOTES_INDEX = [
+    "DROP INDEX CONCURRENTLY IF EXISTS idx_notes_user_active_new",
+    "CREATE INDEX CONCURRENTLY idx_notes_user_active_new ON notes(user_id, created_at DESC, id DESC) WHERE is_deleted = FALSE",
+    "DROP INDEX CONCURRENTLY IF EXISTS idx_notes_user_active",
+    "ALTER INDEX idx_notes_user_active_new RENAME TO idx_notes_user_active",
+]
+
+# Covered by idx_notes_user_active / idx_notes_user_changes (user_id leads both),
+# the unique constraint on users.email, or not selective at all (is_deleted)
+DROP_REDUNDANT_INDEXES = [
+    "DROP INDEX CONCURRENTLY IF EXISTS idx_notes_user_listing",
+    "DROP INDEX CONCURRENTLY IF EXISTS idx_notes_is_deleted",
+    "DROP INDEX CONCURRENTLY IF EXISTS idx_notes_user_id",
+    "DROP INDEX CONCURRENTLY IF EXISTS idx_notes_created_at",
+    "DROP INDEX CONCURRENTLY IF EXISTS ix_notes_user_id",
+    "DROP INDEX CONCURRENTLY IF EXISTS ix_notes_created_at",
+    "DROP INDEX CONCURRENTLY IF EXISTS idx_users_email",
+]
+
+# Writing transaction of each change; delta sync holds back changes from transactions
+# that may still be in flight. Rows written before have all committed long ago (0).
+ADD_CHANGE_XID = """
+ALTER TABLE notes ADD COLUMN IF NOT EXISTS change_xid BIGINT NOT NULL DEFAULT 0;
 """
 
-def run_migrations(conn):
+# Delta sync order is now (change_xid, change_seq, id)
+CREATE_CHANGES_INDEX = [
+    "DROP INDEX CONCURRENTLY IF EXISTS idx_notes_user_changes_new",
+    "CREATE INDEX CONCURRENTLY idx_notes_user_changes_new ON notes(user_id, change_xid, change_seq, id)",
+    "DROP INDEX CONCURRENTLY IF EXISTS idx_notes_user_changes",
+    "ALTER INDEX idx_notes_user_changes_new RENAME TO idx_notes_user_changes",
+]
+
+# Newest purged tombstone per user; delta sync cursors from before it must do a full sync
+CREATE_SYNC_HORIZONS_TABLE = """
+CREATE TABLE IF NOT EXISTS sync_horizons (
+    user_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    change_xid BIGINT NOT NULL,
+    change_seq BIGINT NOT NULL
+);
+"""
+
+# Purges lower MAX(change_seq), so the vault version (listing ETag) counts them too
+ADD_SYNC_HORIZON_PURGES = """
+ALTER TABLE sync_horizons ADD COLUMN IF NOT EXISTS purges BIGINT NOT NULL DEFAULT 0;
+"""
+
+MIGRATIONS = [
+    # Baseline: idempotent, so databases created before versioning just record it.
+    # Note indexes come from the later migrations (older databases still have
+    # the indexes migration 3 drops).
+    Migration(1, 'initial schema', [CREATE_USERS_TABLE, CREATE_NOTES_TABLE, CREATE_JWT_BLACKLIST_TABLE], True),
+    Migration(2, 'partial index for active notes', CREATE_ACTIVE_NOTES_INDEX, False),
+    Migration(3, 'drop redundant indexes', DROP_REDUNDANT_INDEXES, False),
+    Migration(4, 'transaction id of note changes', [ADD_CHANGE_XID], True),
+    Migration(5, 'delta sync index on change_xid', CREATE_CHANGES_INDEX, False),
+    Migration(6, 'sync horizons of purged tombstones', [CREATE_SYNC_HORIZONS_TABLE], True),
+    Migration(7, 'purge count in the vault version', [ADD_SYNC_HORIZON_PURGES], True),
+]
+
+def get_applied_versions(conn) -> set:
     """
-    Run database migrations
+    Get the migration versions already applied
     
     Args:
         conn: Database connection
+        
+    Returns:
+        set: Applied versions
     """
     cursor = conn.cursor()
     
     try:
-        # Create tables
-        cursor.execute(CREATE_USERS_TABLE)
-        cursor.execute(CREATE_NOTES_TABLE)
-        cursor.execute(CREATE_JWT_BLACKLIST_TABLE)
-        
+        cursor.execute(CREATE_SCHEMA_MIGRATIONS_TABLE)
+        cursor.execute("SELECT version FROM schema_migrations")
+        versions = {row[0] for row in cursor.fetchall()}
         conn.commit()
-        print("Database migrations completed successfully!")
+        return versions
+    finally:
+        cursor.close()
+
+def apply_migration(conn, migration):
+    """
+    Apply a single migration and record its version
+    
+    Args:
+        conn: Database connection
+        migration: Migration to apply
+    """
+    cursor = conn.cursor()
+    record = "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)"
+    
+    try:
+        if migration.transactional:
+            for statement in migration.statements:
+                cursor.execute(statement)
+            cursor.execute(record, (migration.version, migration.name))
+            conn.commit()
+            return
         
-    except Exception as e:
-        conn.rollback()
-        print(f"Migration failed: {e}")
+        # CONCURRENTLY cannot run inside a transaction block
+        conn.commit()
+        conn.autocommit = True
+        try:
+            for statement in migration.statements:
+                cursor.execute(statement)
+            cursor.execute(record, (migration.version, migration.name))
+        finally:
+            conn.autocommit = False
+    except Exception:
+        if not conn.autocommit:
+            conn.rollback()
         raise
     finally:
         cursor.close()
 
+def run_migrations(conn, target: int = None) -> list:
+    """
+    Run pending database migrations in version order
+    
+    Args:
+        conn: Database connection
+        target: Stop after this version (default: latest)
+        
+    Returns:
+        list: Versions applied by this run
+    """
+    applied = get_applied_versions(conn)
+    done = []
+    
+    for migration in sorted(MIGRATIONS, key=lambda m: m.version):
+        if migration.version in applied:
+            continue
+        if target is not None and migration.version > target:
+            break
+        
+        try:
+            apply_migration(conn, migration)
+        except Exception as e:
+            print(f"Migration {migration.version} ({migration.name}) failed: {e}")
+            raise
+        
+        print(f"Applied migration {migration.version}: {migration.name}")
+        done.append(migration.version)
+    
+    if done:
+        print("Database migrations completed successfully!")
+    else:
+        print("Database is up to date")
+    
+    return done
+
 if __name__ == '__main__':
+    import argparse
     import psycopg2
     import os
     from dotenv import load_dotenv
     
+    parser = argparse.ArgumentParser(description='Apply database migrations')
+    parser.add_argument('--target', type=int, help='Migrate up to this version')
+    parser.add_argument('--status', action='store_true', help='List migrations and exit')
+    args = parser.parse_args()
+    
     load_dotenv()
     
     # Connect to database
     conn = psycopg2.connect(os.getenv('DATABASE_URL'))
     
-    # Run migrations
-    run_migrations(conn)
+    if args.status:
+        applied = get_applied_versions(conn)
+        for migration in MIGRATIONS:
+            state = 'applied' if migration.version in applied else 'pending'
+            print(f"{migration.version:>4}  {state:<8} {migration.name}")
+    else:
+        # Run migrations
+        run_migrations(conn, args.target)
     
     conn.close()
@@ -10,12 +10,15 @@ import base64
 backend_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
 sys.path.insert(0, backend_path)
 
-from app.main import app
+from app.main import create_app
 from app.database import db
 from app.models.user import User
 from app.models.note import Note
 from app.utils.security import hash_password, generate_salt
 
+# Database only: skip routes, CORS and validation imports
+app = create_app(register_blueprints=False)
+
 def create_dummy_data():
     """Create dummy users and notes for testing"""
     with app.app_context():
@@ -34,6 +34,11 @@ class ApiClient {
             'Accept: application/json'
         ];
         
+        // Browser IP, so the API rate limits per user instead of per PHP server (API needs TRUSTED_PROXIES=1)
+        if (!empty($_SERVER['REMOTE_ADDR'])) {
+            $defaultHeaders[] = 'X-Forwarded-For: ' . $_SERVER['REMOTE_ADDR'];
+        }
+        
         $allHeaders = array_merge($defaultHeaders, $headers);
         curl_setopt($ch, CURLOPT_HTTPHEADER, $allHeaders);
         